@@ -0,0 +1,143 @@
+"""
+Throughput of an I/O-bound backend (e.g. an LLM API call) served by the sync Flask app
+and by the ASGI app, both driven in-process without network overhead.
+
+- flask: sync predict() in a pool of --threads request threads, like gunicorn --threads;
+- asgi-sync: sync predict() in the ASGI executor of --threads threads;
+- asgi-async: `async def predict()` awaited on the event loop.
+
+    python -m benchmarks.async_concurrency --concurrency 64 --threads 8 --latency-ms 100
+    python -m benchmarks.async_concurrency --modes flask asgi-async --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from label_studio_ml import api
+from label_studio_ml.asgi import init_asgi_app
+from label_studio_ml.model import LabelStudioMLBase
+
+LATENCY = 0.1
+
+
+class SleepSyncModel(LabelStudioMLBase):
+
+    def predict(self, tasks, context=None, **kwargs):
+        time.sleep(LATENCY)
+        return [{'result': [], 'score': 1.0} for _ in tasks]
+
+
+class SleepAsyncModel(LabelStudioMLBase):
+
+    async def predict(self, tasks, context=None, **kwargs):
+        await asyncio.sleep(LATENCY)
+        return [{'result': [], 'score': 1.0} for _ in tasks]
+
+
+def make_request_body(i):
+    return json.dumps({
+        'tasks': [{'id': i, 'data': {'text': 'text'}}],
+        'label_config': '<View><Text name="text" value="$text"/></View>',
+        'project': '1.1000000000',
+        'params': {},
+    }).encode()
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def run_flask(requests, threads):
+    app = api.init_app(SleepSyncModel)
+    client = app.test_client()
+
+    def one(i):
+        start = time.perf_counter()
+        response = client.post('/predict', data=make_request_body(i), content_type='application/json')
+        assert response.status_code == 200, response.data
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(one, range(requests)))
+
+
+def run_asgi(model_class, requests, threads, concurrency):
+    app = init_asgi_app(model_class, executor_workers=threads)
+
+    async def one(i, semaphore):
+        async with semaphore:
+            messages = [{'type': 'http.request', 'body': make_request_body(i), 'more_body': False}]
+            sent = []
+
+            async def receive():
+                return messages.pop(0)
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {'type': 'http', 'method': 'POST', 'path': '/predict', 'query_string': b'',
+                     'headers': [(b'content-type', b'application/json')]}
+            start = time.perf_counter()
+            await app(scope, receive, send)
+            assert sent[0]['status'] == 200, sent
+            return time.perf_counter() - start
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*[one(i, semaphore) for i in range(requests)])
+
+    return asyncio.run(run())
+
+
+def main():
+    global LATENCY
+
+    parser = argparse.ArgumentParser(description='Flask vs ASGI throughput with an I/O-bound predict()')
+    parser.add_argument('--modes', nargs='+', default=['flask', 'asgi-sync', 'asgi-async'])
+    parser.add_argument('--requests', type=int, default=256)
+    parser.add_argument('--concurrency', type=int, default=64, help='Requests in flight for ASGI modes')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('THREADS', 8)))
+    parser.add_argument('--latency-ms', type=float, default=100, help='Simulated I/O latency of predict()')
+    parser.add_argument('--json', dest='json_path', help='Save results to JSON file')
+    args = parser.parse_args()
+    LATENCY = args.latency_ms / 1000
+
+    results = []
+    print(f'{"mode":<11} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8}')
+    for mode in args.modes:
+        start = time.perf_counter()
+        if mode == 'flask':
+            latencies = run_flask(args.requests, args.threads)
+        elif mode == 'asgi-sync':
+            latencies = run_asgi(SleepSyncModel, args.requests, args.threads, args.concurrency)
+        elif mode == 'asgi-async':
+            latencies = run_asgi(SleepAsyncModel, args.requests, args.threads, args.concurrency)
+        else:
+            parser.error(f'Unknown mode: {mode}')
+        elapsed = time.perf_counter() - start
+
+        summary = {
+            'mode': mode,
+            'requests': args.requests,
+            'threads': args.threads,
+            'concurrency': args.threads if mode == 'flask' else args.concurrency,
+            'requests_per_sec': args.requests / elapsed,
+            'p50_ms': statistics.median(latencies) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+        }
+        results.append(summary)
+        print(f'{mode:<11} {summary["requests_per_sec"]:>8.1f} {summary["p50_ms"]:>8.1f} {summary["p99_ms"]:>8.1f}')
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Microbenchmark of get/set latency for the cache backends under concurrent threads,
+which is how gunicorn --threads workers use the model cache.
+
+    python -m benchmarks.cache_latency --threads 8 --ops 2000
+    python -m benchmarks.cache_latency --backends sqlite memory --json results.json
+
+The Redis backend uses REDIS_URL (redis://localhost:6379/0 by default) and is skipped if unavailable.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from label_studio_ml.cache import create_cache
+
+KEYS = ('label_config', 'parsed_label_config', 'model_version', 'extra_params')
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def worker(cache, thread_id, ops, write_ratio):
+    """Run a mix of get/set operations similar to model instantiation, return latencies in seconds"""
+    get_latencies, set_latencies = [], []
+    project_id = str(thread_id % 4)
+    every_nth_write = int(1 / write_ratio) if write_ratio > 0 else 0
+    for i in range(ops):
+        key = KEYS[i % len(KEYS)]
+        if every_nth_write and i % every_nth_write == 0:
+            start = time.perf_counter()
+            cache[project_id, key] = f'value-{thread_id}-{i}'
+            set_latencies.append(time.perf_counter() - start)
+        else:
+            start = time.perf_counter()
+            cache[project_id, key]
+            get_latencies.append(time.perf_counter() - start)
+    return get_latencies, set_latencies
+
+
+def run_backend(name, threads, ops, write_ratio):
+    with tempfile.TemporaryDirectory() as path:
+        try:
+            cache = create_cache(name, path)
+            cache['0', 'ping'] = 'pong'
+        except Exception as e:
+            print(f'{name}: skipped ({e.__class__.__name__}: {e})', file=sys.stderr)
+            return None
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(lambda t: worker(cache, t, ops, write_ratio), range(threads)))
+        elapsed = time.perf_counter() - start
+
+    gets = [v for r in results for v in r[0]]
+    sets = [v for r in results for v in r[1]]
+    summary = {'backend': name, 'threads': threads, 'ops_per_sec': threads * ops / elapsed}
+    for op, latencies in (('get', gets), ('set', sets)):
+        if latencies:
+            summary[f'{op}_p50_us'] = statistics.median(latencies) * 1e6
+            summary[f'{op}_p99_us'] = percentile(latencies, 0.99) * 1e6
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cache backends get/set latency benchmark')
+    parser.add_argument('--backends', nargs='+', default=['sqlite', 'memory', 'lmdb', 'redis'])
+    parser.add_argument('--threads', type=int, default=int(os.getenv('THREADS', 8)))
+    parser.add_argument('--ops', type=int, default=2000, help='Operations per thread')
+    parser.add_argument('--write-ratio', type=float, default=0.05, help='Share of set operations')
+    parser.add_argument('--json', dest='json_path', help='Save results to JSON file')
+    args = parser.parse_args()
+
+    results = []
+    print(f'{"backend":<8} {"ops/s":>10} {"get p50 us":>11} {"get p99 us":>11} {"set p50 us":>11} {"set p99 us":>11}')
+    for name in args.backends:
+        summary = run_backend(name, args.threads, args.ops, args.write_ratio)
+        if summary is None:
+            continue
+        results.append(summary)
+        print(f'{name:<8} {summary["ops_per_sec"]:>10.0f} '
+              f'{summary.get("get_p50_us", 0):>11.1f} {summary.get("get_p99_us", 0):>11.1f} '
+              f'{summary.get("set_p50_us", 0):>11.1f} {summary.get("set_p99_us", 0):>11.1f}')
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Per-task overhead of logging on the predict hot path.
+
+- yolo: YOLOInjectionAreaSegmentation.predict() from yolo_injection_area_segmentation/ with a stub
+  in place of the YOLO network, which returns --detections synthetic masks per image, so the numbers
+  show post-processing and logging costs without inference;
+- api: /predict of the Flask app with a no-op model and a large request body, which measures
+  the request/response body logging.
+
+Log records are formatted and written to /dev/null, like a production handler would format them.
+
+    python -m benchmarks.log_overhead --tasks 64 --detections 50
+    python -m benchmarks.log_overhead --levels INFO WARNING --json results.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+from label_studio_ml.api import init_app
+from label_studio_ml.model import LabelStudioMLBase
+
+YOLO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'yolo_injection_area_segmentation')
+
+
+class NoopModel(LabelStudioMLBase):
+
+    def predict(self, tasks, context=None, **kwargs):
+        return [{'result': [], 'score': 0.0} for _ in tasks]
+
+
+def make_results(detections, height=480, width=640):
+    import torch
+    from ultralytics.engine.results import Results
+
+    generator = torch.Generator().manual_seed(0)
+    xy = torch.rand(detections, 2, generator=generator) * 400
+    wh = torch.rand(detections, 2, generator=generator) * 200 + 20
+    scores = torch.rand(detections, 1, generator=generator) * 0.5 + 0.5
+    boxes = torch.cat([xy, xy + wh, scores, torch.zeros(detections, 1)], 1)
+    masks = torch.zeros(detections, height, width)
+    for i in range(detections):
+        x1, y1, x2, y2 = [int(v) for v in boxes[i, :4]]
+        masks[i, y1:min(y2, height), x1:min(x2, width)] = 1
+    result = Results(np.zeros((height, width, 3), dtype=np.uint8), 'image.jpg', {0: 'arm_injection_area'},
+                     boxes=boxes, masks=masks)
+    result.masks.xyn  # computed once and cached like in real results
+    return result
+
+
+class StubYOLO:
+    names = {0: 'arm_injection_area'}
+
+    def __init__(self, result):
+        self.result = result
+
+    def predict(self, source, **kwargs):
+        sources = [source] if isinstance(source, str) else source
+        return [self.result for _ in sources]
+
+
+def bench_yolo(tasks, detections, repeats):
+    sys.path.insert(0, YOLO_DIR)
+    import model as yolo_model
+
+    yolo_model.YOLOInjectionAreaSegmentation.load_model = lambda self: setattr(self, 'model', None)
+    model = yolo_model.YOLOInjectionAreaSegmentation(
+        project_id='log-overhead', label_config='<View><Image name="image" value="$image"/></View>')
+    model.model = StubYOLO(make_results(detections))
+    image = os.path.join(YOLO_DIR, 'train6', 'results.png')
+    batch = [{'id': i, 'data': {'image': image}} for i in range(tasks)]
+
+    model.predict(batch)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict(batch)
+    return (time.perf_counter() - start) / repeats / tasks
+
+
+def bench_api(tasks, repeats):
+    client = init_app(NoopModel).test_client()
+    body = {
+        'tasks': [{'id': i, 'data': {'text': 'x' * 2000}} for i in range(tasks)],
+        'label_config': '<View><Text name="text" value="$text"/></View>',
+        'project': '1.1000000000',
+        'params': {},
+    }
+    client.post('/predict', json=body)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        response = client.post('/predict', json=body)
+        assert response.status_code == 200
+    return (time.perf_counter() - start) / repeats / tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Logging overhead per task on the predict path')
+    parser.add_argument('--targets', nargs='+', default=['yolo', 'api'])
+    parser.add_argument('--levels', nargs='+', default=['DEBUG', 'INFO', 'WARNING'])
+    parser.add_argument('--tasks', type=int, default=64)
+    parser.add_argument('--detections', type=int, default=50, help='Detections per image for the yolo target')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--json', dest='json_path', help='Save results to JSON file')
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, 'w')
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter('[%(asctime)s] [%(levelname)s] [%(name)s::%(funcName)s::%(lineno)d] %(message)s'))
+    logging.root.handlers = [handler]
+
+    results = []
+    print(f'{"target":<6} {"level":<8} {"us/task":>10}')
+    for target in args.targets:
+        for level in args.levels:
+            logging.root.setLevel(level)
+            if target == 'yolo':
+                per_task = bench_yolo(args.tasks, args.detections, args.repeats)
+            elif target == 'api':
+                per_task = bench_api(args.tasks, args.repeats)
+            else:
+                parser.error(f'Unknown target: {target}')
+            results.append({'target': target, 'level': level, 'tasks': args.tasks, 'us_per_task': per_task * 1e6})
+            print(f'{target:<6} {level:<8} {per_task * 1e6:>10.1f}')
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
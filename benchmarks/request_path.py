@@ -0,0 +1,210 @@
+"""
+Requests/sec and p50/p99 latency of /predict, /setup and /webhook of the Flask app created by init_app(),
+driven in-process without network overhead, across models, cache backends, label config sizes and batch sizes.
+
+Models:
+- dummy: LabelStudioMLBase returning one choice per task, which measures the request path itself;
+- sklearn: examples/sklearn_text_classifier (TF-IDF + logistic regression over the config labels);
+- spacy: examples/spacy, needs spacy and the SPACY_MODEL package (en_core_web_sm) installed.
+
+Models and cache backends that can't be loaded are skipped. Results are saved with the git commit,
+so a run can be compared with a saved baseline:
+
+    python -m benchmarks.request_path --json base.json
+    python -m benchmarks.request_path --compare base.json
+    python -m benchmarks.request_path --models dummy sklearn --caches sqlite memory --batch-sizes 1 64 --labels 10 1000
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from label_studio_ml import model as ml_model
+from label_studio_ml.api import init_app
+from label_studio_ml.model import LabelStudioMLBase
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'label_studio_ml', 'examples')
+ENDPOINTS = ('predict', 'setup', 'webhook')
+# fields identifying a benchmark case in results, used to match cases of two runs
+CASE_FIELDS = ('model', 'endpoint', 'cache', 'labels', 'batch_size')
+
+
+class DummyModel(LabelStudioMLBase):
+
+    def setup(self):
+        self.set('model_version', 'dummy-v0')
+
+    def predict(self, tasks, context=None, **kwargs):
+        from_name, to_name, _ = self.label_interface.get_first_tag_occurence('Choices', 'Text')
+        label = self.label_interface.get_tag(from_name).labels[0]
+        return [{'result': [{'from_name': from_name, 'to_name': to_name, 'type': 'choices',
+                             'value': {'choices': [label]}}], 'score': 1.0} for _ in tasks]
+
+    def fit(self, event, data, **kwargs):
+        return {'event': event}
+
+
+def load_example(name, class_name):
+    """Import the model class of an example, the examples all use the same module name `model`"""
+    spec = importlib.util.spec_from_file_location(f'{name}_model', os.path.join(EXAMPLES_DIR, name, 'model.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, class_name)
+
+
+MODELS = {
+    'dummy': (lambda: DummyModel, 'Choices'),
+    'sklearn': (lambda: load_example('sklearn_text_classifier', 'SklearnTextClassifier'), 'Choices'),
+    'spacy': (lambda: load_example('spacy', 'SpacyMLBackend'), 'Labels'),
+}
+
+
+def make_label_config(tag, labels):
+    values = ''.join(f'<{tag[:-1]} value="label_{i}"/>' for i in range(labels))
+    return f'<View><Text name="text" value="$text"/><{tag} name="label" toName="text">{values}</{tag}></View>'
+
+
+def make_body(endpoint, label_config, batch_size, i):
+    project = f'{i % 4 + 1}.1000000000'
+    if endpoint == 'predict':
+        tasks = [{'id': i * batch_size + j, 'data': {'text': f'Alice flew from Paris to Berlin on task {j}.'}}
+                 for j in range(batch_size)]
+        return {'tasks': tasks, 'label_config': label_config, 'project': project, 'params': {}}
+    if endpoint == 'setup':
+        return {'project': project, 'schema': label_config, 'extra_params': None}
+    # ANNOTATION_DELETED goes through model creation and fit(), which ignore it in the examples
+    return {'action': 'ANNOTATION_DELETED', 'project': {'id': i % 4 + 1, 'label_config': label_config},
+            'annotation': {'project': i % 4 + 1}}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def run_case(model_class, endpoint, label_config, batch_size, requests, threads):
+    client = init_app(model_class).test_client()
+    ok_statuses = (200, 201)
+
+    def one(i):
+        body = make_body(endpoint, label_config, batch_size, i)
+        start = time.perf_counter()
+        response = client.post(f'/{endpoint}', json=body)
+        latency = time.perf_counter() - start
+        assert response.status_code in ok_statuses, (response.status_code, response.data[:500])
+        return latency
+
+    one(0)  # warm up: model creation and label config parsing
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests_per_sec': requests / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    base = {tuple(r[k] for k in CASE_FIELDS): r for r in baseline['results']}
+    print(f'\nCompared with {baseline_path} (commit {baseline["meta"].get("commit")}):')
+    print(f'{"model":<8} {"endpoint":<8} {"cache":<7} {"labels":>6} {"batch":>5} {"req/s":>8} {"p99 ms":>8}')
+    for result in results:
+        old = base.get(tuple(result[k] for k in CASE_FIELDS))
+        if old is None:
+            continue
+        rps = (result['requests_per_sec'] / old['requests_per_sec'] - 1) * 100
+        p99 = (result['p99_ms'] / old['p99_ms'] - 1) * 100
+        print(f'{result["model"]:<8} {result["endpoint"]:<8} {result["cache"]:<7} {result["labels"]:>6} '
+              f'{result["batch_size"]:>5} {rps:>+7.1f}% {p99:>+7.1f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Request path benchmark of the ML backend Flask app')
+    parser.add_argument('--models', nargs='+', default=list(MODELS), choices=list(MODELS))
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument('--caches', nargs='+', default=['sqlite', 'memory', 'lmdb', 'redis'])
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 16, 128], help='Tasks per /predict')
+    parser.add_argument('--labels', nargs='+', type=int, default=[10, 1000], help='Labels in the label config')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per case')
+    parser.add_argument('--threads', type=int, default=1, help='Concurrent requests')
+    parser.add_argument('--json', dest='json_path', help='Save results to JSON file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    args = parser.parse_args()
+
+    results = []
+    print(f'{"model":<8} {"endpoint":<8} {"cache":<7} {"labels":>6} {"batch":>5} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8}')
+    with tempfile.TemporaryDirectory() as model_dir:
+        # examples store their state and trained models in MODEL_DIR
+        os.environ['MODEL_DIR'] = model_dir
+        for model_name in args.models:
+            load, tag = MODELS[model_name]
+            try:
+                model_class = load()
+            except Exception as e:
+                print(f'{model_name}: skipped ({e.__class__.__name__}: {e})', file=sys.stderr)
+                continue
+            # class attributes are read at import time
+            if hasattr(model_class, 'MODEL_DIR'):
+                model_class.MODEL_DIR = model_dir
+
+            for cache in args.caches:
+                try:
+                    ml_model.set_cache(cache, path=tempfile.mkdtemp(dir=model_dir))
+                    ml_model.CACHE['0', 'ping'] = 'pong'
+                except Exception as e:
+                    print(f'{cache}: skipped ({e.__class__.__name__}: {e})', file=sys.stderr)
+                    continue
+
+                for labels in args.labels:
+                    label_config = make_label_config(tag, labels)
+                    for endpoint in args.endpoints:
+                        # only /predict depends on the number of tasks
+                        for batch_size in args.batch_sizes if endpoint == 'predict' else [1]:
+                            summary = {'model': model_name, 'endpoint': endpoint, 'cache': cache,
+                                       'labels': labels, 'batch_size': batch_size, 'requests': args.requests,
+                                       'threads': args.threads}
+                            summary.update(run_case(model_class, endpoint, label_config, batch_size,
+                                                    args.requests, args.threads))
+                            results.append(summary)
+                            print(f'{model_name:<8} {endpoint:<8} {cache:<7} {labels:>6} {batch_size:>5} '
+                                  f'{summary["requests_per_sec"]:>8.1f} {summary["p50_ms"]:>8.2f} '
+                                  f'{summary["p99_ms"]:>8.2f}')
+
+    if args.json_path:
+        meta = {
+            'commit': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'args': vars(args),
+        }
+        with open(args.json_path, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
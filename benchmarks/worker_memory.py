@@ -0,0 +1,182 @@
+"""
+Per-worker memory of a PyTorch model served by workers forked from a preloaded app, like gunicorn --preload.
+
+The app is created with init_app() in this process, then --workers processes are forked from it, each warms
+up from the post_fork hook and serves --requests /predict requests. Memory is read from /proc/<pid>/smaps_rollup
+once all workers are done (Linux only): RSS counts shared pages in every process, PSS splits them between the
+processes sharing them, and USS (private pages) is what a worker would free on exit. Weight loading modes:
+
+- lazy: every worker loads the weights file in setup(), the default for most backends;
+- preload: preload_weights() loads them once in the master, workers share the pages copy-on-write;
+- mmap: every worker maps the weights file with label_studio_ml.weights.load_state_dict_mmap().
+
+    python -m benchmarks.worker_memory --workers 1 4 --size-mb 200
+    python -m benchmarks.worker_memory --modes lazy preload --workers 8 --json results.json
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from label_studio_ml import api
+from label_studio_ml import model as ml_model
+from label_studio_ml.model import LabelStudioMLBase
+from label_studio_ml.weights import freeze_module, load_state_dict_mmap
+
+MODES = ('lazy', 'preload', 'mmap')
+WIDTH = 1024
+LABEL_CONFIG = '<View></View>'
+
+
+def build_module(size_mb, device=None):
+    import torch
+
+    layers = max(1, int(size_mb * 1024 * 1024 / (WIDTH * WIDTH * 4)))
+    return torch.nn.Sequential(*[torch.nn.Linear(WIDTH, WIDTH, device=device) for _ in range(layers)])
+
+
+class TorchModel(LabelStudioMLBase):
+    mode = 'lazy'
+    size_mb = 100
+    weights_path = None
+    shared_module = None
+
+    @classmethod
+    def preload_weights(cls):
+        if cls.mode == 'preload':
+            cls.shared_module = cls.load()
+            return True
+        return False
+
+    @classmethod
+    def load(cls):
+        import torch
+
+        # parameters are replaced by the loaded ones, don't allocate and initialize them
+        module = build_module(cls.size_mb, device='meta')
+        if cls.mode == 'mmap':
+            return load_state_dict_mmap(module, cls.weights_path)
+        module.load_state_dict(torch.load(cls.weights_path, weights_only=True), assign=True)
+        return freeze_module(module)
+
+    def setup(self):
+        self.module = self.shared_module or self.load()
+
+    def warmup(self):
+        self.predict([{'id': 0}])
+
+    def predict(self, tasks, context=None, **kwargs):
+        import torch
+
+        with torch.inference_mode():
+            output = self.module(torch.ones(len(tasks), WIDTH))
+        return [{'result': [], 'score': float(score)} for score in output.mean(dim=1)]
+
+
+def read_memory(pid='self'):
+    """RSS, PSS and USS of a process in MB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                values[name] = int(value.split()[0]) / 1024
+    return {'rss_mb': values['Rss'], 'pss_mb': values['Pss'],
+            'uss_mb': values['Private_Clean'] + values['Private_Dirty']}
+
+
+def run_worker(requests, done_fd, measure_fd):
+    api.post_fork()
+    api.MODEL_WARMUP.wait()
+    client = api._server.test_client()
+    for i in range(requests):
+        response = client.post('/predict', json={
+            'tasks': [{'id': i}], 'label_config': LABEL_CONFIG, 'project': '1.1000000000', 'params': {}})
+        assert response.status_code == 200, response.data
+    os.write(done_fd, b'.')
+    # measure when all workers are done, so PSS is split between all of them
+    os.read(measure_fd, 1)
+    os.write(done_fd, json.dumps(read_memory()).encode() + b'\n')
+
+
+def run_case(mode, workers, requests):
+    TorchModel.mode = mode
+    TorchModel.shared_module = None
+    # workers warm up the instance the requests use
+    api.MODEL_WARMUP.project_id = '1'
+    api.MODEL_WARMUP.label_config = LABEL_CONFIG
+    api.init_app(TorchModel)
+
+    done_read, done_write = os.pipe()
+    pids, measure_fds = [], []
+    for _ in range(workers):
+        measure_read, measure_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                os.close(done_read)
+                run_worker(requests, done_write, measure_read)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            os._exit(code)
+        os.close(measure_read)
+        pids.append(pid)
+        measure_fds.append(measure_write)
+    os.close(done_write)
+
+    with os.fdopen(done_read) as done:
+        assert done.read(workers) == '.' * workers, 'a worker failed'
+        for fd in measure_fds:
+            os.write(fd, b'.')
+            os.close(fd)
+        stats = [json.loads(done.readline()) for _ in range(workers)]
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    master = read_memory()
+    result = {'mode': mode, 'workers': workers, 'master_pss_mb': master['pss_mb']}
+    for key in ('rss_mb', 'pss_mb', 'uss_mb'):
+        result[key] = sum(s[key] for s in stats) / workers
+    result['total_pss_mb'] = master['pss_mb'] + sum(s['pss_mb'] for s in stats)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory of forked workers sharing preloaded model weights')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 2, 4])
+    parser.add_argument('--size-mb', type=int, default=200, help='Size of the model weights')
+    parser.add_argument('--requests', type=int, default=20, help='/predict requests per worker')
+    parser.add_argument('--json', dest='json_path', help='Save results to JSON file')
+    args = parser.parse_args()
+
+    import torch
+
+    # workers aren't real servers, the warm-up must wait for post_fork() like under gunicorn
+    os.environ['SERVER_SOFTWARE'] = 'gunicorn/benchmark'
+    # SQLite connections must not be shared by forked processes, and the state doesn't matter here
+    ml_model.set_cache('memory')
+    results = []
+    print(f'{"mode":<8} {"workers":>7} {"RSS/worker":>10} {"PSS/worker":>10} {"USS/worker":>10} {"total PSS":>10}')
+    with tempfile.TemporaryDirectory() as model_dir:
+        TorchModel.size_mb = args.size_mb
+        TorchModel.weights_path = os.path.join(model_dir, 'weights.pt')
+        torch.save(build_module(args.size_mb).state_dict(), TorchModel.weights_path)
+
+        for mode in args.modes:
+            for workers in args.workers:
+                result = run_case(mode, workers, args.requests)
+                results.append(result)
+                print(f'{mode:<8} {workers:>7} {result["rss_mb"]:>10.0f} {result["pss_mb"]:>10.0f} '
+                      f'{result["uss_mb"]:>10.0f} {result["total_pss_mb"]:>10.0f}')
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
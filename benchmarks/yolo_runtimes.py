@@ -0,0 +1,103 @@
+"""
+Latency and throughput of the injection segmentation model on CPU with PyTorch, ONNX Runtime and OpenVINO.
+
+Each runtime is given as `runtime:precision` and exported with yolo_injection_area_segmentation/export.py
+if needed; `torch` runs the PyTorch model as is. Latency is measured on single images, throughput on
+batches of --batch images, and outputs of every exported model are compared with the PyTorch ones.
+
+    python -m benchmarks.yolo_runtimes --images 'data/*.jpg'
+    python -m benchmarks.yolo_runtimes --runtimes torch onnx:fp32 onnx:int8 --data dataset.yaml --json results.json
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+
+YOLO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'yolo_injection_area_segmentation')
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def bench(model, images, batch, repeats):
+    from export import predict
+
+    predict(model, images[:batch])  # warm up
+    latencies = []
+    for _ in range(repeats):
+        for image in images:
+            start = time.perf_counter()
+            predict(model, [image])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for i in range(0, len(images), batch):
+            predict(model, images[i:i + batch])
+    throughput = repeats * len(images) / (time.perf_counter() - start)
+    return latencies, throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CPU inference runtimes of the injection segmentation model')
+    parser.add_argument('--model', help='PyTorch model, MODEL_PATH by default')
+    parser.add_argument('--images', default=os.path.join(YOLO_DIR, 'train6', '*.jpg'), help='Glob of test images')
+    parser.add_argument('--runtimes', nargs='+',
+                        default=['torch', 'onnx:fp32', 'onnx:fp16', 'openvino:fp32', 'openvino:fp16'])
+    parser.add_argument('--data', help='Dataset YAML for INT8 calibration')
+    parser.add_argument('--batch', type=int, default=16, help='Batch size for the throughput test')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--json', dest='json_path', help='Save results to JSON file')
+    args = parser.parse_args()
+
+    sys.path.insert(0, YOLO_DIR)
+    from ultralytics import YOLO
+    from config import MODEL_PATH
+    from export import export_model, load_exported_model, predict, compare_results
+
+    model_path = args.model or MODEL_PATH
+    images = sorted(glob.glob(args.images))
+    if not images:
+        parser.error(f'No images match {args.images}')
+    reference = predict(YOLO(model_path), images)
+
+    results = []
+    print(f'{"runtime":<15} {"p50 ms":>8} {"p99 ms":>8} {"img/s":>8} {"min IoU":>8} {"unmatched":>9} {"unexplained":>11}')
+    for name in args.runtimes:
+        runtime, _, precision = name.partition(':')
+        if runtime == 'torch':
+            model = YOLO(model_path)
+        else:
+            model = load_exported_model(export_model(model_path, runtime, precision or 'fp32', args.data or ''))
+
+        reports = [compare_results(ref, out) for ref, out in zip(reference, predict(model, images))]
+        latencies, throughput = bench(model, images, args.batch, args.repeats)
+        summary = {
+            'runtime': name,
+            'images': len(images),
+            'batch': args.batch,
+            'p50_ms': statistics.median(latencies) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'images_per_sec': throughput,
+            'min_box_iou': min(report['min_box_iou'] for report in reports),
+            'max_conf_diff': max(report['max_conf_diff'] for report in reports),
+            'unmatched': sum(report['unmatched'] for report in reports),
+            'unexplained': sum(report['unexplained'] for report in reports),
+        }
+        results.append(summary)
+        print(f'{name:<15} {summary["p50_ms"]:>8.1f} {summary["p99_ms"]:>8.1f} {summary["images_per_sec"]:>8.1f} '
+              f'{summary["min_box_iou"]:>8.3f} {summary["unmatched"]:>9} {summary["unexplained"]:>11}')
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,43 @@
 import hmac
 import logging
 import os
+import random
+import time
 
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, g
 
 from .response import ModelResponse
 from .model import LabelStudioMLBase
 from .exceptions import exception_handler
+from .pool import ModelPool
+from .jobs import TrainingJobQueue, TrainingQueueFull
+from .batching import PredictBatcher
+from .warmup import ModelWarmup
+from .weights import single_threaded, freeze_gc
+from .deadline import Deadline, DeadlineExceeded, TIMEOUT_HEADER, deadline_scope, parse_timeout
+from .metrics import REGISTRY, REQUESTS, REQUEST_LATENCY, REQUESTS_IN_PROGRESS, CACHE_REQUESTS, time_stage
 
 logger = logging.getLogger(__name__)
 
+# request and response bodies logged at DEBUG level are cut to this many bytes, 0 logs them in full
+LOG_BODY_MAX_BYTES = int(os.getenv('LOG_BODY_MAX_BYTES', 1024))
+# share of requests whose headers and bodies are logged at DEBUG level
+LOG_BODY_SAMPLE_RATE = float(os.getenv('LOG_BODY_SAMPLE_RATE', 1.0))
+
 _server = Flask(__name__)
 MODEL_CLASS = LabelStudioMLBase
 BASIC_AUTH = None
+MODEL_POOL = ModelPool()
+# training finished in a worker process, pooled instances of the project must load the new state
+TRAINING_QUEUE = TrainingJobQueue(on_done=lambda job: MODEL_POOL.invalidate(job.project_id))
+PREDICT_BATCHER = PredictBatcher()
+MODEL_WARMUP = ModelWarmup()
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    'label_studio_ml_cache_hit_ratio', 'Share of cache reads served without a database query or download', ('cache',))
 
 
-def init_app(model_class, basic_auth_user=None, basic_auth_pass=None):
+def init_app(model_class, basic_auth_user=None, basic_auth_pass=None, model_pool_size=None, warmup_fn=None,
+             training_workers=None, predict_batch_size=None, predict_batch_wait_ms=None, warmup=None):
     global MODEL_CLASS
     global BASIC_AUTH
 
@@ -28,9 +50,49 @@ def init_app(model_class, basic_auth_user=None, basic_auth_pass=None):
     if basic_auth_user and basic_auth_pass:
         BASIC_AUTH = (basic_auth_user, basic_auth_pass)
 
+    # instances of the previous model class are useless now
+    MODEL_POOL.clear()
+    # weights loaded here are shared copy-on-write by the workers forked by gunicorn --preload
+    with single_threaded():
+        preloaded = model_class.preload_weights()
+    # frozen objects are never collected, it only pays off for weights shared by forked workers
+    if preloaded:
+        freeze_gc()
+    if model_pool_size is not None:
+        MODEL_POOL.size = model_pool_size
+    if warmup_fn is not None:
+        MODEL_POOL.warmup_fn = warmup_fn
+    if training_workers is not None:
+        TRAINING_QUEUE.workers = training_workers
+    if predict_batch_size is not None:
+        PREDICT_BATCHER.max_batch_size = predict_batch_size
+    if predict_batch_wait_ms is not None:
+        PREDICT_BATCHER.max_wait_ms = predict_batch_wait_ms
+
+    # warm up right away, except in the gunicorn master process: with --preload the app is created there
+    # before workers are forked, and each worker warms up after the fork instead, see post_fork()
+    MODEL_WARMUP.configure(lambda project_id, label_config: MODEL_POOL.warmup(MODEL_CLASS, project_id, label_config),
+                           enabled=warmup)
+    if not os.getenv('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        MODEL_WARMUP.start()
+
     return _server
 
 
+def post_fork(server=None, worker=None):
+    """
+    Start the model warm-up in a forked server process, e.g. in gunicorn.conf.py:
+
+        from label_studio_ml.api import post_fork
+    """
+    MODEL_WARMUP.start()
+
+
+def get_model(project_id, label_config=None):
+    """Get a model instance for the project from the per-process pool"""
+    return MODEL_POOL.get(MODEL_CLASS, project_id, label_config)
+
+
 @_server.route('/predict', methods=['POST'])
 @exception_handler
 def _predict():
@@ -47,27 +109,50 @@ def _predict():
                 'login': project.task_data_login,
                 'password': project.task_data_password,
                 'context': context,
+                'timeout': 30,  # optional, seconds, overridden by the X-Predict-Timeout header
             },
         }
 
     @return:
-    Predictions in LS format
+    Predictions in LS format, only for the first tasks if predict() stopped at the deadline
+    """
+    project_id, label_config, tasks, params, context = parse_predict_request(request.json)
+    try:
+        deadline = Deadline(parse_timeout(request.headers.get(TIMEOUT_HEADER), params))
+    except ValueError as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 400
+
+    try:
+        with deadline_scope(deadline):
+            # concurrent requests of the project may be merged into one predict() call, see PREDICT_BATCH_SIZE
+            model, response = PREDICT_BATCHER.predict(
+                lambda: get_model(project_id, label_config), project_id, label_config, tasks, params, context)
+    except DeadlineExceeded as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 504
+    results = format_predictions(model, response)
+
+    with time_stage('json_serialization'):
+        return jsonify({'results': results})
+
+
+def parse_predict_request(data):
+    """
+    Unpack the /predict request body
+
+    Returns:
+        tuple: (project_id, label_config, tasks, params, context)
     """
-    data = request.json
     tasks = data.get('tasks')
     label_config = data.get('label_config')
     project = str(data.get('project'))
     project_id = project.split('.', 1)[0] if project else None
     params = data.get('params', {})
     context = params.pop('context', {})
+    return project_id, label_config, tasks, params, context
 
-    model = MODEL_CLASS(project_id=project_id,
-                        label_config=label_config)
-
-    # model.use_label_config(label_config)
-
-    response = model.predict(tasks, context=context, **params)
 
+def format_predictions(model, response):
+    """Convert the result of predict() to the list of predictions returned by /predict"""
     # if there is no model version we will take the default
     if isinstance(response, ModelResponse):
         if not response.has_model_version():
@@ -77,7 +162,8 @@ def _predict():
         else:
             response.update_predictions_version()
 
-        response = response.model_dump()
+        with time_stage('model_dump'):
+            response = response.model_dump()
 
     res = response
     if res is None:
@@ -86,7 +172,7 @@ def _predict():
     if isinstance(res, dict):
         res = response.get("predictions", response)
 
-    return jsonify({'results': res})
+    return res
 
 
 @_server.route('/setup', methods=['POST'])
@@ -96,8 +182,7 @@ def _setup():
     project_id = data.get('project').split('.', 1)[0]
     label_config = data.get('schema')
     extra_params = data.get('extra_params')
-    model = MODEL_CLASS(project_id=project_id,
-                        label_config=label_config)
+    model = get_model(project_id, label_config)
 
     if extra_params:
         model.set_extra_params(extra_params)
@@ -122,8 +207,21 @@ def webhook():
         return jsonify({'status': 'Unknown event'}), 200
     project_id = str(data['project']['id'])
     label_config = data['project']['label_config']
-    model = MODEL_CLASS(project_id, label_config=label_config)
-    result = model.fit(event, data)
+
+    # train in background worker processes, Label Studio gets the job ID immediately
+    if TRAINING_QUEUE.enabled:
+        try:
+            job = TRAINING_QUEUE.submit(MODEL_CLASS, project_id, label_config, event, data)
+        except TrainingQueueFull as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 503
+        return jsonify({'job_id': job['job_id'], 'status': job['status']}), 201
+
+    model = get_model(project_id, label_config)
+    try:
+        result = model.fit(event, data)
+    finally:
+        # training usually changes the model state, next requests should load it again
+        MODEL_POOL.invalidate(project_id)
 
     try:
         response = jsonify({'result': result, 'status': 'ok'})
@@ -133,20 +231,53 @@ def webhook():
     return response, 201
 
 
+@_server.route('/jobs/<job_id>', methods=['GET'])
+@exception_handler
+def job_status(job_id):
+    status = TRAINING_QUEUE.get_status(job_id)
+    if status is None:
+        return jsonify({'error': f'Job {job_id} not found', 'status': 'error'}), 404
+    return jsonify(status)
+
+
 @_server.route('/health', methods=['GET'])
 @_server.route('/', methods=['GET'])
 @exception_handler
 def health():
+    # the process is alive even while the model warms up, readiness is reported separately
     return jsonify({
         'status': 'UP',
-        'model_class': MODEL_CLASS.__name__
+        'model_class': MODEL_CLASS.__name__,
+        **MODEL_WARMUP.to_dict(),
+    })
+
+
+@_server.route('/ready', methods=['GET'])
+@exception_handler
+def ready():
+    """Readiness probe for load balancers, 503 until the model of this process is warmed up"""
+    status = MODEL_WARMUP.to_dict()
+    return jsonify(status), 200 if status['ready'] else 503
+
+
+@_server.route('/models', methods=['GET'])
+@exception_handler
+def models():
+    """Weights loaded by the model class in this process, see LabelStudioMLBase.loaded_models()"""
+    return jsonify({
+        'model_class': MODEL_CLASS.__name__,
+        'models': MODEL_CLASS.loaded_models(),
     })
 
 
 @_server.route('/metrics', methods=['GET'])
 @exception_handler
 def metrics():
-    return jsonify({})
+    for cache in ('sqlite', 'media'):
+        hits = CACHE_REQUESTS.get(cache=cache, result='hit')
+        misses = CACHE_REQUESTS.get(cache=cache, result='miss')
+        CACHE_HIT_RATIO.set(hits / (hits + misses) if hits + misses else 0, cache=cache)
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 
 @_server.errorhandler(FileNotFoundError)
@@ -167,6 +298,33 @@ def index_error(error):
     return str(error), 500
 
 
+@_server.before_request
+def start_warmup():
+    # gunicorn workers forked without the post_fork hook warm up on their first request, usually a health check
+    MODEL_WARMUP.start()
+
+
+@_server.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.request_endpoint = request.endpoint or 'unknown'
+    REQUESTS_IN_PROGRESS.inc(endpoint=g.request_endpoint)
+
+
+@_server.after_request
+def record_request_metrics(response):
+    if 'request_start' in g:
+        REQUEST_LATENCY.observe(time.perf_counter() - g.request_start, endpoint=g.request_endpoint)
+        REQUESTS.inc(endpoint=g.request_endpoint, method=request.method, status=response.status_code)
+    return response
+
+
+@_server.teardown_request
+def finish_request_metrics(error=None):
+    if 'request_endpoint' in g:
+        REQUESTS_IN_PROGRESS.dec(endpoint=g.request_endpoint)
+
+
 def safe_str_cmp(a, b):
     return hmac.compare_digest(a, b)
 
@@ -180,15 +338,34 @@ def check_auth():
             return Response('Unauthorized', 401, {'WWW-Authenticate': 'Basic realm="Login required"'})
 
 
+def truncate_body(body: bytes, max_bytes: int = LOG_BODY_MAX_BYTES) -> str:
+    """Shorten a request or response body for logging"""
+    if max_bytes and len(body) > max_bytes:
+        return f'{body[:max_bytes]!r}... ({len(body)} bytes total)'
+    return repr(body)
+
+
+def should_log_body() -> bool:
+    # bodies can be megabytes of tasks and predictions, serializing them costs even with DEBUG disabled
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    if 'log_body' not in g:
+        g.log_body = LOG_BODY_SAMPLE_RATE >= 1 or random.random() < LOG_BODY_SAMPLE_RATE
+    return g.log_body
+
+
 @_server.before_request
 def log_request_info():
-    logger.debug('Request headers: %s', request.headers)
-    logger.debug('Request body: %s', request.get_data())
+    if should_log_body():
+        logger.debug('Request headers: %s', request.headers)
+        logger.debug('Request body: %s', truncate_body(request.get_data()))
 
 
 @_server.after_request
 def log_response_info(response):
-    logger.debug('Response status: %s', response.status)
-    logger.debug('Response headers: %s', response.headers)
-    logger.debug('Response body: %s', response.get_data())
+    if should_log_body():
+        logger.debug('Response status: %s', response.status)
+        logger.debug('Response headers: %s', response.headers)
+        if not response.is_streamed:
+            logger.debug('Response body: %s', truncate_body(response.get_data()))
     return response
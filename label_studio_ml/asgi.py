@@ -0,0 +1,256 @@
+"""
+ASGI server mode: the same routes as the Flask app in api.py, served by an ASGI server such as uvicorn.
+
+    # _asgi.py next to model.py
+    from label_studio_ml.asgi import init_asgi_app
+    from model import NewModel
+
+    app = init_asgi_app(model_class=NewModel)
+
+    # uvicorn _asgi:app --host 0.0.0.0 --port 9090
+
+/predict is handled on the event loop: `async def predict()` is awaited directly, so a request waiting
+for a slow LLM call or media download doesn't hold a thread. Sync `predict()` and model construction run
+in a bounded thread pool. All other routes are served by the Flask app in the same thread pool.
+"""
+import asyncio
+import base64
+import inspect
+import io
+import json
+import logging
+import os
+import sys
+import time
+import traceback as tb
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from . import api
+from .batching import call_predict
+from .deadline import Deadline, DeadlineExceeded, TIMEOUT_HEADER, deadline_scope, parse_timeout, run_with_deadline
+from .metrics import REQUESTS, REQUEST_LATENCY, REQUESTS_IN_PROGRESS, time_stage
+
+logger = logging.getLogger(__name__)
+
+# max number of threads running sync predict(), model construction and Flask routes
+ASGI_EXECUTOR_WORKERS = int(os.getenv('ASGI_EXECUTOR_WORKERS', os.getenv('THREADS', 8)))
+# max size of a request body
+ASGI_MAX_BODY_SIZE = int(os.getenv('ASGI_MAX_BODY_SIZE', 100 * 1024 * 1024))
+
+
+def init_asgi_app(model_class, basic_auth_user=None, basic_auth_pass=None,
+                  executor_workers: int = ASGI_EXECUTOR_WORKERS, **kwargs):
+    """
+    Create the ASGI application, the counterpart of `api.init_app()`.
+
+    Args:
+        model_class: LabelStudioMLBase subclass to serve.
+        basic_auth_user (str, optional): Basic auth user.
+        basic_auth_pass (str, optional): Basic auth password.
+        executor_workers (int): Number of threads for sync predict() and other routes.
+        kwargs: Other `api.init_app()` arguments.
+
+    Returns:
+        ASGIApp: ASGI application.
+    """
+    flask_app = api.init_app(model_class, basic_auth_user=basic_auth_user, basic_auth_pass=basic_auth_pass, **kwargs)
+    return ASGIApp(flask_app, executor_workers=executor_workers)
+
+
+class ASGIApp:
+
+    def __init__(self, flask_app, executor_workers: int = ASGI_EXECUTOR_WORKERS):
+        self.flask_app = flask_app
+        self.executor_workers = executor_workers
+        self._executor = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.executor_workers, thread_name_prefix='asgi')
+        return self._executor
+
+    async def run_sync(self, fn, *args, **kwargs):
+        """Run a blocking function in the bounded thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Unsupported ASGI scope type: {scope["type"]}')
+        # the native /predict route bypasses the Flask before_request hooks
+        api.MODEL_WARMUP.start()
+
+        body = await self._read_body(receive)
+        if body is None:
+            return await self._send(send, 413, b'Request body is too large', 'text/plain')
+
+        if scope['path'] == '/predict' and scope['method'] == 'POST':
+            status, content = await self._predict(scope, body)
+            return await self._send(send, status, content, 'application/json')
+
+        status, headers, content = await self.run_sync(self._call_flask, scope, body)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                api.MODEL_WARMUP.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_body(receive) -> Optional[bytes]:
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > ASGI_MAX_BODY_SIZE:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    @staticmethod
+    async def _send(send, status: int, content: bytes, content_type: str, headers: List[Tuple] = ()):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', content_type.encode()), (b'content-length', str(len(content)).encode()),
+                        *headers],
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def _predict(self, scope, body: bytes) -> Tuple[int, bytes]:
+        endpoint = '_predict'
+        start = time.perf_counter()
+        status = 500
+        REQUESTS_IN_PROGRESS.inc(endpoint=endpoint)
+        try:
+            if not self._authorized(scope):
+                status = 401
+                return status, json.dumps({'detail': 'Unauthorized'}).encode()
+
+            project_id, label_config, tasks, params, context = api.parse_predict_request(json.loads(body))
+            header = dict(scope['headers']).get(TIMEOUT_HEADER.lower().encode(), b'').decode('latin-1')
+            try:
+                deadline = Deadline(parse_timeout(header, params))
+            except ValueError as e:
+                status = 400
+                return status, json.dumps({'error': str(e), 'status': 'error'}).encode()
+            model = await self.run_sync(api.get_model, project_id, label_config)
+            # executor threads don't inherit the context of the request, the deadline is passed explicitly
+            if inspect.iscoroutinefunction(model.predict):
+                with deadline_scope(deadline), time_stage('predict'):
+                    deadline.check()
+                    response = await model.predict(tasks, context=context, **params)
+            elif api.PREDICT_BATCHER.enabled:
+                model, response = await self.run_sync(
+                    run_with_deadline, deadline, api.PREDICT_BATCHER.predict,
+                    lambda: model, project_id, label_config, tasks, params, context)
+            else:
+                response = await self.run_sync(run_with_deadline, deadline, call_predict, model, tasks, context, params)
+
+            results = api.format_predictions(model, response)
+            with time_stage('json_serialization'):
+                content = json.dumps({'results': results}).encode()
+            status = 200
+            return status, content
+
+        except DeadlineExceeded as e:
+            status = 504
+            return status, json.dumps({'error': str(e), 'status': 'error'}).encode()
+
+        except Exception as e:
+            # same body as exception_handler() of the Flask app
+            traceback = tb.format_exc()
+            logger.error(traceback)
+            return status, json.dumps({
+                'status': status,
+                'detail': e.__class__.__name__ + ': ' + str(e),
+                'request': {},
+                'result': {'traceback': traceback},
+            }).encode()
+
+        finally:
+            REQUESTS_IN_PROGRESS.dec(endpoint=endpoint)
+            REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+            REQUESTS.inc(endpoint=endpoint, method='POST', status=status)
+
+    @staticmethod
+    def _authorized(scope) -> bool:
+        if api.BASIC_AUTH is None:
+            return True
+        header = dict(scope['headers']).get(b'authorization', b'')
+        if not header.lower().startswith(b'basic '):
+            return False
+        try:
+            username, _, password = base64.b64decode(header[6:]).decode('utf-8').partition(':')
+        except ValueError:
+            return False
+        return api.safe_str_cmp(username, api.BASIC_AUTH[0]) and api.safe_str_cmp(password, api.BASIC_AUTH[1])
+
+    def _call_flask(self, scope, body: bytes):
+        """Serve the request with the Flask app, runs in the thread pool"""
+        environ = self._make_environ(scope, body)
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+        result = self.flask_app.wsgi_app(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], content
+
+    @staticmethod
+    def _make_environ(scope, body: bytes) -> Dict:
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'],
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = 'HTTP_' + name
+                environ[key] = environ[key] + ',' + value if key in environ else value
+        return environ
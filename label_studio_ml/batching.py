@@ -0,0 +1,217 @@
+import asyncio
+import inspect
+import json
+import logging
+import os
+import time
+
+from threading import Condition, Event, Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .deadline import get_deadline
+from .metrics import REGISTRY, time_stage
+from .response import ModelResponse
+from .utils import get_label_config_hash
+
+logger = logging.getLogger(__name__)
+
+# max number of tasks merged into one predict() call, 0 or 1 disables batching
+PREDICT_BATCH_SIZE = int(os.getenv('PREDICT_BATCH_SIZE', 0))
+# the first request of a batch waits at most this many milliseconds for other requests to join
+PREDICT_BATCH_WAIT_MS = float(os.getenv('PREDICT_BATCH_WAIT_MS', 10))
+
+BATCH_SIZE = REGISTRY.histogram(
+    'label_studio_ml_predict_batch_size', 'Number of tasks passed to one predict() call by the batcher',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+
+def call_predict(model, tasks: List, context: Optional[Dict], params: Dict):
+    """Call model.predict() from a sync thread, `async def predict` is run to completion in a new event loop"""
+    # the budget may be gone already, e.g. waiting for a batch or for the model construction
+    get_deadline().check()
+    with time_stage('predict'):
+        response = model.predict(tasks, context=context, **params)
+        if inspect.isawaitable(response):
+            response = asyncio.run(response)
+    return response
+
+
+class _Batch:
+
+    def __init__(self):
+        self.tasks = []
+        # (start, end) slices of self.tasks belonging to each caller
+        self.slices = []
+        self.closed = False
+        self.done = Event()
+        self.results = None
+        self.error = None
+
+    def add(self, tasks: List) -> int:
+        self.slices.append((len(self.tasks), len(self.tasks) + len(tasks)))
+        self.tasks.extend(tasks)
+        return len(self.slices) - 1
+
+
+def split_response(response, sizes: List[int], partial: bool = False) -> Optional[List]:
+    """
+    Split the result of one predict() call over merged tasks back into per-caller results.
+
+    Args:
+        response: ModelResponse, list of predictions or dict with "predictions".
+        sizes (list): Number of tasks of each caller, in the order the tasks were merged.
+        partial (bool): Predictions may cover only the first tasks, e.g. predict() stopped at the deadline.
+
+    Returns:
+        list: Result for each caller of the same type as `response`,
+            or None if predictions don't match tasks one to one and can't be split.
+    """
+    if isinstance(response, ModelResponse):
+        predictions = response.predictions
+    elif isinstance(response, dict):
+        predictions = response.get('predictions')
+    else:
+        predictions = response
+
+    if not isinstance(predictions, list) or len(predictions) > sum(sizes) or (
+            len(predictions) < sum(sizes) and not partial):
+        return None
+
+    results, start = [], 0
+    for size in sizes:
+        part = predictions[start:start + size]
+        start += size
+        if isinstance(response, ModelResponse):
+            part = ModelResponse(model_version=response.model_version, predictions=part)
+        elif isinstance(response, dict):
+            part = dict(response, predictions=part)
+        results.append(part)
+    return results
+
+
+class PredictBatcher:
+    """
+    Merges concurrent /predict requests with the same project, label config and params
+    into one `predict()` call.
+
+    Label Studio sends one request per task when annotators open tasks, but most backends
+    are much faster on a list of tasks. The first request of a batch waits up to `max_wait_ms`
+    for other requests to join it, then calls `predict()` with all collected tasks in the thread
+    of this first request, and every caller gets back predictions for its own tasks.
+    A batch is flushed earlier once it holds `max_batch_size` tasks.
+
+    Batching is disabled by default, set PREDICT_BATCH_SIZE > 1 to enable it.
+    """
+
+    def __init__(self, max_batch_size: int = PREDICT_BATCH_SIZE, max_wait_ms: float = PREDICT_BATCH_WAIT_MS):
+        """
+        Args:
+            max_batch_size (int): Maximum number of tasks in one predict() call, 0 or 1 disables batching.
+            max_wait_ms (float): How long the first request of a batch waits for others to join.
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._batches: Dict[Tuple, _Batch] = {}
+        self._lock = Lock()
+        self._cond = Condition(self._lock)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch_size > 1
+
+    @staticmethod
+    def make_key(project_id, label_config: Optional[str], params: Dict,
+                 timeout: Optional[float] = None) -> Optional[Tuple]:
+        """Requests are merged only if their keys are equal, None if the params can't be compared.
+        The timeout is a part of the key: the batch runs under the deadline of its first request,
+        which is then no later than the deadlines of the others.
+        """
+        try:
+            params_key = json.dumps(params, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+        return str(project_id or ''), get_label_config_hash(label_config), params_key, timeout
+
+    def predict(self, model_fn: Callable, project_id, label_config: Optional[str], tasks: List,
+                params: Dict, context: Optional[Dict] = None):
+        """
+        Run prediction for the tasks, merged with tasks of concurrent requests if possible.
+
+        Args:
+            model_fn (callable): Returns the model instance to predict with, called once per batch.
+            project_id: Label Studio project ID.
+            label_config (str, optional): Label config XML.
+            tasks (list): Tasks of this request.
+            params (dict): Extra predict() params, only requests with equal params and timeouts are merged.
+            context (dict, optional): Interactive annotation context, such requests are never merged.
+
+        Returns:
+            tuple: (model, result of predict() for this request's tasks)
+        """
+        deadline = get_deadline()
+        key = self.make_key(project_id, label_config, params, deadline.timeout) if self.enabled else None
+        if key is None or context or not tasks or len(tasks) >= self.max_batch_size:
+            model = model_fn()
+            return model, call_predict(model, tasks, context, params)
+
+        with self._lock:
+            batch = self._batches.get(key)
+            if batch is None or batch.closed or len(batch.tasks) + len(tasks) > self.max_batch_size:
+                if batch is not None:
+                    # flush the full batch now, its leader is still waiting for more tasks
+                    self._close(key, batch)
+                batch = self._batches[key] = _Batch()
+            index = batch.add(tasks)
+            leader = index == 0
+            if len(batch.tasks) >= self.max_batch_size:
+                self._close(key, batch)
+
+            if leader:
+                flush_at = time.monotonic() + self.max_wait_ms / 1000
+                while not batch.closed:
+                    remaining = flush_at - time.monotonic()
+                    if remaining <= 0:
+                        self._close(key, batch)
+                        break
+                    self._cond.wait(remaining)
+
+        if leader:
+            self._run(batch, model_fn, params)
+        else:
+            # predict() may run past the deadline, the caller doesn't wait longer than its own budget
+            while not batch.done.wait(deadline.remaining if deadline.timeout else None):
+                deadline.check()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+    def _close(self, key, batch: _Batch):
+        """Stop accepting requests into the batch, must be called under the lock"""
+        batch.closed = True
+        if self._batches.get(key) is batch:
+            del self._batches[key]
+        self._cond.notify_all()
+
+    def _run(self, batch: _Batch, model_fn: Callable, params: Dict):
+        try:
+            model = model_fn()
+            BATCH_SIZE.observe(len(batch.tasks))
+            if len(batch.slices) > 1:
+                logger.debug(f'Predicting a batch of {len(batch.tasks)} tasks from {len(batch.slices)} requests')
+            response = call_predict(model, batch.tasks, {}, params)
+
+            parts = split_response(response, [end - start for start, end in batch.slices],
+                                   partial=get_deadline().expired)
+            if parts is None:
+                # predictions can't be matched to tasks, fall back to a call per request
+                logger.warning('Model returned a different number of predictions than tasks, '
+                               'predicting batched requests one by one')
+                parts = []
+                for start, end in batch.slices:
+                    parts.append(call_predict(model, batch.tasks[start:end], {}, params))
+            batch.results = [(model, part) for part in parts]
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
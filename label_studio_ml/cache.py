@@ -1,8 +1,14 @@
 import os
 import sqlite3
+import threading
 from abc import ABC, abstractmethod
 from threading import Lock
-from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from .metrics import CACHE_REQUESTS
+
+# max number of values kept in memory by SqliteCache, the read cache is dropped when it's exceeded
+READ_CACHE_SIZE = 10000
 
 
 class BaseCache(ABC):
@@ -43,68 +49,336 @@ class BaseCache(ABC):
         :return:
         """
 
+    def get_many(self, project_id, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Get multiple values of the project from cache
+        :param project_id: project ID
+        :param keys: keys to get
+        :return: dict {key: value}, value is None for missing keys
+        """
+        return {key: self[project_id, key] for key in keys}
+
+    def set_many(self, project_id, values: Dict[str, str]):
+        """
+        Set multiple values of the project to cache
+        :param project_id: project ID
+        :param values: dict {key: value}
+        :return:
+        """
+        for key, value in values.items():
+            self[project_id, key] = value
+
+    def shared_spec(self) -> Optional[Tuple[str, str, Dict]]:
+        """
+        Arguments of create_cache() that open the same cache in another process, e.g. a training worker
+        :return: tuple (cache_type, path, kwargs), None if the cache can't be shared between processes
+        """
+        return None
+
 
 class SqliteCache(BaseCache):
-    def __init__(self, path: str, db_name: str = 'cache.db'):
+    """
+    SQLite cache shared by all server processes using the same database file.
+
+    Every thread keeps its own persistent connection, and the database works in WAL mode,
+    so readers don't block each other or the writer. Values are also kept in an in-memory
+    read cache, which is dropped whenever `PRAGMA data_version` reports that another
+    connection (another thread or another gunicorn worker) has committed a change.
+    """
+
+    def __init__(self, path: str, db_name: str = 'cache.db', timeout: float = 30.0):
         super(SqliteCache, self).__init__(path)
         os.makedirs(self.path, exist_ok=True)
         self.db_name = os.path.join(self.path, db_name)
+        self.timeout = timeout
         self.lock = Lock()
+        self._local = threading.local()
+        self._read_cache = {}
+        self._generation = 0
 
         # Establish a connection and create table if it doesn't exist
-        with self.lock, sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL;')
+        with conn:
+            conn.execute('''
                 CREATE TABLE IF NOT EXISTS cache (
                     project_id TEXT NOT NULL,
-                    key TEXT NOT NULL,  
+                    key TEXT NOT NULL,
                     value TEXT NOT NULL,
                     PRIMARY KEY (project_id, key)
                 );
             ''')
 
-    @lru_cache(maxsize=100)
+    def shared_spec(self):
+        return 'sqlite', self.path, {'db_name': os.path.basename(self.db_name), 'timeout': self.timeout}
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the current thread, connections are not reused across fork()"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_name, timeout=self.timeout)
+            conn.execute('PRAGMA synchronous=NORMAL;')
+            local.conn = conn
+            local.pid = os.getpid()
+            local.data_version = None
+        return local.conn
+
+    @staticmethod
+    def _data_version(conn: sqlite3.Connection) -> int:
+        return conn.execute('PRAGMA data_version;').fetchone()[0]
+
+    def _validate_read_cache(self, data_version: int):
+        """Drop the read cache if another connection has changed the database,
+        must be called under the lock"""
+        # a new connection doesn't know what happened before it was opened, so it drops the cache too
+        if data_version != self._local.data_version or len(self._read_cache) > READ_CACHE_SIZE:
+            self._read_cache.clear()
+            self._local.data_version = data_version
+            self._generation += 1
+
     def __getitem__(self, project_id_key):
-        project_id, key = project_id_key
-        with self.lock, sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT value FROM cache WHERE project_id = ? AND key = ?;',
-                (project_id, key))
-            result = cursor.fetchone()
-            if result is None:
-                return result
-            return result[0]
+        return self.get_many(project_id_key[0], (project_id_key[1],))[project_id_key[1]]
+
+    def get_many(self, project_id, keys):
+        keys = list(keys)
+        conn = self._connection()
+        data_version = self._data_version(conn)
+        with self.lock:
+            self._validate_read_cache(data_version)
+            values = {key: self._read_cache[project_id, key] for key in keys if (project_id, key) in self._read_cache}
+            generation = self._generation
+        missing = [key for key in keys if key not in values]
+        CACHE_REQUESTS.inc(len(keys) - len(missing), cache='sqlite', result='hit')
+        if missing:
+            CACHE_REQUESTS.inc(len(missing), cache='sqlite', result='miss')
+            # the query runs outside of the lock on the connection of this thread, so reads are concurrent
+            placeholders = ', '.join('?' * len(missing))
+            rows = conn.execute(
+                f'SELECT key, value FROM cache WHERE project_id = ? AND key IN ({placeholders});',
+                (project_id, *missing)).fetchall()
+            found = dict(rows)
+            loaded = {key: found.get(key) for key in missing}
+            with self.lock:
+                # skip caching if the database has been changed meanwhile, the values may be stale
+                if generation == self._generation:
+                    self._read_cache.update({(project_id, key): value for key, value in loaded.items()})
+            values.update(loaded)
+        return {key: values[key] for key in keys}
 
     def __setitem__(self, project_id_key, value):
         project_id, key = project_id_key
+        self.set_many(project_id, {key: value})
+
+    def set_many(self, project_id, values):
+        for value in values.values():
+            if not isinstance(value, str):
+                raise ValueError('Value must be a string')
+        with self.lock:
+            conn = self._connection()
+            self._validate_read_cache(self._data_version(conn))
+            with conn:
+                conn.executemany('REPLACE INTO cache (project_id, key, value) VALUES (?, ?, ?);',
+                                 [(project_id, key, value) for key, value in values.items()])
+            for key, value in values.items():
+                self._read_cache[project_id, key] = value
+            # values read before the change must not be put into the read cache after it
+            self._generation += 1
+
+    def __delitem__(self, project_id_key):
+        project_id, key = project_id_key
+        with self.lock:
+            conn = self._connection()
+            self._validate_read_cache(self._data_version(conn))
+            with conn:
+                conn.execute('DELETE FROM cache WHERE project_id = ? AND key = ?;',
+                             (project_id, key))
+            self._read_cache[project_id, key] = None
+            self._generation += 1
+
+    def __contains__(self, project_id_key):
+        return self[project_id_key] is not None
+
+
+class MemoryCache(BaseCache):
+    """
+    In-process dictionary cache. It's the fastest option, but values are neither persisted
+    nor shared between processes, so use it only with a single worker (WORKERS=1).
+    """
+
+    def __init__(self, path: str = None):
+        super(MemoryCache, self).__init__(path)
+        self.lock = Lock()
+        self._data = {}
+
+    def __getitem__(self, project_id_key):
+        return self._data.get(project_id_key)
+
+    def get_many(self, project_id, keys):
+        return {key: self._data.get((project_id, key)) for key in keys}
+
+    def __setitem__(self, project_id_key, value):
         if not isinstance(value, str):
             raise ValueError('Value must be a string')
-        with self.lock, sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute('REPLACE INTO cache (project_id, key, value) VALUES (?, ?, ?);',
-                           (project_id, key, value))
-        self.__getitem__.cache_clear()
+        with self.lock:
+            self._data[project_id_key] = value
+
+    def set_many(self, project_id, values):
+        for value in values.values():
+            if not isinstance(value, str):
+                raise ValueError('Value must be a string')
+        with self.lock:
+            self._data.update({(project_id, key): value for key, value in values.items()})
+
+    def __delitem__(self, project_id_key):
+        with self.lock:
+            self._data.pop(project_id_key, None)
+
+    def __contains__(self, project_id_key):
+        return project_id_key in self._data
+
+
+class LmdbCache(BaseCache):
+    """
+    Memory-mapped key-value file cache based on LMDB (`pip install lmdb`).
+    Reads are served from the shared memory map without locks or syscalls,
+    and the file can be shared by all server processes.
+    """
+
+    def __init__(self, path: str, db_name: str = 'cache.lmdb', map_size: int = 2 ** 30):
+        super(LmdbCache, self).__init__(path)
+        try:
+            import lmdb
+        except ImportError:
+            raise ImportError('LMDB cache requires the "lmdb" package: pip install lmdb')
+
+        os.makedirs(self.path, exist_ok=True)
+        self.db_name = os.path.join(self.path, db_name)
+        self.map_size = map_size
+        self._lmdb = lmdb
+        self._env = None
+        self._pid = None
+
+    @property
+    def env(self):
+        # LMDB environments must not be used after fork(), open a new one in every process
+        if self._pid != os.getpid():
+            self._env = self._lmdb.open(self.db_name, map_size=self.map_size, subdir=True, lock=True)
+            self._pid = os.getpid()
+        return self._env
+
+    def shared_spec(self):
+        return 'lmdb', self.path, {'db_name': os.path.basename(self.db_name), 'map_size': self.map_size}
+
+    @staticmethod
+    def _key(project_id, key) -> bytes:
+        return f'{project_id}\x00{key}'.encode('utf-8')
+
+    def __getitem__(self, project_id_key):
+        with self.env.begin() as txn:
+            value = txn.get(self._key(*project_id_key))
+        return value.decode('utf-8') if value is not None else None
+
+    def get_many(self, project_id, keys):
+        result = {}
+        with self.env.begin() as txn:
+            for key in keys:
+                value = txn.get(self._key(project_id, key))
+                result[key] = value.decode('utf-8') if value is not None else None
+        return result
+
+    def __setitem__(self, project_id_key, value):
+        self.set_many(project_id_key[0], {project_id_key[1]: value})
+
+    def set_many(self, project_id, values):
+        for value in values.values():
+            if not isinstance(value, str):
+                raise ValueError('Value must be a string')
+        with self.env.begin(write=True) as txn:
+            for key, value in values.items():
+                txn.put(self._key(project_id, key), value.encode('utf-8'))
 
     def __delitem__(self, project_id_key):
+        with self.env.begin(write=True) as txn:
+            txn.delete(self._key(*project_id_key))
+
+    def __contains__(self, project_id_key):
+        return self[project_id_key] is not None
+
+
+class RedisCache(BaseCache):
+    """
+    Cache stored in any server speaking the Redis protocol (Redis, Valkey, KeyDB, Dragonfly, etc.),
+    requires the "redis" package. Every project is stored as a hash, so get_many is a single HMGET.
+    The server URL is taken from the `url` argument or REDIS_URL environment variable.
+    """
+
+    def __init__(self, path: str = None, url: str = None, prefix: str = 'label-studio-ml', client=None):
+        super(RedisCache, self).__init__(path)
+        self.prefix = prefix
+        # a client passed by the caller can't be recreated in another process
+        self.url = None
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ImportError('Redis cache requires the "redis" package: pip install redis')
+            self.url = url or os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+            # the client keeps a thread-safe connection pool
+            client = redis.Redis.from_url(self.url)
+        self.client = client
+
+    def shared_spec(self):
+        if self.url is None:
+            return None
+        return 'redis', self.path, {'url': self.url, 'prefix': self.prefix}
+
+    def _name(self, project_id) -> str:
+        return f'{self.prefix}:{project_id}'
+
+    @staticmethod
+    def _decode(value):
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def __getitem__(self, project_id_key):
         project_id, key = project_id_key
-        with self.lock, sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM cache WHERE project_id = ? AND key = ?;',
-                           (project_id, key))
-        self.__getitem__.cache_clear()
+        return self._decode(self.client.hget(self._name(project_id), key))
+
+    def get_many(self, project_id, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.client.hmget(self._name(project_id), keys)
+        return {key: self._decode(value) for key, value in zip(keys, values)}
+
+    def __setitem__(self, project_id_key, value):
+        self.set_many(project_id_key[0], {project_id_key[1]: value})
+
+    def set_many(self, project_id, values):
+        for value in values.values():
+            if not isinstance(value, str):
+                raise ValueError('Value must be a string')
+        if values:
+            self.client.hset(self._name(project_id), mapping=values)
+
+    def __delitem__(self, project_id_key):
+        project_id, key = project_id_key
+        self.client.hdel(self._name(project_id), key)
 
     def __contains__(self, project_id_key):
         project_id, key = project_id_key
-        with self.lock, sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT 1 FROM cache WHERE project_id = ? AND key = ?;',
-                           (project_id, key))
-            return cursor.fetchone() is not None
+        return bool(self.client.hexists(self._name(project_id), key))
+
+
+CACHE_TYPES = {
+    'sqlite': SqliteCache,
+    'memory': MemoryCache,
+    'lmdb': LmdbCache,
+    'redis': RedisCache,
+}
 
 
 def create_cache(cache_type, path, **kwargs):
-    if cache_type == 'sqlite':
-        return SqliteCache(path, **kwargs)
+    if cache_type in CACHE_TYPES:
+        return CACHE_TYPES[cache_type](path, **kwargs)
     else:
         raise ValueError(f"Unsupported cache type: {cache_type}")
@@ -0,0 +1,99 @@
+"""
+Deadlines of /predict requests.
+
+Label Studio stops waiting for slow predictions, but the server keeps computing them. A request can carry
+a time budget in the `X-Predict-Timeout` header or the `timeout` param (seconds), PREDICT_TIMEOUT sets
+the default. The deadline of the current request is visible to `predict()` as `self.deadline`:
+loops over tasks check `self.deadline.expired` between tasks, stop early and return predictions
+of the tasks finished so far.
+"""
+import contextlib
+import math
+import os
+import time
+
+from contextvars import ContextVar
+from typing import Optional
+
+# default time budget of a /predict request in seconds, 0 means no deadline
+PREDICT_TIMEOUT = float(os.getenv('PREDICT_TIMEOUT', 0))
+TIMEOUT_HEADER = 'X-Predict-Timeout'
+TIMEOUT_PARAM = 'timeout'
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    """Point in time a request should be finished by, a deadline without timeout never expires"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        """
+        Args:
+            timeout (float, optional): Seconds from now, None or 0 for no deadline.
+        """
+        self.timeout = timeout or None
+        self.expires_at = time.monotonic() + self.timeout if self.timeout else math.inf
+
+    @property
+    def remaining(self) -> float:
+        """Seconds left, 0 if expired and inf without deadline"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self):
+        """Raise DeadlineExceeded if the deadline has passed"""
+        if self.expired:
+            raise DeadlineExceeded(f'Deadline of {self.timeout:g}s exceeded')
+
+    def __repr__(self):
+        return f'Deadline(timeout={self.timeout}, remaining={self.remaining:.3f})'
+
+
+NO_DEADLINE = Deadline()
+_deadline: ContextVar[Deadline] = ContextVar('deadline', default=NO_DEADLINE)
+
+
+def get_deadline() -> Deadline:
+    """Deadline of the request being processed, one that never expires outside of requests"""
+    return _deadline.get()
+
+
+@contextlib.contextmanager
+def deadline_scope(deadline: Deadline):
+    """Make the deadline current for the code in the block"""
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def parse_timeout(header: Optional[str], params: dict) -> Optional[float]:
+    """
+    Read the time budget of a request, the header takes precedence over the param, the param over PREDICT_TIMEOUT.
+    The param is removed from `params`, so it isn't passed to predict().
+
+    Returns:
+        float: Seconds, or None for no deadline.
+    """
+    value = params.pop(TIMEOUT_PARAM, None)
+    if header:
+        value = header
+    if value is None:
+        return PREDICT_TIMEOUT or None
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid timeout {value!r}, expected a number of seconds')
+    return timeout if timeout > 0 else None
+
+
+def run_with_deadline(deadline: Deadline, fn, *args, **kwargs):
+    """Call the function with the deadline current, for threads that don't inherit the caller's context"""
+    with deadline_scope(deadline):
+        return fn(*args, **kwargs)
@@ -5,7 +5,7 @@ import pathlib
 import label_studio_sdk
 
 from typing import List, Dict, Optional
-from label_studio_ml.model import LabelStudioMLBase
+from label_studio_ml.model import LabelStudioMLBase, PreloadError
 from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer, Trainer, TrainingArguments
 from transformers import pipeline
 from label_studio_sdk.label_interface.objects import PredictionValue
@@ -101,11 +101,21 @@ class BertClassifier(LabelStudioMLBase):
 
         li = self.label_interface
         from_name, to_name, value = li.get_first_tag_occurence('Choices', 'Text')
-        texts = [self.preload_task_data(task, task['data'][value]) for task in tasks]
-
-        model_predictions = self._model(texts)
+        failed = set()
+        try:
+            texts = self.preload_tasks_data(tasks, [task['data'][value] for task in tasks])
+        except PreloadError as e:
+            # tasks whose text couldn't be downloaded get empty predictions, the others are predicted
+            texts, failed = e.values, set(e.errors)
+
+        loaded_texts = [text for i, text in enumerate(texts) if i not in failed]
+        model_predictions = iter(self._model(loaded_texts) if loaded_texts else [])
         predictions = []
-        for prediction in model_predictions:
+        for i in range(len(tasks)):
+            if i in failed:
+                predictions.append(PredictionValue(score=0, result=[], model_version=self.get('model_version')))
+                continue
+            prediction = next(model_predictions)
             logger.debug(f"Prediction: {prediction}")
             region = li.get_tag(from_name).label(prediction['label'])
             pv = PredictionValue(
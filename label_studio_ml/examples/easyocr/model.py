@@ -178,6 +178,10 @@ class EasyOCR(LabelStudioMLBase):
             # if is_skipped(task):
             #     continue
 
+            if self.deadline.expired:
+                logger.warning(f'Deadline exceeded, returning predictions for {len(predictions)} of {len(tasks)} tasks')
+                break
+
             prediction = self.predict_single(task)
             if prediction:
                 predictions.append(prediction)
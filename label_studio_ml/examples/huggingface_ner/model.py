@@ -5,7 +5,7 @@ import label_studio_sdk
 import logging
 
 from typing import List, Dict, Optional
-from label_studio_ml.model import LabelStudioMLBase
+from label_studio_ml.model import LabelStudioMLBase, PreloadError
 from label_studio_ml.response import ModelResponse
 from transformers import pipeline, Pipeline
 from itertools import groupby
@@ -68,10 +68,14 @@ class HuggingFaceNER(LabelStudioMLBase):
         """
         li = self.label_interface
         from_name, to_name, value = li.get_first_tag_occurence('Labels', 'Text')
-        texts = [self.preload_task_data(task, task['data'][value]) for task in tasks]
+        try:
+            texts = self.preload_tasks_data(tasks, [task['data'][value] for task in tasks])
+        except PreloadError as e:
+            # tasks whose text couldn't be downloaded are skipped like tasks without entities
+            texts = [text for i, text in enumerate(e.values) if i not in e.errors]
 
         # run predictions
-        model_predictions = _model(texts)
+        model_predictions = _model(texts) if texts else []
 
         predictions = []
         for prediction in model_predictions:
@@ -7,9 +7,10 @@ from ultralytics import YOLO
 
 from label_studio_ml.model import LabelStudioMLBase
 from label_studio_ml.utils import DATA_UNDEFINED_NAME
-from label_studio_sdk._extensions.label_studio_tools.core.utils.io import get_local_path
+from label_studio_ml.media_cache import get_local_path
 from label_studio_sdk.label_interface.control_tags import ControlTag
 from label_studio_sdk.label_interface import LabelInterface
+from control_models.registry import ModelRegistry
 
 
 # use matplotlib plots for debug
@@ -24,8 +25,8 @@ ALLOW_CUSTOM_MODEL_PATH = os.getenv("ALLOW_CUSTOM_MODEL_PATH", "true").lower() i
     "true",
 ]
 
-# Global cache for YOLO models
-_model_cache = {}
+# Global cache for YOLO models, bounded by MODEL_CACHE_SIZE and MODEL_CACHE_MB
+_model_cache = ModelRegistry()
 logger = logging.getLogger(__name__)
 
 
@@ -57,6 +58,8 @@ class ControlModel(BaseModel):
     value: str
     model: YOLO
     model_path: ClassVar[str]
+    # the control converts results of one image with create_regions(), see InferencePlanner
+    shared_inference: ClassVar[bool] = False
     model_score_threshold: float = 0.5
     label_map: Optional[Dict[str, str]] = {}
     label_studio_ml_backend: LabelStudioMLBase
@@ -141,9 +144,7 @@ class ControlModel(BaseModel):
 
     @classmethod
     def get_cached_model(cls, path: str) -> YOLO:
-        if path not in _model_cache:
-            _model_cache[path] = cls.load_yolo_model(path)
-        return _model_cache[path]
+        return _model_cache.get_or_load(path, cls.load_yolo_model)
 
     def debug_plot(self, image):
         if not DEBUG_PLOT:
@@ -162,6 +163,15 @@ class ControlModel(BaseModel):
         Args:
             path (str): Path to the file with media
         """
+        return self.create_regions(self.model.predict(path), path)
+
+    def create_regions(self, results, path) -> List[Dict]:
+        """Convert YOLO results of one image to Label Studio regions.
+        Controls implementing it let InferencePlanner run their model once for all controls using it.
+        Args:
+            results: YOLO results, a list with the results of the image
+            path (str): Path to the image
+        """
         raise NotImplementedError("This method should be overridden in derived classes")
 
     def fit(self, event, data, **kwargs):
@@ -15,6 +15,7 @@ class ChoicesModel(ControlModel):
 
     type = "Choices"
     model_path = "yolov8n-cls.pt"
+    shared_inference = True
 
     @classmethod
     def is_control_matched(cls, control) -> bool:
@@ -24,8 +25,7 @@ class ChoicesModel(ControlModel):
         # support both Choices and Taxonomy because of their similarity
         return control.tag in [cls.type, "Taxonomy"]
 
-    def predict_regions(self, path) -> List[Dict]:
-        results = self.model.predict(path)
+    def create_regions(self, results, path) -> List[Dict]:
         self.debug_plot(results[0].plot())
         return self.create_choices(results, path)
 
@@ -14,6 +14,7 @@ class KeypointLabelsModel(ControlModel):
     model_path = (
         "yolov8n-pose.pt"  # Adjust the model path to your keypoint detection model
     )
+    shared_inference = True
     add_bboxes: bool = True
     point_size: float = 1
     point_threshold: float = 0
@@ -59,8 +60,7 @@ class KeypointLabelsModel(ControlModel):
             )
         return mapping
 
-    def predict_regions(self, path) -> List[Dict]:
-        results = self.model.predict(path)
+    def create_regions(self, results, path) -> List[Dict]:
         return self.create_keypoints(results, path)
 
     def create_keypoints(self, results, path):
@@ -0,0 +1,114 @@
+import os
+import logging
+
+from collections import defaultdict
+from typing import List, Dict
+
+from ultralytics.utils.patches import imread
+
+from control_models.base import ControlModel
+
+
+# number of tasks whose images are decoded and passed to one YOLO predict() call
+INFERENCE_BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", 8))
+logger = logging.getLogger(__name__)
+
+
+class InferencePlanner:
+    """
+    Plans YOLO inference for all control models of a labeling config.
+
+    Controls with `shared_inference` (image controls) often use the same YOLO model,
+    e.g. RectangleLabels and PolygonLabels both with model_path="yolov8n-seg.pt",
+    and always read the same image. The planner decodes every image once,
+    runs every model once per chunk of tasks, and passes the results to each control's
+    `create_regions()`. Other controls (video, timeline) predict task by task with `predict_regions()`.
+    """
+
+    def __init__(
+        self, control_models: List[ControlModel], batch_size: int = INFERENCE_BATCH_SIZE
+    ):
+        self.control_models = control_models
+        self.batch_size = max(batch_size, 1)
+        # controls sharing one cached YOLO instance run it once
+        self.model_groups = defaultdict(list)
+        for index, control in enumerate(control_models):
+            if control.shared_inference:
+                self.model_groups[id(control.model)].append(index)
+
+    def chunks(self, tasks: List[Dict]):
+        for start in range(0, len(tasks), self.batch_size):
+            yield tasks[start : start + self.batch_size]
+
+    def predict(self, tasks: List[Dict]) -> List[List[Dict]]:
+        """Predict regions of a chunk of tasks.
+        Returns:
+            List[List[Dict]]: Regions of each task, ordered by control like in the labeling config
+        """
+        # regions[task][control]
+        regions = [[[] for _ in self.control_models] for _ in tasks]
+
+        if self.model_groups:
+            self.predict_shared(tasks, regions)
+
+        for index, control in enumerate(self.control_models):
+            if control.shared_inference:
+                continue
+            for task_regions, task in zip(regions, tasks):
+                task_regions[index] = control.predict_regions(control.get_path(task))
+
+        return [sum(task_regions, []) for task_regions in regions]
+
+    def predict_shared(self, tasks: List[Dict], regions: List[List[List[Dict]]]):
+        # paths[task][control], controls of one object tag read the same path
+        paths = [
+            {
+                index: self.control_models[index].get_path(task)
+                for indexes in self.model_groups.values()
+                for index in indexes
+            }
+            for task in tasks
+        ]
+        images = self.decode({path for task_paths in paths for path in task_paths.values()})
+
+        for indexes in self.model_groups.values():
+            model = self.control_models[indexes[0]].model
+            results = self.run_model(
+                model, {paths[t][i] for t in range(len(tasks)) for i in indexes}, images
+            )
+            for t, task_paths in enumerate(paths):
+                for index in indexes:
+                    path = task_paths[index]
+                    control = self.control_models[index]
+                    regions[t][index] = control.create_regions([results[path]], path)
+
+    @staticmethod
+    def decode(paths) -> Dict:
+        """Read every image once, the same way as ultralytics does for paths.
+        Images OpenCV can't read stay paths and are left to ultralytics loaders.
+        """
+        images = {}
+        for path in paths:
+            image = imread(path)
+            images[path] = path if image is None else image
+        return images
+
+    @staticmethod
+    def run_model(model, paths, images) -> Dict:
+        """Run the model on the images and return results by path.
+        Images are grouped by shape: ultralytics letterboxes a batch of images with equal shapes
+        to the minimal padded size, like a single image, and pads mixed shapes to the full square.
+        Grouping keeps results the same as of one predict() call per image.
+        """
+        groups = defaultdict(list)
+        for path in paths:
+            image = images[path]
+            groups[path if isinstance(image, str) else image.shape].append(path)
+
+        results = {}
+        for group in groups.values():
+            sources = [images[path] for path in group]
+            logger.debug(f"Run YOLO model on {len(sources)} images")
+            for path, result in zip(group, model.predict(sources if len(sources) > 1 else sources[0])):
+                results[path] = result
+        return results
@@ -14,6 +14,7 @@ class PolygonLabelsModel(ControlModel):
 
     type = "PolygonLabels"
     model_path = "yolov8n-seg.pt"
+    shared_inference = True
 
     @classmethod
     def is_control_matched(cls, control) -> bool:
@@ -22,8 +23,7 @@ class PolygonLabelsModel(ControlModel):
             return False
         return control.tag == cls.type
 
-    def predict_regions(self, path) -> List[Dict]:
-        results = self.model.predict(path)
+    def create_regions(self, results, path) -> List[Dict]:
         return self.create_polygons(results, path)
 
     def create_polygons(self, results, path):
@@ -22,6 +22,7 @@ class RectangleLabelsModel(ControlModel):
 
     type = "RectangleLabels"
     model_path = "yolov8m.pt"
+    shared_inference = True
 
     @classmethod
     def is_control_matched(cls, control) -> bool:
@@ -32,8 +33,7 @@ class RectangleLabelsModel(ControlModel):
             return False
         return control.tag == cls.type
 
-    def predict_regions(self, path) -> List[Dict]:
-        results = self.model.predict(path)
+    def create_regions(self, results, path) -> List[Dict]:
         self.debug_plot(results[0].plot())
 
         # oriented bounding boxes are detected, but it should be processed by RectangleLabelsObbModel
@@ -18,6 +18,7 @@ class RectangleLabelsObbModel(ControlModel):
 
     type = "RectangleLabels"
     model_path = "yolov8n-obb.pt"
+    shared_inference = True
 
     @classmethod
     def is_control_matched(cls, control) -> bool:
@@ -28,8 +29,7 @@ class RectangleLabelsObbModel(ControlModel):
             return False
         return control.tag == cls.type
 
-    def predict_regions(self, path) -> List[Dict]:
-        results = self.model.predict(path)
+    def create_regions(self, results, path) -> List[Dict]:
         self.debug_plot(results[0].plot())
 
         # simple bounding boxes without rotation
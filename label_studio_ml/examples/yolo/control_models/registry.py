@@ -0,0 +1,204 @@
+import os
+import time
+import logging
+
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+
+# max number of YOLO models kept loaded, 0 means no limit
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", 8))
+# max memory of loaded YOLO models in MB, including predictor copies, 0 means no limit
+MODEL_CACHE_MB = float(os.getenv("MODEL_CACHE_MB", 0))
+logger = logging.getLogger(__name__)
+
+# paths of models used by the request being processed, see ModelRegistry.in_use()
+_request_paths: ContextVar[Optional[set]] = ContextVar("request_paths", default=None)
+
+
+def model_bytes(model) -> int:
+    """Memory of the weights of a YOLO model and of its predictor, which keeps a fused copy of them.
+    Tensors sharing a storage are counted once.
+    """
+    storages = {}
+    modules = [getattr(model, "model", None)]
+    predictor = getattr(model, "predictor", None)
+    if predictor is not None:
+        modules.append(getattr(predictor, "model", None))
+    for module in modules:
+        if module is None or not hasattr(module, "parameters"):
+            continue
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            storage = tensor.untyped_storage()
+            storages[(storage.device, storage.data_ptr())] = storage.nbytes()
+    return sum(storages.values())
+
+
+def model_device(model) -> Optional[str]:
+    try:
+        return str(next(model.model.parameters()).device)
+    except (AttributeError, StopIteration, TypeError):
+        return None
+
+
+class ModelEntry:
+    def __init__(self, model):
+        self.model = model
+        self.refs = 0
+        self.loaded_at = time.time()
+        self.used_at = self.loaded_at
+        self.hits = 0
+
+
+class ModelRegistry(MutableMapping):
+    """
+    Loaded YOLO models by path, bounded by count (MODEL_CACHE_SIZE) and memory (MODEL_CACHE_MB).
+
+    Every distinct `model_path` of any labeling config loads another model, so least recently used
+    models are evicted when a limit is exceeded. Models looked up within `in_use()` are referenced
+    until it exits and are never evicted meanwhile, so a request doesn't lose its models to another
+    one loading new ones. Each path is loaded once, concurrent lookups of a loading path wait for it.
+    """
+
+    def __init__(
+        self, max_models: int = MODEL_CACHE_SIZE, max_mb: float = MODEL_CACHE_MB
+    ):
+        self.max_models = max_models
+        self.max_mb = max_mb
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._path_locks = {}
+        # called with (path, model) of every evicted model, to drop other references to it
+        self.evict_callbacks: List[Callable] = []
+
+    def get_or_load(self, path: str, load: Callable):
+        """Return the model of the path, loading it with `load(path)` if it's not loaded."""
+        with self._lock:
+            if path in self._entries:
+                return self._use(path)
+            path_lock = self._path_locks.setdefault(path, Lock())
+
+        # load outside of the registry lock, so other paths are served meanwhile
+        with path_lock:
+            with self._lock:
+                if path in self._entries:
+                    return self._use(path)
+            model = load(path)
+            with self._lock:
+                self._entries[path] = ModelEntry(model)
+                self._path_locks.pop(path, None)
+                model = self._use(path)
+        self.evict()
+        return model
+
+    def _use(self, path):
+        """Mark the model as recently used and reference it in the current request, under the lock"""
+        entry = self._entries[path]
+        self._entries.move_to_end(path)
+        entry.used_at = time.time()
+        entry.hits += 1
+        paths = _request_paths.get()
+        if paths is not None and path not in paths:
+            paths.add(path)
+            entry.refs += 1
+        return entry.model
+
+    @contextmanager
+    def in_use(self):
+        """Keep models looked up in the block from eviction until it exits, nested blocks share the outer one"""
+        if _request_paths.get() is not None:
+            yield
+            return
+        paths = set()
+        token = _request_paths.set(paths)
+        try:
+            yield
+        finally:
+            _request_paths.reset(token)
+            with self._lock:
+                for path in paths:
+                    if path in self._entries:
+                        self._entries[path].refs -= 1
+            self.evict()
+
+    def evict(self):
+        """Evict least recently used models without references until the limits are met.
+        The most recently used model stays even if it alone exceeds MODEL_CACHE_MB.
+        """
+        evicted = []
+        with self._lock:
+            sizes = (
+                {path: model_bytes(e.model) for path, e in self._entries.items()}
+                if self.max_mb > 0
+                else {}
+            )
+            for path in list(self._entries)[:-1]:
+                over_count = 0 < self.max_models < len(self._entries)
+                over_memory = self.max_mb > 0 and sum(sizes.values()) > self.max_mb * 1024**2
+                if not over_count and not over_memory:
+                    break
+                if self._entries[path].refs > 0:
+                    continue
+                evicted.append((path, self._entries.pop(path).model))
+                sizes.pop(path, None)
+
+        for path, model in evicted:
+            logger.info(f"Evicted YOLO model {path} from the model cache")
+            for callback in self.evict_callbacks:
+                callback(path, model)
+
+    def stats(self) -> List[Dict]:
+        """Loaded models from least to most recently used, with their memory footprint"""
+        with self._lock:
+            entries = list(self._entries.items())
+        return [
+            {
+                "path": path,
+                "bytes": model_bytes(entry.model),
+                "device": model_device(entry.model),
+                "task": getattr(entry.model, "task", None),
+                "refs": entry.refs,
+                "hits": entry.hits,
+                "loaded_at": entry.loaded_at,
+                "used_at": entry.used_at,
+            }
+            for path, entry in entries
+        ]
+
+    # mapping interface, item lookups count as use
+    def __getitem__(self, path):
+        with self._lock:
+            if path not in self._entries:
+                raise KeyError(path)
+            return self._use(path)
+
+    def __setitem__(self, path, model):
+        with self._lock:
+            self._entries[path] = ModelEntry(model)
+        self.evict()
+
+    def __delitem__(self, path):
+        with self._lock:
+            del self._entries[path]
+
+    def __contains__(self, path):
+        return path in self._entries
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def items(self):
+        """Snapshot of (path, model) pairs, unlike lookups it doesn't count as use"""
+        with self._lock:
+            return [(path, entry.model) for path, entry in self._entries.items()]
+
+    def copy(self):
+        return dict(self.items())
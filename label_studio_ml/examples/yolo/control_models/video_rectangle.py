@@ -1,17 +1,26 @@
 import os
-import cv2
+import time
 import logging
 import yaml
 import hashlib
+import numpy as np
 
-from collections import defaultdict
 from control_models.base import ControlModel, MODEL_ROOT
+from label_studio_ml.deadline import get_deadline
+from label_studio_ml.metrics import REGISTRY
 from label_studio_sdk.label_interface.control_tags import ControlTag
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Optional
+from utils.video import VideoFrameReader, VideoInfo
+from utils.tracks import TrackColumns, lifespans_enabled, thin_keyframes
 
 
 logger = logging.getLogger(__name__)
 
+VIDEO_TRACKING_FPS = REGISTRY.gauge(
+    "label_studio_ml_video_tracking_fps",
+    "Frames per second of the last video tracked for VideoRectangle",
+)
+
 
 class VideoRectangleModel(ControlModel):
     """
@@ -46,16 +55,9 @@ class VideoRectangleModel(ControlModel):
 
     @staticmethod
     def get_video_duration(path):
-        if not os.path.exists(path):
-            raise ValueError(f"Video file not found: {path}")
-        video = cv2.VideoCapture(path)
-        fps = video.get(cv2.CAP_PROP_FPS)
-        frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = frame_count / fps
-        logger.info(
-            f"Video duration: {duration} seconds, {frame_count} frames, {fps} fps"
-        )
-        return frame_count, duration
+        info = VideoInfo.read(path)
+        logger.info(f"Video duration: {info}")
+        return info.frame_count, info.duration
 
     def predict_regions(self, path) -> List[Dict]:
         # bounding box parameters
@@ -63,6 +65,12 @@ class VideoRectangleModel(ControlModel):
         conf = float(self.control.attr.get("model_conf", 0.25))
         iou = float(self.control.attr.get("model_iou", 0.70))
 
+        # frames to process: every n-th frame between start and end time in seconds
+        stride = int(self.control.attr.get("model_frame_stride", 1))
+        start_time = float(self.control.attr.get("model_start_time", 0))
+        end_time = self.control.attr.get("model_end_time")
+        end_time = float(end_time) if end_time else None
+
         # tracking parameters
         # https://github.com/ultralytics/ultralytics/tree/main/ultralytics/cfg/trackers
         tracker_name = self.control.attr.get(
@@ -72,65 +80,133 @@ class VideoRectangleModel(ControlModel):
         tmp_yaml = self.update_tracker_params(original, prefix=tracker_name + "_")
         tracker = tmp_yaml if tmp_yaml else original
 
-        # run model track
+        # run model track while the next frames are decoded
         try:
-            results = self.model.track(
-                path, conf=conf, iou=iou, tracker=tracker, stream=True
-            )
+            with VideoFrameReader(
+                path, stride=stride, start_time=start_time, end_time=end_time
+            ) as reader:
+                logger.info(f"Video {path}: {reader.info}")
+                results = self.track_frames(reader, conf=conf, iou=iou, tracker=tracker)
+                # convert model results to label studio regions
+                return self.create_video_rectangles(
+                    results, path, info=reader.info, stride=reader.stride
+                )
         finally:
-            # clean temporary file
+            # clean temporary file, results are consumed lazily, so only after the conversion
             if tmp_yaml and os.path.exists(tmp_yaml):
                 os.remove(tmp_yaml)
 
-        # convert model results to label studio regions
-        return self.create_video_rectangles(results, path)
+    def track_frames(self, reader: VideoFrameReader, **kwargs):
+        """Track objects on frames as the reader decodes them.
+        The tracker is reset on the first frame and keeps its state for the next ones (persist=True).
+        Stops when the deadline of the request expires, regions of the frames tracked so far are returned.
+        Yields:
+            (frame index, YOLO result) pairs
+        """
+        deadline = get_deadline()
+        frames = 0
+        start = time.perf_counter()
+        try:
+            for index, image in reader:
+                if deadline.expired:
+                    logger.warning(
+                        f"Deadline exceeded, returning tracks of {frames} frames of {reader.path}"
+                    )
+                    break
+                results = self.model.track(
+                    image, persist=frames > 0, verbose=False, **kwargs
+                )
+                frames += 1
+                yield index, results[0]
+        finally:
+            elapsed = time.perf_counter() - start
+            fps = frames / elapsed if elapsed > 0 else 0.0
+            VIDEO_TRACKING_FPS.set(fps)
+            logger.info(
+                f"Tracked {frames} frames of {reader.path} in {elapsed:.1f}s, {fps:.1f} frames/sec"
+            )
 
-    def create_video_rectangles(self, results, path):
-        """Create regions of video rectangles from the yolo tracker results"""
-        frames_count, duration = self.get_video_duration(path)
+    def create_video_rectangles(
+        self, results, path, info: Optional[VideoInfo] = None, stride: int = 1
+    ):
+        """Create regions of video rectangles from the yolo tracker results
+        Args:
+            results: YOLO tracker results of consecutive frames starting from the first one,
+                or (frame index, result) pairs from track_frames()
+            path: Path to the video
+            info: Video metadata, read from the video if not provided
+            stride: Step between tracked frames, longer gaps in a track disable its lifespan
+        """
+        if info is None:
+            info = VideoInfo.read(path)
+        frames_count, duration = info.frame_count, info.duration
         model_names = self.model.names
         logger.debug(
             f"create_video_rectangles: {self.from_name}, {frames_count} frames"
         )
-
-        tracks = defaultdict(list)
-        track_labels = dict()
-        frame = -1
-        for result in results:
-            frame += 1
+        # max change of box coordinates in percent to drop a keyframe, 0 keeps all boxes
+        tolerance = float(self.control.attr.get("model_keyframe_tolerance", 0))
+
+        # model class index => index of the output label, -1 for classes out of the label map
+        labels = sorted(set(self.label_map.values()))
+        class_labels = np.full(max(model_names, default=0) + 1, -1, dtype=np.int64)
+        for index, name in model_names.items():
+            if name in self.label_map:
+                class_labels[index] = labels.index(self.label_map[name])
+
+        columns = TrackColumns()
+        for frame, result in enumerate(results):
+            if isinstance(result, tuple):
+                frame, result = result
             data = result.boxes
             if not data.is_track:
                 continue
 
-            for i, track_id in enumerate(data.id.tolist()):
-                score = float(data.conf[i])
-                x, y, w, h = data.xywhn[i].tolist()
-                # get label
-                model_label = model_names[int(data.cls[i])]
-                if model_label not in self.label_map:
-                    continue
-                output_label = self.label_map[model_label]
-                track_labels[track_id] = output_label
-
-                box = {
-                    "frame": frame + 1,
-                    "enabled": True,
-                    "rotation": 0,
-                    "x": (x - w / 2) * 100,
-                    "y": (y - h / 2) * 100,
-                    "width": w * 100,
-                    "height": h * 100,
-                    "time": (frame + 1) * (duration / frames_count),
-                    "score": score,
-                }
-                tracks[track_id].append(box)
+            box_labels = class_labels[data.cls.cpu().numpy().astype(np.int64)]
+            mask = box_labels >= 0
+            columns.add(
+                frame + 1,
+                track_ids=data.id.cpu().numpy().astype(np.int64)[mask],
+                labels=box_labels[mask],
+                xywhn=data.xywhn.cpu().numpy()[mask],
+                scores=data.conf.cpu().numpy()[mask],
+            )
 
         regions = []
-        for track_id in tracks:
-            sequence = tracks[track_id]
-            sequence = self.process_lifespans_enabled(sequence)
-
-            label = track_labels[track_id]
+        for label, frames, xywhn, scores in columns.tracks():
+            x, y, w, h = xywhn.T
+            boxes = np.stack(
+                [(x - w / 2) * 100, (y - h / 2) * 100, w * 100, h * 100], axis=1
+            )
+            enabled = lifespans_enabled(frames, stride)
+            times = frames * (duration / frames_count)
+            score = scores.max()
+            if tolerance > 0:
+                keep = thin_keyframes(boxes, enabled, tolerance)
+                frames, boxes, enabled = frames[keep], boxes[keep], enabled[keep]
+                times, scores = times[keep], scores[keep]
+
+            # dicts are created only here, from plain Python values
+            sequence = [
+                {
+                    "frame": frame,
+                    "enabled": box_enabled,
+                    "rotation": 0,
+                    "x": box_x,
+                    "y": box_y,
+                    "width": box_w,
+                    "height": box_h,
+                    "time": box_time,
+                    "score": box_score,
+                }
+                for frame, box_enabled, (box_x, box_y, box_w, box_h), box_time, box_score in zip(
+                    frames.tolist(),
+                    enabled.tolist(),
+                    boxes.tolist(),
+                    times.tolist(),
+                    scores.tolist(),
+                )
+            ]
             region = {
                 "from_name": self.from_name,
                 "to_name": self.to_name,
@@ -139,9 +215,9 @@ class VideoRectangleModel(ControlModel):
                     "framesCount": frames_count,
                     "duration": duration,
                     "sequence": sequence,
-                    "labels": [label],
+                    "labels": [labels[label]],
                 },
-                "score": max([frame_info["score"] for frame_info in sequence]),
+                "score": float(score),
                 "origin": "manual",
             }
             regions.append(region)
@@ -149,22 +225,15 @@ class VideoRectangleModel(ControlModel):
         return regions
 
     @staticmethod
-    def process_lifespans_enabled(sequence: List[Dict]) -> List[Dict]:
+    def process_lifespans_enabled(sequence: List[Dict], stride: int = 1) -> List[Dict]:
         """This function detects gaps in the sequence of bboxes
         and disables lifespan line for the gaps assigning "enabled": False
         to the last bboxes in the whole span sequence.
+        Boxes of a strided video are `stride` frames apart without gaps.
         """
-        prev = None
-        for i, box in enumerate(sequence):
-            if prev is None:
-                prev = sequence[i]
-                continue
-            if box["frame"] - prev["frame"] > 1:
-                sequence[i - 1]["enabled"] = False
-            prev = sequence[i]
-
-        # the last frame enabled is false to turn off lifespan line
-        sequence[-1]["enabled"] = False
+        frames = np.array([box["frame"] for box in sequence])
+        for box, enabled in zip(sequence, lifespans_enabled(frames, stride).tolist()):
+            box["enabled"] = enabled
         return sequence
 
     @staticmethod
@@ -1,10 +1,16 @@
 import os
 import logging
+import numpy as np
+import torch
 
+from collections import OrderedDict
+from threading import Lock
 from label_studio_ml.model import LabelStudioMLBase
 from label_studio_ml.response import ModelResponse
+from label_studio_ml.utils import get_label_config_hash
+from label_studio_ml.weights import cpu_only
 
-from control_models.base import ControlModel
+from control_models.base import ControlModel, _model_cache
 from control_models.choices import ChoicesModel
 from control_models.rectangle_labels import RectangleLabelsModel
 from control_models.rectangle_labels_obb import RectangleLabelsObbModel
@@ -12,6 +18,7 @@ from control_models.polygon_labels import PolygonLabelsModel
 from control_models.keypoint_labels import KeypointLabelsModel
 from control_models.video_rectangle import VideoRectangleModel
 from control_models.timeline_labels import TimelineLabelsModel
+from control_models.planner import InferencePlanner
 from typing import List, Dict, Optional
 
 
@@ -30,6 +37,23 @@ available_model_classes = [
     TimelineLabelsModel,
 ]
 
+# max number of label configs whose detected control models are kept, 0 disables the cache
+CONTROL_MODELS_CACHE_SIZE = int(os.getenv("CONTROL_MODELS_CACHE_SIZE", 16))
+# (project ID, label config hash) => (YOLO models by path, control models)
+_control_models_cache = OrderedDict()
+_control_models_lock = Lock()
+
+
+def forget_control_models(path, model):
+    """Drop cached control models using an evicted YOLO model, so its memory is freed"""
+    with _control_models_lock:
+        for key, (models, _) in list(_control_models_cache.items()):
+            if any(m is model for m in models.values()):
+                del _control_models_cache[key]
+
+
+_model_cache.evict_callbacks.append(forget_control_models)
+
 
 class YOLO(LabelStudioMLBase):
     """Label Studio ML Backend based on Ultralytics YOLO"""
@@ -38,10 +62,72 @@ class YOLO(LabelStudioMLBase):
         """Configure any parameters of your model here"""
         self.set("model_version", "yolo")
 
+    @classmethod
+    def preload_weights(cls):
+        """Build predictors of the models loaded at import in the gunicorn --preload master.
+        Ultralytics copies and fuses the weights when it builds a predictor, so otherwise every
+        worker would keep its own copy, built on its first request. CPU only: CUDA initialized
+        in the master is unusable in the forked workers, so CPU hosts without NVML need
+        CUDA_VISIBLE_DEVICES=-1 to preload.
+        """
+        if not cpu_only():
+            return False
+        image = np.zeros((64, 64, 3), dtype=np.uint8)
+        models = list(_model_cache.items())
+        for path, model in models:
+            logger.info(f"Preloading {path}")
+            # an explicit device, Ultralytics checks CUDA otherwise
+            model.predict(image, device="cpu", verbose=False)
+        return bool(models)
+
+    def warmup(self):
+        """Run every preloaded YOLO model once on a blank image, so the first request
+        of a server process doesn't pay for lazy device and kernel initialization
+        """
+        image = np.zeros((640, 640, 3), dtype=np.uint8)
+        for path, model in list(_model_cache.items()):
+            logger.info(f"Warming up {path}")
+            model.predict(image, verbose=False)
+
+    @classmethod
+    def loaded_models(cls) -> List[Dict]:
+        """YOLO models loaded in this process with their memory footprint, for GET /models"""
+        return _model_cache.stats()
+
     def detect_control_models(self) -> List[ControlModel]:
         """Detect control models based on the labeling config.
         Control models are used to predict regions for different control tags in the labeling config.
+        They are cached per project, labeling config and the set of YOLO model files they use,
+        so predict() and fit() don't rebuild them and their label maps on every call.
         """
+        if not self.label_config or CONTROL_MODELS_CACHE_SIZE <= 0:
+            return self.create_control_models()
+
+        key = (str(self.project_id or ""), get_label_config_hash(self.label_config))
+        with _control_models_lock:
+            entry = _control_models_cache.get(key)
+            # models are still valid if the same YOLO instances are loaded for their paths
+            if entry is not None and all(
+                _model_cache.get(path) is model for path, model in entry[0].items()
+            ):
+                _control_models_cache.move_to_end(key)
+                return list(entry[1])
+
+        control_models = self.create_control_models()
+        models = {
+            path: model
+            for path, model in _model_cache.items()
+            if any(model is control.model for control in control_models)
+        }
+        with _control_models_lock:
+            _control_models_cache[key] = (models, control_models)
+            _control_models_cache.move_to_end(key)
+            while len(_control_models_cache) > CONTROL_MODELS_CACHE_SIZE:
+                _control_models_cache.popitem(last=False)
+        return list(control_models)
+
+    def create_control_models(self) -> List[ControlModel]:
+        """Create control models for the control tags of the labeling config."""
         control_models = []
 
         for control in self.label_interface.controls:
@@ -106,29 +192,34 @@ class YOLO(LabelStudioMLBase):
         logger.info(
             f"Run prediction on {len(tasks)} tasks, project ID = {self.project_id}"
         )
-        control_models = self.detect_control_models()
-
-        predictions = []
-        for task in tasks:
-
-            regions = []
-            for model in control_models:
-                path = model.get_path(task)
-                regions += model.predict_regions(path)
+        # YOLO models of the control models are not evicted until predictions are done
+        with _model_cache.in_use():
+            control_models = self.detect_control_models()
+
+            planner = InferencePlanner(control_models)
+
+            predictions = []
+            for chunk in planner.chunks(tasks):
+                if self.deadline.expired:
+                    logger.warning(
+                        f"Deadline exceeded, returning predictions for {len(predictions)} of {len(tasks)} tasks"
+                    )
+                    break
 
-            # calculate final score
-            all_scores = [region["score"] for region in regions if "score" in region]
-            avg_score = sum(all_scores) / max(len(all_scores), 1)
+                for regions in planner.predict(chunk):
+                    # calculate final score
+                    all_scores = [region["score"] for region in regions if "score" in region]
+                    avg_score = sum(all_scores) / max(len(all_scores), 1)
 
-            # compose final prediction
-            prediction = {
-                "result": regions,
-                "score": avg_score,
-                "model_version": self.model_version,
-            }
-            predictions.append(prediction)
+                    # compose final prediction
+                    prediction = {
+                        "result": regions,
+                        "score": avg_score,
+                        "model_version": self.model_version,
+                    }
+                    predictions.append(prediction)
 
-        return ModelResponse(predictions=predictions)
+            return ModelResponse(predictions=predictions)
 
     def fit(self, event, data, **kwargs):
         """
@@ -136,9 +227,10 @@ class YOLO(LabelStudioMLBase):
         Or it's called when "Start training" clicked on the model in the project settings.
         """
         results = {}
-        control_models = self.detect_control_models()
-        for model in control_models:
-            training_result = model.fit(event, data, **kwargs)
-            results[model.from_name] = training_result
+        with _model_cache.in_use():
+            control_models = self.detect_control_models()
+            for model in control_models:
+                training_result = model.fit(event, data, **kwargs)
+                results[model.from_name] = training_result
 
-        return results
+            return results
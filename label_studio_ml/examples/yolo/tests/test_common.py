@@ -3,12 +3,14 @@ This file contains tests for the API
 """
 
 import os
+import copy
 import pickle
 import pytest
 import json
 
 from unittest.mock import MagicMock, patch
 from model import YOLO
+from control_models.base import _model_cache
 
 
 def load_file(path):
@@ -189,3 +191,27 @@ def test_control_with_valid_label_map(
     assert len(result) == 1
     assert result[0] == mock_instance
     mock_logger.debug.assert_called_once()
+
+
+def test_warmup_runs_cached_models():
+    model = MagicMock()
+    with patch.dict("control_models.base._model_cache", {"test.pt": model}, clear=True):
+        YOLO().warmup()
+    model.predict.assert_called_once()
+
+
+def test_detect_control_models_cached():
+    label_config = label_configs[0]
+    with patch.dict("model._control_models_cache", clear=True):
+        first = YOLO(project_id="1", label_config=label_config).detect_control_models()
+        second = YOLO(project_id="1", label_config=label_config).detect_control_models()
+        assert [id(c) for c in first] == [id(c) for c in second]
+
+        # another project gets its own control models
+        other = YOLO(project_id="2", label_config=label_config).detect_control_models()
+        assert other[0] is not first[0]
+
+        # reloaded YOLO model files invalidate control models using them
+        path = next(p for p, m in _model_cache.items() if m is first[0].model)
+        with patch.dict("control_models.base._model_cache", {path: copy.copy(first[0].model)}):
+            assert YOLO(project_id="1", label_config=label_config).detect_control_models()[0] is not first[0]
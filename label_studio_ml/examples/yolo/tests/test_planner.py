@@ -0,0 +1,56 @@
+import numpy as np
+
+from unittest.mock import MagicMock
+from control_models.planner import InferencePlanner
+
+
+def make_control(model, shared=True, name="label"):
+    control = MagicMock()
+    control.model = model
+    control.shared_inference = shared
+    control.get_path.side_effect = lambda task: task["data"]["image"]
+    control.create_regions.side_effect = lambda results, path: [
+        {"from_name": name, "result": results[0], "path": path}
+    ]
+    control.predict_regions.side_effect = lambda path: [{"from_name": name, "path": path}]
+    return control
+
+
+def fake_model():
+    model = MagicMock()
+    model.predict.side_effect = lambda source: [
+        f"result-{image.shape}" for image in (source if isinstance(source, list) else [source])
+    ]
+    return model
+
+
+def test_planner_runs_shared_model_once_per_shape(monkeypatch):
+    images = {
+        "a.jpg": np.zeros((32, 32, 3), dtype=np.uint8),
+        "b.jpg": np.zeros((32, 32, 3), dtype=np.uint8),
+        "c.jpg": np.zeros((16, 32, 3), dtype=np.uint8),
+    }
+    monkeypatch.setattr("control_models.planner.imread", lambda path: images[path])
+
+    model = fake_model()
+    polygons = make_control(model, name="polygons")
+    rectangles = make_control(model, name="rectangles")
+    video = make_control(MagicMock(), shared=False, name="video")
+    planner = InferencePlanner([polygons, video, rectangles])
+
+    tasks = [{"data": {"image": path}} for path in ["a.jpg", "b.jpg", "c.jpg", "a.jpg"]]
+    regions = planner.predict(tasks)
+
+    # one call for two 32x32 images, one call for the 16x32 image, for both controls
+    assert model.predict.call_count == 2
+    assert len(regions) == 4
+    # regions follow the control order of the labeling config
+    assert [r["from_name"] for r in regions[0]] == ["polygons", "video", "rectangles"]
+    assert regions[2][0]["result"] == "result-(16, 32, 3)"
+    assert regions[3][2] == {"from_name": "rectangles", "result": "result-(32, 32, 3)", "path": "a.jpg"}
+    assert video.predict_regions.call_count == 4
+
+
+def test_planner_chunks():
+    planner = InferencePlanner([], batch_size=2)
+    assert [len(chunk) for chunk in planner.chunks(list(range(5)))] == [2, 2, 1]
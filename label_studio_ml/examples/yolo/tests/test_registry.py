@@ -0,0 +1,49 @@
+import time
+
+from threading import Thread
+from unittest.mock import MagicMock
+
+from control_models.registry import ModelRegistry
+
+
+def test_registry_evicts_least_recently_used():
+    registry = ModelRegistry(max_models=2)
+    registry.get_or_load("a.pt", MagicMock)
+    registry.get_or_load("b.pt", MagicMock)
+    registry.get_or_load("a.pt", MagicMock)
+    registry.get_or_load("c.pt", MagicMock)
+    assert list(registry) == ["a.pt", "c.pt"]
+
+
+def test_registry_keeps_models_in_use():
+    registry = ModelRegistry(max_models=1)
+    evicted = []
+    registry.evict_callbacks.append(lambda path, model: evicted.append(path))
+
+    with registry.in_use():
+        registry.get_or_load("a.pt", MagicMock)
+        registry.get_or_load("b.pt", MagicMock)
+        # "a.pt" is referenced by the request, the limit is exceeded until it's done
+        assert list(registry) == ["a.pt", "b.pt"]
+        assert [m["refs"] for m in registry.stats()] == [1, 1]
+
+    assert list(registry) == ["b.pt"]
+    assert evicted == ["a.pt"]
+    assert registry.stats()[0]["refs"] == 0
+
+
+def test_registry_loads_path_once():
+    registry = ModelRegistry()
+    calls = []
+
+    def load(path):
+        calls.append(path)
+        time.sleep(0.05)
+        return MagicMock()
+
+    threads = [Thread(target=registry.get_or_load, args=("a.pt", load)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ["a.pt"]
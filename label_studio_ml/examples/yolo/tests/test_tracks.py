@@ -0,0 +1,39 @@
+import numpy as np
+
+from utils.tracks import TrackColumns, lifespans_enabled, thin_keyframes
+
+
+def test_lifespans_enabled():
+    frames = np.array([1, 2, 3, 6, 7, 10])
+    assert lifespans_enabled(frames).tolist() == [True, True, False, True, False, False]
+    assert lifespans_enabled(frames, stride=3).tolist() == [True, True, True, True, True, False]
+    assert lifespans_enabled(np.array([], dtype=np.int64)).tolist() == []
+
+
+def test_track_columns_group_tracks_by_first_box():
+    columns = TrackColumns()
+    for frame, ids in [(1, [5, 2]), (2, [2]), (3, [7, 5, 2])]:
+        ids = np.array(ids)
+        columns.add(
+            frame,
+            track_ids=ids,
+            labels=ids % 2,
+            xywhn=np.full((len(ids), 4), frame / 10, dtype=np.float32),
+            scores=np.full(len(ids), 0.5, dtype=np.float32),
+        )
+    columns.add(4, np.array([], dtype=np.int64), np.array([]), np.empty((0, 4)), np.array([]))
+    assert len(columns) == 6
+
+    tracks = list(columns.tracks())
+    assert [frames.tolist() for _, frames, _, _ in tracks] == [[1, 3], [1, 2, 3], [3]]
+    assert [label for label, _, _, _ in tracks] == [1, 0, 1]
+    assert tracks[0][2].dtype == np.float64
+    assert tracks[0][2][:, 0].tolist() == [np.float32(0.1), np.float32(0.3)]
+
+
+def test_thin_keyframes_keeps_lifespan_boundaries():
+    boxes = np.array([[0.0], [0.1], [0.2], [5.0], [5.1], [5.2], [0.0], [0.1]])
+    enabled = np.array([True, True, True, True, True, False, True, False])
+    keep = thin_keyframes(boxes, enabled, tolerance=1)
+    # boxes before the jump to 5.0 and lifespan starts and ends are kept
+    assert keep.tolist() == [True, False, True, True, False, True, True, True]
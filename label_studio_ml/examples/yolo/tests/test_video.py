@@ -0,0 +1,40 @@
+import os
+import pytest
+
+from utils.video import VideoFrameReader, VideoInfo
+
+VIDEO = os.path.join(os.path.dirname(__file__), "opossum_snow_short.mp4")
+
+
+def test_video_info():
+    info = VideoInfo.read(VIDEO)
+    assert info.frame_count == 35
+    assert info.duration == pytest.approx(35 / info.fps)
+
+
+def test_reader_decodes_all_frames():
+    with VideoFrameReader(VIDEO) as reader:
+        frames = list(reader)
+    assert [index for index, _ in frames] == list(range(35))
+    assert frames[0][1].shape == (reader.info.height, reader.info.width, 3)
+
+
+def test_reader_stride_and_time_window():
+    with VideoFrameReader(VIDEO, stride=3, start_time=0.2, end_time=1.0) as reader:
+        indexes = [index for index, _ in reader]
+    start, end = round(0.2 * reader.info.fps), round(1.0 * reader.info.fps)
+    assert indexes == list(range(start, end, 3))
+
+
+def test_reader_close_stops_decoding():
+    reader = VideoFrameReader(VIDEO, queue_size=2)
+    for index, _ in reader:
+        break
+    reader.close()
+    assert not reader.thread.is_alive()
+    assert reader.decoded < 35
+
+
+def test_reader_missing_file():
+    with pytest.raises(ValueError):
+        VideoFrameReader("missing.mp4")
@@ -9,6 +9,7 @@ import yaml
 
 from label_studio_ml.utils import compare_nested_structures
 from model import YOLO
+from control_models.video_rectangle import VideoRectangleModel
 from .test_common import client, load_file, TEST_DIR
 from unittest import mock
 
@@ -73,7 +74,8 @@ def test_rectanglelabels_predict(client, label_config, task, yolo_result, expect
     # also track is a heavy operation, and it might take too much time for tests
     if yolo_result:
         with mock.patch("ultralytics.YOLO.track") as mock_yolo:
-            mock_yolo.return_value = yolo_result
+            # frames are tracked one by one as they are decoded
+            mock_yolo.side_effect = [[result] for result in yolo_result]
             response = client.post(
                 "/predict", data=json.dumps(data), content_type="application/json"
             )
@@ -177,3 +179,9 @@ def test_update_tracker_params_with_real_config():
 
     # Clean up: remove the temporary YAML file
     os.remove(new_yaml_path)
+
+
+def test_process_lifespans_enabled_with_stride():
+    sequence = [{"frame": frame, "enabled": True} for frame in (1, 3, 5, 9, 11)]
+    sequence = VideoRectangleModel.process_lifespans_enabled(sequence, stride=2)
+    assert [box["enabled"] for box in sequence] == [True, True, False, True, False]
@@ -0,0 +1,104 @@
+import numpy as np
+
+from typing import Iterator, Tuple
+
+
+def lifespans_enabled(frames: np.ndarray, stride: int = 1) -> np.ndarray:
+    """Lifespan flags of the boxes of one track, False for the last box before a gap
+    (more than `stride` frames to the next box) and for the last box of the track.
+    Args:
+        frames: Sorted frame numbers of the boxes
+        stride: Step between tracked frames
+    """
+    enabled = np.ones(len(frames), dtype=bool)
+    enabled[:-1] = np.diff(frames) <= stride
+    if len(enabled):
+        enabled[-1] = False
+    return enabled
+
+
+def thin_keyframes(
+    boxes: np.ndarray, enabled: np.ndarray, tolerance: float
+) -> np.ndarray:
+    """Select keyframes of one track, dropping boxes that Label Studio can interpolate.
+    A box is dropped while the next box is within `tolerance` of the last kept one in every
+    coordinate, so interpolated boxes are off by less than 2 * tolerance.
+    The first and the last box of every lifespan are always kept.
+    Args:
+        boxes: Box coordinates, one row per box
+        enabled: Lifespan flags from lifespans_enabled()
+        tolerance: Max change of a coordinate, in the units of `boxes`
+    Returns:
+        Boolean mask of kept boxes
+    """
+    count = len(boxes)
+    keep = np.zeros(count, dtype=bool)
+    # lifespan boundaries: the first box, ends of lifespans and boxes after them
+    keep[0] = True
+    keep[~enabled] = True
+    keep[1:][~enabled[:-1]] = True
+
+    # sequential by nature, plain Python is faster than NumPy on rows of 4 values
+    rows = boxes.tolist()
+    kept = keep.tolist()
+    last = rows[0]
+    # the last box ends its lifespan and is kept, so rows[i + 1] exists for dropped boxes
+    for i in range(1, count):
+        if not kept[i]:
+            kept[i] = any(abs(a - b) > tolerance for a, b in zip(rows[i + 1], last))
+        if kept[i]:
+            last = rows[i]
+    return np.array(kept, dtype=bool)
+
+
+class TrackColumns:
+    """
+    Boxes of all tracks of a video accumulated in NumPy columns, one row per box:
+    frame number, track ID, label index, normalized x, y, width and height of the box center and score.
+    Boxes are appended frame by frame and grouped by track only once, when the regions are built.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def add(
+        self,
+        frame: int,
+        track_ids: np.ndarray,
+        labels: np.ndarray,
+        xywhn: np.ndarray,
+        scores: np.ndarray,
+    ):
+        """Add the boxes of one frame"""
+        if len(track_ids):
+            frames = np.full(len(track_ids), frame, dtype=np.int64)
+            self._chunks.append((frames, track_ids, labels, xywhn, scores))
+
+    def __len__(self):
+        return sum(len(chunk[0]) for chunk in self._chunks)
+
+    def tracks(
+        self,
+    ) -> Iterator[Tuple[int, np.ndarray, np.ndarray, np.ndarray]]:
+        """Group the boxes by track, tracks are ordered by their first box.
+        Yields:
+            (label index of the last box, frames, xywhn as float64, scores as float64) of every track
+        """
+        if not self._chunks:
+            return
+        frames, track_ids, labels, xywhn, scores = (
+            np.concatenate(column) for column in zip(*self._chunks)
+        )
+        # stable sort keeps the frame order of the boxes of each track
+        order = np.argsort(track_ids, kind="stable")
+        sorted_ids = track_ids[order]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in sorted(zip(starts, ends), key=lambda span: order[span[0]]):
+            rows = order[start:end]
+            yield (
+                int(labels[rows[-1]]),
+                frames[rows],
+                xywhn[rows].astype(np.float64),
+                scores[rows].astype(np.float64),
+            )
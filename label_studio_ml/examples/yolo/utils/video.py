@@ -0,0 +1,161 @@
+import os
+import cv2
+import logging
+
+from queue import Queue, Empty, Full
+from threading import Thread, Event
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+
+# max number of decoded frames waiting for the model, a 1080p frame takes 6 MB
+VIDEO_QUEUE_SIZE = int(os.getenv("VIDEO_QUEUE_SIZE", 16))
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class VideoInfo:
+    """Video metadata read once when the video is opened"""
+
+    def __init__(self, frame_count: int, fps: float, width: int, height: int):
+        self.frame_count = frame_count
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.duration = frame_count / fps if fps else 0.0
+
+    @classmethod
+    def from_capture(cls, capture: cv2.VideoCapture) -> "VideoInfo":
+        return cls(
+            frame_count=int(capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+            fps=capture.get(cv2.CAP_PROP_FPS),
+            width=int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+
+    @classmethod
+    def read(cls, path: str) -> "VideoInfo":
+        if not os.path.exists(path):
+            raise ValueError(f"Video file not found: {path}")
+        capture = cv2.VideoCapture(path)
+        try:
+            return cls.from_capture(capture)
+        finally:
+            capture.release()
+
+    def __repr__(self):
+        return (
+            f"VideoInfo({self.frame_count} frames, {self.fps:.2f} fps, "
+            f"{self.duration:.2f} seconds, {self.width}x{self.height})"
+        )
+
+
+class VideoFrameReader:
+    """
+    Decodes frames of a video on a background thread into a bounded queue,
+    so decoding of the next frames overlaps with inference on the current one.
+    OpenCV releases the GIL while it decodes.
+
+    Iterating yields (frame index, BGR image) pairs, frame indexes start from 0.
+    Only every `stride`-th frame between `start_time` and `end_time` is decoded,
+    skipped frames are read from the stream without decoding them to images.
+
+    Usage:
+        with VideoFrameReader(path, stride=2) as reader:
+            for index, image in reader:
+                ...
+    """
+
+    def __init__(
+        self,
+        path: str,
+        stride: int = 1,
+        start_time: float = 0,
+        end_time: Optional[float] = None,
+        queue_size: int = VIDEO_QUEUE_SIZE,
+    ):
+        if not os.path.exists(path):
+            raise ValueError(f"Video file not found: {path}")
+        self.path = path
+        self.stride = max(int(stride), 1)
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise ValueError(f"Can't open video file: {path}")
+        self.info = VideoInfo.from_capture(self.capture)
+
+        fps = self.info.fps or 1
+        self.start_frame = max(int(round((start_time or 0) * fps)), 0)
+        # frame count is an estimate for some containers, read until the stream ends without end_time
+        self.end_frame = int(round(end_time * fps)) if end_time is not None else None
+
+        self.queue = Queue(maxsize=max(queue_size, 1))
+        self.stop_event = Event()
+        self.thread = None
+        self.decoded = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        if self.thread is not None:
+            raise RuntimeError("VideoFrameReader can be iterated only once")
+        self.thread = Thread(target=self._decode, name="video-decoder", daemon=True)
+        self.thread.start()
+        while True:
+            item = self.queue.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def _put(self, item) -> bool:
+        """Wait for a free slot in the queue, returns False if the reader is closed meanwhile"""
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _decode(self):
+        try:
+            if self.start_frame:
+                self.capture.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+            index = self.start_frame
+            while self.end_frame is None or index < self.end_frame:
+                if (index - self.start_frame) % self.stride:
+                    if not self.capture.grab():
+                        break
+                else:
+                    ok, image = self.capture.read()
+                    if not ok:
+                        break
+                    self.decoded += 1
+                    if not self._put((index, image)):
+                        return
+                index += 1
+        except Exception as e:
+            self._put(e)
+        finally:
+            self.capture.release()
+        self._put(_END)
+
+    def close(self):
+        """Stop decoding and release the video, frames left in the queue are dropped"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        else:
+            self.capture.release()
+        while True:
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                break
@@ -0,0 +1,283 @@
+import json
+import logging
+import os
+import time
+import uuid
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Condition, Thread
+from typing import Callable, Dict, Optional, Tuple, Type
+
+from . import model as model_module
+from .model import mp
+
+logger = logging.getLogger(__name__)
+
+# number of training worker processes, 0 runs fit() inline in the /webhook request
+TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', 0))
+# max number of queued (not yet started) training jobs
+TRAINING_QUEUE_SIZE = int(os.getenv('TRAINING_QUEUE_SIZE', 100))
+# queued job waits for this many seconds after the last event of the project before it starts,
+# so bursts of annotation events are coalesced into one training run
+TRAINING_COALESCE_SECONDS = float(os.getenv('TRAINING_COALESCE_SECONDS', 2))
+# statuses of finished jobs are removed from the cache after this many seconds
+TRAINING_JOB_TTL = float(os.getenv('TRAINING_JOB_TTL', 24 * 3600))
+
+# job statuses are kept in the model cache, so any server process can report them
+JOBS_PROJECT_ID = '__jobs__'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+class TrainingQueueFull(Exception):
+    pass
+
+
+def run_training_job(model_class: Type, project_id: str, label_config: str, event: str, data: Dict, job_id: str,
+                     cache_spec: Tuple[str, str, Dict]):
+    """Entry point of the training worker process"""
+    # the model state must go to the cache the server reads, not to the one configured by env vars
+    cache_type, path, kwargs = cache_spec
+    model_module.set_cache(cache_type, path, **kwargs)
+    model = model_class(project_id=project_id, label_config=label_config)
+    result = model.process_event(event, data, job_id, {})
+    # results go back to the parent process and to the job status, keep only JSON-friendly ones
+    try:
+        json.dumps(result)
+    except (TypeError, ValueError):
+        result = str(result)
+    return result
+
+
+class TrainingJob:
+
+    def __init__(self, model_class: Type, project_id: str, label_config: str, event: str, data: Dict,
+                 cache_spec: Optional[Tuple] = None):
+        self.id = uuid.uuid4().hex
+        self.model_class = model_class
+        self.cache_spec = cache_spec
+        self.project_id = project_id
+        self.label_config = label_config
+        self.event = event
+        self.data = data
+        self.events = 1
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.not_before = self.created_at + TRAINING_COALESCE_SECONDS
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    def merge(self, event: str, data: Dict):
+        """Coalesce a newer event of the same project into this queued job"""
+        self.event = event
+        self.data = data
+        self.events += 1
+        self.not_before = time.time() + TRAINING_COALESCE_SECONDS
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'project_id': self.project_id,
+            'event': self.event,
+            'events': self.events,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+class TrainingJobQueue:
+    """
+    Bounded queue of training jobs executed by worker processes.
+
+    Events of a project that arrive while its job is still queued are merged into that job,
+    and at most one job per project runs at a time. Both only hold within one server process:
+    every gunicorn worker has its own queue and its own pool of `workers` processes, so events
+    handled by different server processes start separate jobs, which may run fit() for the same
+    project concurrently. Worker processes use the spawn start method,
+    so the model class must be importable by the workers (defined at a module level).
+    Workers open the model cache with the same backend and settings, so it must be shared
+    between processes (not MemoryCache or a cache with a client passed by the caller).
+    """
+
+    def __init__(self, workers: int = TRAINING_WORKERS, max_queued: int = TRAINING_QUEUE_SIZE,
+                 on_done: Optional[Callable] = None, cache=None):
+        """
+        Args:
+            workers (int): Number of worker processes.
+            max_queued (int): Max number of queued jobs, TrainingQueueFull is raised on overflow.
+            on_done (callable, optional): Called with every finished TrainingJob in the server process.
+            cache (BaseCache, optional): Cache to keep job statuses in, defaults to the model cache.
+        """
+        self.workers = workers
+        self.max_queued = max_queued
+        self.on_done = on_done
+        self._cache = cache
+        self._queued = {}  # project_id => TrainingJob, ordered by submission
+        self._running = set()  # project ids
+        self._cond = Condition()
+        self._executor = None
+        self._dispatcher = None
+        self._pid = None
+        self._finished = deque()  # (finished_at, job_id) of finished jobs, oldest first
+
+    @property
+    def cache(self):
+        # resolved on every access, so the cache replaced by set_cache() is picked up
+        return self._cache if self._cache is not None else model_module.CACHE
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _ensure_started(self):
+        """Start the executor and the dispatcher lazily in the current process,
+        neither of them survives gunicorn --preload forking, every server process gets its own"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._queued.clear()
+        self._running.clear()
+        self._finished.clear()
+        self._start_executor()
+        self._dispatcher = Thread(target=self._dispatch_loop, name='training-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    def _start_executor(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context('spawn'))
+
+    def _restart_executor(self, broken: ProcessPoolExecutor):
+        """Replace the executor after a worker process died, e.g. killed by the OOM killer,
+        all its jobs fail with BrokenProcessPool, must be called under the condition lock"""
+        if self._executor is not broken:
+            return
+        logger.error('Training worker process died, restarting the worker pool')
+        broken.shutdown(wait=False)
+        self._start_executor()
+
+    def submit(self, model_class: Type, project_id: str, label_config: str, event: str, data: Dict) -> Dict:
+        """
+        Queue a training job or merge the event into the queued job of the same project.
+
+        Returns:
+            dict: Job status.
+        """
+        cache_spec = model_module.CACHE.shared_spec()
+        if cache_spec is None:
+            raise ValueError(
+                f'{model_module.CACHE.__class__.__name__} is not shared between processes, '
+                f'training workers would save the model state where the server never reads it: '
+                f'use another CACHE_TYPE or set TRAINING_WORKERS=0')
+
+        with self._cond:
+            self._ensure_started()
+            job = self._queued.get(project_id)
+            if job is not None:
+                job.merge(event, data)
+                logger.debug(f'Job {job.id}: {event} coalesced, {job.events} events for project {project_id}')
+            else:
+                if len(self._queued) >= self.max_queued:
+                    raise TrainingQueueFull(f'Training queue is full: {self.max_queued} jobs')
+                job = TrainingJob(model_class, project_id, label_config, event, data, cache_spec)
+                self._queued[project_id] = job
+                logger.debug(f'Job {job.id}: {event} queued for project {project_id}')
+            self._save(job)
+            self._cond.notify()
+            return job.to_dict()
+
+    def _next_job(self) -> Optional[TrainingJob]:
+        """Pop the first job ready to run, must be called under the condition lock"""
+        if len(self._running) >= self.workers:
+            return None
+        now = time.time()
+        for project_id, job in self._queued.items():
+            if project_id not in self._running and job.not_before <= now:
+                del self._queued[project_id]
+                return job
+        return None
+
+    def _wait_timeout(self) -> Optional[float]:
+        """Seconds until the earliest queued job becomes ready, must be called under the condition lock"""
+        if len(self._running) >= self.workers:
+            return None
+        ready_times = [job.not_before for project_id, job in self._queued.items() if project_id not in self._running]
+        if not ready_times:
+            return None
+        return max(min(ready_times) - time.time(), 0.01)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait(self._wait_timeout())
+                    job = self._next_job()
+                self._running.add(job.project_id)
+                job.status = RUNNING
+                job.started_at = time.time()
+                self._save(job)
+
+                executor = self._executor
+
+            logger.info(f'Job {job.id}: training started for project {job.project_id} ({job.events} events)')
+            try:
+                future = executor.submit(run_training_job, job.model_class, job.project_id, job.label_config,
+                                         job.event, job.data, job.id, job.cache_spec)
+            except Exception as e:
+                # the job fails like the ones running in the pool, the dispatcher goes on with the next job
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(lambda f, job=job, executor=executor: self._finish(job, f, executor))
+
+    def _finish(self, job: TrainingJob, future, executor: Optional[ProcessPoolExecutor] = None):
+        job.finished_at = time.time()
+        try:
+            job.result = future.result()
+            job.status = COMPLETED
+            logger.info(f'Job {job.id}: training completed in {job.finished_at - job.started_at:.1f}s')
+        except Exception as e:
+            job.status = FAILED
+            job.error = f'{e.__class__.__name__}: {e}'
+            logger.error(f'Job {job.id}: training failed: {job.error}')
+            if isinstance(e, BrokenProcessPool) and executor is not None:
+                with self._cond:
+                    self._restart_executor(executor)
+
+        with self._cond:
+            self._running.discard(job.project_id)
+            self._save(job)
+            self._finished.append((job.finished_at, job.id))
+            self._prune()
+            self._cond.notify()
+
+        if self.on_done is not None:
+            try:
+                self.on_done(job)
+            except Exception as e:
+                logger.error(f'Job {job.id}: on_done callback failed: {e}', exc_info=True)
+
+    def _prune(self):
+        """Remove statuses of jobs finished more than TRAINING_JOB_TTL seconds ago by this process,
+        must be called under the condition lock"""
+        expired_before = time.time() - TRAINING_JOB_TTL
+        while self._finished and self._finished[0][0] < expired_before:
+            _, job_id = self._finished.popleft()
+            del self.cache[JOBS_PROJECT_ID, job_id]
+
+    def _save(self, job: TrainingJob):
+        self.cache[JOBS_PROJECT_ID, job.id] = json.dumps(job.to_dict())
+
+    def get_status(self, job_id: str) -> Optional[Dict]:
+        """Return the job status saved by any server process, None if the job is unknown"""
+        status = self.cache[JOBS_PROJECT_ID, job_id]
+        return json.loads(status) if status else None
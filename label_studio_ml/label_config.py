@@ -0,0 +1,75 @@
+import logging
+import os
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict
+
+from label_studio_sdk.label_interface import LabelInterface
+from label_studio_sdk._extensions.label_studio_tools.core.label_config import parse_config
+
+from .utils import get_label_config_hash
+
+logger = logging.getLogger(__name__)
+
+# max number of distinct label configs kept parsed per process
+LABEL_CONFIG_CACHE_SIZE = int(os.getenv('LABEL_CONFIG_CACHE_SIZE', 128))
+
+
+class LabelConfigCache:
+    """
+    Process-wide LRU cache of parsed label configs keyed by the hash of the config XML.
+
+    Parsing a large config with hundreds of labels takes milliseconds, and every model instance
+    used to parse it again. Cached objects are shared by all requests and projects with
+    identical configs, so they must be treated as read-only.
+    """
+
+    def __init__(self, size: int = LABEL_CONFIG_CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def _get(self, kind: str, label_config: str, parse: Callable):
+        key = kind, get_label_config_hash(label_config)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+
+        # parse outside of the lock, two threads may rarely parse the same config, which is harmless
+        value = parse(label_config)
+        if self.size <= 0:
+            return value
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return value
+
+    def get_label_interface(self, label_config: str) -> LabelInterface:
+        return self._get('label_interface', label_config, lambda config: LabelInterface(config=config))
+
+    def get_parsed_config(self, label_config: str) -> Dict:
+        return self._get('parsed_config', label_config, parse_config)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+LABEL_CONFIG_CACHE = LabelConfigCache()
+
+
+def get_label_interface(label_config: str) -> LabelInterface:
+    """Return the shared LabelInterface of the label config, don't modify it"""
+    return LABEL_CONFIG_CACHE.get_label_interface(label_config)
+
+
+def get_parsed_label_config(label_config: str) -> Dict:
+    """Return the shared result of parse_config() for the label config, don't modify it"""
+    return LABEL_CONFIG_CACHE.get_parsed_config(label_config)
@@ -0,0 +1,214 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+from label_studio_sdk._extensions.label_studio_tools.core.utils import io as sdk_io
+
+from .metrics import REGISTRY, CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# directory of the media cache shared by all server processes
+MEDIA_CACHE_DIR = os.getenv('MEDIA_CACHE_DIR', os.path.join(os.getenv('MODEL_DIR', '.'), '.media-cache'))
+# max total size of cached files, least recently used files are removed above it, 0 (default) disables the cache
+MEDIA_CACHE_MAX_BYTES = int(os.getenv('MEDIA_CACHE_MAX_BYTES', 0))
+
+MEDIA_CACHE_BYTES = REGISTRY.gauge('label_studio_ml_media_cache_bytes', 'Total size of files in the media cache')
+
+TMP_DIR_NAME = '.tmp'
+
+
+class MediaCache:
+    """
+    Content-addressed cache of downloaded task media (images, audio, video, documents).
+
+    Files are keyed by URL and task ID and stored as `<root>/<key>/<file name>`, so the original
+    file extension is kept. A file is downloaded into a private temporary directory and renamed
+    into place, so other threads and processes never see partial files. Concurrent requests for
+    the same file in one process wait for a single download. When the total size exceeds
+    `max_bytes`, least recently used files are removed.
+    """
+
+    def __init__(self, path: str = MEDIA_CACHE_DIR, max_bytes: int = MEDIA_CACHE_MAX_BYTES):
+        """
+        Args:
+            path (str): Cache directory.
+            max_bytes (int): Max total size of cached files, 0 disables caching.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+        self._key_locks = {}
+        # key -> (path, size), ordered from the least to the most recently used
+        self._entries = None
+        self._total_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(url: str, task_id=None) -> str:
+        # cloud storage URIs resolve to different presigned URLs per task, so task_id is a part of the key
+        return hashlib.sha256(f'{url}\x00{task_id or ""}'.encode('utf-8')).hexdigest()[:32]
+
+    def _scan(self):
+        """Build the index from files on disk, must be called under the lock"""
+        entries = []
+        os.makedirs(self.path, exist_ok=True)
+        for entry in os.scandir(self.path):
+            if entry.name == TMP_DIR_NAME or not entry.is_dir():
+                continue
+            filepath = self._find(entry.path)
+            if filepath is not None:
+                stat = os.stat(filepath)
+                entries.append((stat.st_mtime, entry.name, filepath, stat.st_size))
+        self._entries = OrderedDict((key, (filepath, size)) for _, key, filepath, size in sorted(entries))
+        self._total_bytes = sum(size for _, size in self._entries.values())
+
+    @staticmethod
+    def _find(key_dir: str) -> Optional[str]:
+        try:
+            names = os.listdir(key_dir)
+        except FileNotFoundError:
+            return None
+        return os.path.join(key_dir, names[0]) if names else None
+
+    def _lookup(self, key: str) -> Optional[str]:
+        """Return the cached file, it could be added by another process, so disk is the source of truth"""
+        filepath = self._find(os.path.join(self.path, key))
+        if filepath is None:
+            return None
+        try:
+            # mtime is the last access time used for eviction, it's shared by all processes
+            os.utime(filepath)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if self._entries is not None and key in self._entries:
+                self._entries.move_to_end(key)
+        return filepath
+
+    def get_local_path(self, url: str, task_id=None, **kwargs) -> str:
+        """
+        Return the local path of the file, downloading it on a miss.
+
+        Args:
+            url: File URL, any URL supported by the SDK `get_local_path()`.
+            task_id: Label Studio task ID, required for cloud storage URIs.
+            kwargs: Other SDK `get_local_path()` arguments, `cache_dir` is ignored.
+
+        Returns:
+            str: Local file path.
+        """
+        kwargs.pop('cache_dir', None)
+        local_path = self._local_file(url)
+        if local_path is not None:
+            return local_path
+
+        key = self.make_key(url, task_id)
+        filepath = self._lookup(key)
+        if filepath is not None:
+            CACHE_REQUESTS.inc(cache='media', result='hit')
+            return filepath
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, Lock())
+        with key_lock:
+            # another thread could download the file while we were waiting
+            filepath = self._lookup(key)
+            if filepath is not None:
+                CACHE_REQUESTS.inc(cache='media', result='hit')
+                return filepath
+            CACHE_REQUESTS.inc(cache='media', result='miss')
+            try:
+                filepath = self._download(key, url, task_id, **kwargs)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return filepath
+
+    @staticmethod
+    def _local_file(url: str) -> Optional[str]:
+        """Local Storage files readable from disk are used in place and not copied to the cache"""
+        if url.startswith('/data/') and '?d=' in url:
+            filepath = sdk_io.resolve_local_storage_file(url)
+            if filepath and os.path.exists(filepath):
+                return filepath
+        return None
+
+    def _download(self, key: str, url: str, task_id, **kwargs) -> str:
+        tmp_root = os.path.join(self.path, TMP_DIR_NAME)
+        os.makedirs(tmp_root, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=tmp_root)
+        try:
+            downloaded = sdk_io.get_local_path(url, cache_dir=tmp_dir, task_id=task_id, **kwargs)
+            if os.path.dirname(os.path.abspath(downloaded)) != os.path.abspath(tmp_dir):
+                # the SDK found the file on a local disk, e.g. in the uploads directory
+                return downloaded
+
+            # the SDK prefixes file names with a short URL hash, the key directory makes it redundant
+            name = os.path.basename(downloaded).split('__', 1)[-1] or 'file'
+            key_dir = os.path.join(self.path, key)
+            os.makedirs(key_dir, exist_ok=True)
+            filepath = os.path.join(key_dir, name)
+            os.replace(downloaded, filepath)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self._add(key, filepath)
+        return filepath
+
+    def _add(self, key: str, filepath: str):
+        size = os.path.getsize(filepath)
+        with self._lock:
+            if self._entries is None:
+                self._scan()
+            else:
+                _, old_size = self._entries.pop(key, (None, 0))
+                self._entries[key] = (filepath, size)
+                self._total_bytes += size - old_size
+            if self._total_bytes > self.max_bytes:
+                # other processes add files too, evict based on what's really on disk
+                self._scan()
+                self._evict(keep=key)
+            MEDIA_CACHE_BYTES.set(self._total_bytes)
+
+    def _evict(self, keep: str):
+        """Remove least recently used files until the cache fits, must be called under the lock"""
+        for key in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            filepath, size = self._entries.pop(key)
+            shutil.rmtree(os.path.dirname(filepath), ignore_errors=True)
+            self._total_bytes -= size
+            logger.debug(f'Media cache evicted {filepath} ({size} bytes)')
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._entries = None
+            self._total_bytes = 0
+            MEDIA_CACHE_BYTES.set(0)
+
+
+MEDIA_CACHE = MediaCache()
+
+
+def get_local_path(url, cache_dir=None, task_id=None, **kwargs):
+    """
+    Drop-in replacement of the SDK `get_local_path()` going through the media cache.
+    The SDK function is called directly if the media cache is disabled (MEDIA_CACHE_MAX_BYTES=0, the default)
+    or the caller chose its own `cache_dir`.
+    """
+    if not MEDIA_CACHE.enabled or cache_dir is not None or not kwargs.get('download_resources', True):
+        return sdk_io.get_local_path(url, cache_dir=cache_dir, task_id=task_id, **kwargs)
+    return MEDIA_CACHE.get_local_path(url, task_id=task_id, **kwargs)
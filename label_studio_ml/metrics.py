@@ -0,0 +1,209 @@
+"""
+Minimal Prometheus-style metrics without external dependencies, exposed by the /metrics endpoint
+in the Prometheus text format. Metrics are kept per server process, so with several gunicorn
+workers every scrape reports the worker that handled it.
+"""
+import time
+
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Iterable, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = Lock()
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        for name, labels, value in self.samples():
+            lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name + '_total', _format_labels(self.labelnames, key), value
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def get_count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                yield self.name + '_bucket', _format_labels(self.labelnames, key, le), cumulative
+            yield self.name + '_sum', _format_labels(self.labelnames, key), total
+            yield self.name + '_count', _format_labels(self.labelnames, key), count
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                return self._metrics[metric.name]
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Metric:
+        return self._metrics.get(name)
+
+    def clear(self):
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter(
+    'label_studio_ml_requests', 'Number of HTTP requests', ('endpoint', 'method', 'status'))
+REQUEST_LATENCY = REGISTRY.histogram(
+    'label_studio_ml_request_duration_seconds', 'HTTP request latency', ('endpoint',))
+REQUESTS_IN_PROGRESS = REGISTRY.gauge(
+    'label_studio_ml_requests_in_progress', 'Number of HTTP requests being processed', ('endpoint',))
+STAGE_LATENCY = REGISTRY.histogram(
+    'label_studio_ml_stage_duration_seconds',
+    'Latency of request processing stages: model_construction, predict, model_dump, '
+    'json_serialization, preload_task_data, get_local_path',
+    ('stage',))
+CACHE_REQUESTS = REGISTRY.counter(
+    'label_studio_ml_cache_requests', 'Model cache reads by result (hit or miss)', ('cache', 'result'))
+
+
+def time_stage(stage: str):
+    """Context manager measuring the latency of a request processing stage"""
+    return STAGE_LATENCY.time(stage=stage)
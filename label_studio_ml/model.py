@@ -1,3 +1,5 @@
+import asyncio
+import contextvars
 import copy
 import os
 import logging
@@ -17,26 +19,64 @@ try:
 except ImportError:
     import multiprocessing as mp
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from semver import Version
 
 from typing import Tuple, Callable, Union, List, Dict, Optional
 from abc import ABC
 from colorama import Fore
 
-from label_studio_sdk.label_interface import LabelInterface
-from label_studio_sdk._extensions.label_studio_tools.core.label_config import parse_config
-from label_studio_sdk._extensions.label_studio_tools.core.utils.io import get_local_path
+from label_studio_sdk._extensions.label_studio_tools.core.utils import io as sdk_io
+from label_studio_sdk._extensions.label_studio_tools.core.utils.io import http_session
 from .response import ModelResponse
-from .utils import is_preload_needed
+from .utils import is_preload_needed, get_http_session
 from .cache import create_cache
+from .deadline import Deadline, DeadlineExceeded, get_deadline
+from .metrics import time_stage
+from .media_cache import get_local_path
+from .label_config import get_label_interface, get_parsed_label_config
 
 logger = logging.getLogger(__name__)
 
+# max number of task data values downloaded concurrently by preload_tasks_data()
+PRELOAD_WORKERS = int(os.getenv('PRELOAD_WORKERS', 8))
+
 CACHE = create_cache(
     os.getenv('CACHE_TYPE', 'sqlite'),
     path=os.getenv('MODEL_DIR', '.'))
 
 
+class PreloadError(Exception):
+    """
+    Raised by `preload_tasks_data()` when values of some tasks failed to load, after all downloads are finished.
+
+    Attributes:
+        values (list): Preloaded value of each task, None for the failed tasks.
+        errors (dict): Task index => error of the first value of the task that failed to load.
+    """
+
+    def __init__(self, values: List, errors: Dict[int, Exception]):
+        first = min(errors)
+        super().__init__(f'Failed to preload data of {len(errors)} of {len(values)} tasks, '
+                         f'task #{first}: {errors[first]!r}')
+        self.values = values
+        self.errors = errors
+
+
+def set_cache(cache_type: str, path: Optional[str] = None, **kwargs):
+    """Replace the cache used by all models, e.g. to choose the cache backend after import.
+
+    Args:
+        cache_type (str): One of 'sqlite', 'memory', 'lmdb', 'redis'.
+        path (str, optional): Cache directory, MODEL_DIR by default.
+        kwargs: Additional cache backend parameters.
+    """
+    global CACHE
+    CACHE = create_cache(cache_type, path=path or os.getenv('MODEL_DIR', '.'), **kwargs)
+    return CACHE
+
+
 # Decorator to register predict function
 _predict_fn: Callable = None
 _update_fn: Callable = None
@@ -78,6 +118,8 @@ class LabelStudioMLBase(ABC):
             project_id (str, optional): The project ID. Defaults to None.
         """
         self.project_id = project_id or ''
+        # fetch everything the initialization needs with one query, the next reads hit the cache memory
+        CACHE.get_many(self.project_id, ('label_config', 'model_version'))
         if label_config is not None:
             self.use_label_config(label_config)
         else:
@@ -98,7 +140,40 @@ class LabelStudioMLBase(ABC):
         
         # self.set("model_version", "0.0.2")
         
-        
+    @classmethod
+    def preload_weights(cls) -> bool:
+        """Load weights shared by all instances into class or module attributes, called once
+        by init_app(). With gunicorn --preload it runs in the master process before workers
+        are forked, so the workers share the memory of the weights as long as nothing writes
+        to it: keep them on CPU, freeze them with label_studio_ml.weights.freeze_module(),
+        and don't initialize CUDA here. Return True if weights were loaded, init_app() then
+        freezes the garbage collector state, see GC_FREEZE. Does nothing by default.
+        """
+        return False
+
+    def warmup(self):
+        """Prepare the model for the first request, called once per server process
+        before it reports ready, see MODEL_WARMUP. Override it to run a prediction
+        on synthetic data, so lazy initialization (CUDA context, CPU kernels,
+        memory pools) doesn't slow down the first real request. Does nothing by default.
+        """
+        pass
+
+    @classmethod
+    def loaded_models(cls) -> List[Dict]:
+        """Describe the weights loaded in this process for GET /models, e.g. with their paths
+        and memory footprint in bytes. Returns an empty list by default.
+        """
+        return []
+
+    @property
+    def deadline(self) -> Deadline:
+        """Deadline of the /predict request being processed, see PREDICT_TIMEOUT.
+        Check `self.deadline.expired` between tasks and return predictions of the tasks
+        finished so far, Label Studio doesn't wait for the rest anyway.
+        """
+        return get_deadline()
+
     def use_label_config(self, label_config: str):
         """
         Apply label configuration and set the model version and parsed label config.
@@ -106,7 +181,8 @@ class LabelStudioMLBase(ABC):
         Args:
             label_config (str): The label configuration.
         """
-        self.label_interface = LabelInterface(config=label_config)
+        # parsed configs are shared by all instances with the same config, see LABEL_CONFIG_CACHE_SIZE
+        self.label_interface = get_label_interface(label_config)
         
         # if not current_label_config:
             # first time model is initialized
@@ -115,8 +191,10 @@ class LabelStudioMLBase(ABC):
         current_label_config = self.get('label_config')    
         # label config has been changed, need to save
         if current_label_config != label_config:
-            self.set('label_config', label_config)
-            self.set('parsed_label_config', json.dumps(parse_config(label_config)))        
+            CACHE.set_many(self.project_id, {
+                'label_config': label_config,
+                'parsed_label_config': json.dumps(get_parsed_label_config(label_config)),
+            })
             
 
     def set_extra_params(self, extra_params):
@@ -159,7 +237,11 @@ class LabelStudioMLBase(ABC):
         return self.get('label_config')
 
     @property
-    def parsed_label_config(self):        
+    def parsed_label_config(self):
+        label_config = self.label_config
+        if label_config:
+            # shared by all instances with the same config, don't modify it
+            return get_parsed_label_config(label_config)
         return json.loads(self.get('parsed_label_config'))
 
     @property
@@ -190,6 +272,8 @@ class LabelStudioMLBase(ABC):
     def predict(self, tasks: List[Dict], context: Optional[Dict] = None, **kwargs) -> Union[List[Dict], ModelResponse]:
         """
         Predict and return a list of dicts with predictions for each task.
+        It can be defined as `async def predict(...)` for I/O-bound models served by `label_studio_ml.asgi`,
+        it must not call blocking helpers then: use `get_local_path_async()` and `preload_tasks_data_async()`.
 
         Args:
             tasks (list[dict]): A list of tasks.
@@ -249,15 +333,33 @@ class LabelStudioMLBase(ABC):
         Returns:
           The local path for the given URL.
         """
-        return get_local_path(
-            url,
-            project_dir=project_dir,
-            hostname=ls_host,
-            access_token=ls_access_token,
-            task_id=task_id,
-            *args,
-            **kwargs
-        )
+        with time_stage('get_local_path'):
+            return get_local_path(
+                url,
+                project_dir=project_dir,
+                hostname=ls_host,
+                access_token=ls_access_token,
+                task_id=task_id,
+                *args,
+                **kwargs
+            )
+
+    @staticmethod
+    async def _run_in_thread(fn, *args, **kwargs):
+        """Await a blocking call in the default executor of the running event loop,
+        with the context of the caller, so the request deadline and HTTP session stay visible"""
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(context.run, fn, *args, **kwargs))
+
+    async def get_local_path_async(self, url, *args, **kwargs) -> str:
+        """`get_local_path()` for `async def predict()`, the download doesn't block the event loop"""
+        return await self._run_in_thread(self.get_local_path, url, *args, **kwargs)
+
+    async def preload_tasks_data_async(self, tasks: List[Dict], values: Optional[List] = None,
+                                       read_file=True) -> List:
+        """`preload_tasks_data()` for `async def predict()`, the downloads don't block the event loop"""
+        return await self._run_in_thread(self.preload_tasks_data, tasks, values, read_file)
 
     def preload_task_data(self, task: Dict, value=None, read_file=True):
         """ Preload task_data values using get_local_path() if values are URI/URL/local path.
@@ -270,29 +372,117 @@ class LabelStudioMLBase(ABC):
         Returns:
             Any: Preloaded task data value.
         """
+        try:
+            return self.preload_tasks_data([task], [value], read_file)[0]
+        except PreloadError as e:
+            raise e.errors[0] from None
+
+    def preload_tasks_data(self, tasks: List[Dict], values: Optional[List] = None, read_file=True) -> List:
+        """ Preload task_data values of multiple tasks at once, e.g. all tasks of a predict() call.
+
+        All URI/URL/local path values are collected first and then fetched concurrently
+        in PRELOAD_WORKERS threads sharing one keep-alive HTTP session. Dicts and lists
+        are changed in place, unlike `preload_task_data()` before, which returned new lists.
+        Failures are isolated per task: once all downloads are finished, PreloadError with the values
+        of the other tasks and the error of each failed task is raised, so the caller can skip only the failed
+        tasks. Values not started before the deadline of the request raise DeadlineExceeded instead.
+
+        Args:
+            tasks: Task roots.
+            values: Value to preload for each task, task['data'] of all tasks if it's None.
+            read_file: If True, read file content. Otherwise, return file path only.
+
+        Returns:
+            list: Preloaded value for each task.
+        """
+        if values is None:
+            values = [task.get('data') for task in tasks]
+        # values are replaced in their containers, a one-item list holds each root value
+        roots = [[value] for value in values]
+        refs = []
+        # (start, end) slices of refs belonging to each task
+        spans = []
+        for task, root in zip(tasks, roots):
+            start = len(refs)
+            self._collect_preload_refs(task, root, 0, refs)
+            spans.append((start, len(refs)))
+        errors = {}
+        if refs:
+            with time_stage('preload_task_data'):
+                errors = self._prefetch(refs, read_file)
+        values = [root[0] for root in roots]
+        if not errors:
+            return values
+
+        task_errors = {}
+        for index, (start, end) in enumerate(spans):
+            failed = [errors[url, task_id] for _, _, url, task_id in refs[start:end] if (url, task_id) in errors]
+            if failed:
+                # the request is out of time, predictions of the other tasks are of no use either
+                if isinstance(failed[0], DeadlineExceeded):
+                    raise failed[0]
+                task_errors[index] = failed[0]
+                # a raw URL left in the task would be passed to predict() as if it were the data
+                values[index] = None
+        logger.error(f'Failed to preload data of {len(task_errors)} of {len(tasks)} tasks, '
+                     f'{len(errors)} values failed in total')
+        raise PreloadError(values, task_errors)
+
+    def _collect_preload_refs(self, task: Dict, container, key, refs: List):
+        value = container[key]
         # recursively preload dict
         if isinstance(value, dict):
-            for key, item in value.items():
-                value[key] = self.preload_task_data(task=task, value=item, read_file=read_file)
-            return value
+            for item_key in value:
+                self._collect_preload_refs(task, value, item_key, refs)
 
         # recursively preload list
         elif isinstance(value, list):
-            return [
-                self.preload_task_data(task=task, value=item, read_file=read_file)
-                for item in value
-            ]
+            for index in range(len(value)):
+                self._collect_preload_refs(task, value, index, refs)
 
         # preload task data if value is URI/URL/local path
         elif isinstance(value, str) and is_preload_needed(value):
-            filepath = self.get_local_path(url=value, task_id=task.get('id'))
-            if not read_file:
-                return filepath
-            with open(filepath, 'r') as f:
-                return f.read()
-
-        # keep value as is
-        return value
+            refs.append((container, key, value, task.get('id')))
+
+    def _load_value(self, url: str, task_id, read_file: bool):
+        filepath = self.get_local_path(url=url, task_id=task_id)
+        if not read_file:
+            return filepath
+        with open(filepath, 'r') as f:
+            return f.read()
+
+    def _prefetch(self, refs: List, read_file: bool) -> Dict:
+        """Load unique (url, task_id) values of refs concurrently and put the results into their containers,
+        returns errors of the values that failed to load by (url, task_id)"""
+        unique = list(dict.fromkeys((url, task_id) for _, _, url, task_id in refs))
+        results = {}
+        errors = {}
+
+        def load(url, task_id):
+            try:
+                get_deadline().check()
+                results[url, task_id] = self._load_value(url, task_id, read_file)
+            except Exception as e:
+                errors[url, task_id] = e
+
+        # a session installed by the caller (e.g. Label Studio) takes precedence over the shared one
+        with http_session(sdk_io._http_session.get() or get_http_session()):
+            if len(unique) == 1:
+                load(*unique[0])
+            else:
+                with ThreadPoolExecutor(max_workers=min(PRELOAD_WORKERS, len(unique))) as executor:
+                    # every job runs in its own copy of the context, so the HTTP session is visible in workers
+                    for url, task_id in unique:
+                        executor.submit(contextvars.copy_context().run, load, url, task_id)
+
+        for url, task_id in unique:
+            if (url, task_id) in errors:
+                logger.warning(f'Failed to preload {url} of task {task_id}: {errors[url, task_id]}')
+
+        for container, key, url, task_id in refs:
+            if (url, task_id) in results:
+                container[key] = results[url, task_id]
+        return errors
 
     ## TODO this should go into SDK
     def get_first_tag_occurence(
@@ -0,0 +1,159 @@
+import logging
+import os
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Optional, Tuple, Type
+
+from . import model as model_module
+from .metrics import time_stage
+from .utils import get_label_config_hash
+
+logger = logging.getLogger(__name__)
+
+# max number of model instances kept per process, 0 disables pooling
+MODEL_POOL_SIZE = int(os.getenv('MODEL_POOL_SIZE', 16))
+# cache key of the per-project counter bumped on invalidation, shared by all server processes
+POOL_GENERATION_KEY = 'pool_generation'
+
+
+class ModelPool:
+    """
+    Per-process pool of model instances keyed by (model class, project_id, label config hash).
+
+    Constructing a model instance re-parses the label config, reads the cache and runs `setup()`,
+    which for most backends means loading weights from disk. The pool keeps the most recently used
+    instances alive, so repeated requests for the same project and label config cost only inference.
+    Least recently used instances are evicted when the pool is full.
+
+    Pooled instances are shared between request threads, so `predict()` should not keep
+    per-request state on `self`. Set MODEL_POOL_SIZE=0 to construct a new instance per request.
+
+    Instances of one project with different label configs are pooled side by side. The label config
+    is kept in the cache per project, so a pooled instance re-applies its config when it's reused.
+    """
+
+    def __init__(self, size: int = MODEL_POOL_SIZE, warmup_fn: Optional[Callable] = None, cache=None):
+        """
+        Args:
+            size (int): Maximum number of instances to keep, 0 disables pooling.
+            warmup_fn (callable, optional): Called with each newly constructed instance
+                before it is put into the pool, e.g. to run a dummy prediction.
+            cache (BaseCache, optional): Cache to keep project generations in, defaults to the model cache.
+        """
+        self.size = size
+        self.warmup_fn = warmup_fn
+        self._cache = cache
+        self._instances = OrderedDict()
+        self._key_locks = {}
+        self._lock = Lock()
+
+    @property
+    def cache(self):
+        # resolved on every access, so the cache replaced by set_cache() is picked up
+        return self._cache if self._cache is not None else model_module.CACHE
+
+    @staticmethod
+    def make_key(model_class: Type, project_id, label_config: Optional[str]) -> Tuple:
+        return model_class, str(project_id or ''), get_label_config_hash(label_config)
+
+    def _generation(self, project_id: str) -> str:
+        return self.cache[project_id, POOL_GENERATION_KEY] or '0'
+
+    def _construct(self, model_class, project_id, label_config):
+        with time_stage('model_construction'):
+            model = model_class(project_id=project_id, label_config=label_config)
+        if self.warmup_fn is not None:
+            self.warmup_fn(model)
+        return model
+
+    def _lookup(self, key, generation):
+        """Return a pooled instance if it's still valid, must be called under the pool lock"""
+        entry = self._instances.get(key)
+        if entry is None:
+            return None
+        model, model_generation = entry
+        if model_generation != generation:
+            # the project was invalidated by another process, e.g. after training
+            del self._instances[key]
+            return None
+        self._instances.move_to_end(key)
+        return model
+
+    @staticmethod
+    def _reuse(model, label_config: Optional[str]):
+        """Store the label config of a pooled instance in the cache again, another instance
+        of the project may have replaced it. The cache is written only if the config differs.
+        """
+        if label_config is not None:
+            model.use_label_config(label_config)
+        return model
+
+    def get(self, model_class: Type, project_id, label_config: Optional[str] = None):
+        """
+        Return a model instance for the project and label config, constructing it on a miss.
+
+        Args:
+            model_class: LabelStudioMLBase subclass to instantiate.
+            project_id: Label Studio project ID.
+            label_config (str, optional): Label config XML.
+
+        Returns:
+            LabelStudioMLBase: Model instance.
+        """
+        if self.size <= 0:
+            return self._construct(model_class, project_id, label_config)
+
+        key = self.make_key(model_class, project_id, label_config)
+        generation = self._generation(key[1])
+        with self._lock:
+            model = self._lookup(key, generation)
+            if model is not None:
+                return self._reuse(model, label_config)
+            key_lock = self._key_locks.setdefault(key, Lock())
+
+        # construct outside of the pool lock, so slow model loading for one project
+        # doesn't block requests for the others, and the same key is never built twice
+        with key_lock:
+            with self._lock:
+                model = self._lookup(key, generation)
+                if model is not None:
+                    return self._reuse(model, label_config)
+
+            logger.debug(f'Model pool miss: {model_class.__name__} project_id={project_id}')
+            model = self._construct(model_class, project_id, label_config)
+
+            with self._lock:
+                self._instances[key] = (model, generation)
+                self._key_locks.pop(key, None)
+                while len(self._instances) > self.size:
+                    evicted_key, _ = self._instances.popitem(last=False)
+                    logger.debug(f'Model pool evicted: {evicted_key[0].__name__} project_id={evicted_key[1]}')
+        return model
+
+    def warmup(self, model_class: Type, project_id, label_config: Optional[str] = None):
+        """Pre-build an instance for the project, so the first request doesn't pay for it."""
+        return self.get(model_class, project_id, label_config)
+
+    def invalidate(self, project_id=None):
+        """
+        Drop pooled instances of the project in all server processes,
+        or all instances of this process if project_id is None.
+        """
+        with self._lock:
+            if project_id is None:
+                self._instances.clear()
+                return
+            project_id = str(project_id)
+            for key in [k for k in self._instances if k[1] == project_id]:
+                del self._instances[key]
+            self.cache[project_id, POOL_GENERATION_KEY] = str(int(self._generation(project_id)) + 1)
+
+    def clear(self):
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._instances)
+
+    def __contains__(self, key):
+        return key in self._instances
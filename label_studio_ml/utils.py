@@ -1,7 +1,9 @@
 import difflib
+import hashlib
 import logging
 import os
 import re
+import requests
 
 from PIL import Image, ImageOps
 from collections import OrderedDict
@@ -9,7 +11,8 @@ from typing import List
 from urllib.parse import urlparse
 
 from label_studio_sdk._extensions.label_studio_tools.core.utils.params import get_env
-from label_studio_sdk._extensions.label_studio_tools.core.utils.io import get_local_path
+
+from .media_cache import get_local_path
 
 DATA_UNDEFINED_NAME = '$undefined$'
 
@@ -86,6 +89,30 @@ def get_image_local_path(
     return image_local_path
 
 
+_http_session = None
+_http_session_pid = None
+
+
+def get_http_session(pool_size=None):
+    """Return the keep-alive HTTP session shared by media downloads of this process"""
+    global _http_session, _http_session_pid
+    if _http_session is None or _http_session_pid != os.getpid():
+        pool_size = pool_size or int(os.getenv('PRELOAD_WORKERS', 8))
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _http_session, _http_session_pid = session, os.getpid()
+    return _http_session
+
+
+def get_label_config_hash(label_config):
+    """Return a stable hash of the label config XML, used as a key for per-config caches"""
+    if not label_config:
+        return ''
+    return hashlib.md5(label_config.encode('utf-8')).hexdigest()
+
+
 def get_image_size(filepath):
     img = Image.open(filepath)
     img = ImageOps.exif_transpose(img)
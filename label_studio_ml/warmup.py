@@ -0,0 +1,142 @@
+import logging
+import os
+import time
+
+from threading import Lock, Thread
+from typing import Callable, Dict, Optional
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# construct a model instance and run its warmup() in every server process before it reports ready,
+# only if WARMUP_LABEL_CONFIG is set
+MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'true').lower() in ('1', 'true', 'yes')
+# project ID and label config (XML or path to an XML file) of the instance built for warm-up
+WARMUP_PROJECT_ID = os.getenv('WARMUP_PROJECT_ID')
+WARMUP_LABEL_CONFIG = os.getenv('WARMUP_LABEL_CONFIG')
+
+WARMUP_SECONDS = REGISTRY.gauge(
+    'label_studio_ml_warmup_seconds', 'Duration of the model warm-up in this process')
+
+COLD = 'cold'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+
+def read_label_config(value: Optional[str]) -> Optional[str]:
+    """Return the label config XML given as is or as a path to a file"""
+    if value and not value.lstrip().startswith('<') and os.path.isfile(value):
+        with open(value) as f:
+            return f.read()
+    return value
+
+
+class ModelWarmup:
+    """
+    Per-process model warm-up and readiness state.
+
+    The warm-up builds a model instance, so weights are loaded before the first request, and calls its
+    `warmup()`, which runs a synthetic prediction to initialize CUDA contexts and CPU kernels. It runs
+    in a background thread, so health checks are answered meanwhile, and the process reports ready
+    when it's done. A failed warm-up is logged and the process reports ready anyway, it serves cold
+    requests like without warm-up.
+
+    The warm-up needs a label config: most models can't set up without one, and an instance built
+    without it would be pooled and write its state for a project no request uses. Without a label config
+    the warm-up is inactive and processes are ready right away.
+
+    Neither threads nor CUDA contexts survive forking, so with gunicorn --preload the warm-up must start
+    in each worker after the fork: from the gunicorn `post_fork` hook, or lazily on the first request
+    the worker gets, which is usually a health check.
+    """
+
+    def __init__(self, enabled: bool = MODEL_WARMUP, project_id: Optional[str] = WARMUP_PROJECT_ID,
+                 label_config: Optional[str] = WARMUP_LABEL_CONFIG):
+        """
+        Args:
+            enabled (bool): Warm up the model, otherwise processes are ready right away.
+            project_id (str, optional): Project ID of the instance built for warm-up.
+            label_config (str, optional): Label config XML or path of the instance built for warm-up.
+        """
+        self.enabled = enabled
+        self.project_id = project_id
+        self.label_config = label_config
+        self.state = COLD
+        self.error = None
+        self.seconds = None
+        self._get_model = None
+        self._thread = None
+        self._pid = None
+        self._lock = Lock()
+
+    def configure(self, get_model: Optional[Callable], enabled: Optional[bool] = None):
+        """
+        Set the model to warm up and reset the state, the warm-up runs again on the next `start()`.
+
+        Args:
+            get_model (callable, optional): Called with project ID and label config, returns the model instance.
+            enabled (bool, optional): Override `enabled`.
+        """
+        with self._lock:
+            self._get_model = get_model
+            if enabled is not None:
+                self.enabled = enabled
+            self._pid = None
+            self.state = COLD
+            self.error = None
+            self.seconds = None
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and self._get_model is not None and bool(self.label_config)
+
+    @property
+    def ready(self) -> bool:
+        return not self.active or (self._pid == os.getpid() and self.state in (READY, FAILED))
+
+    def start(self):
+        """Start the warm-up in the current process unless it's already started here"""
+        if not self.active or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.state = WARMING
+            self.error = None
+            self._thread = Thread(target=self._run, args=(self._get_model,), name='model-warmup', daemon=True)
+            self._thread.start()
+
+    def _run(self, get_model: Callable):
+        start = time.perf_counter()
+        logger.info('Model warm-up started')
+        try:
+            model = get_model(self.project_id, read_label_config(self.label_config))
+            model.warmup()
+        except Exception as e:
+            logger.error(f'Model warm-up failed, serving without it: {e}', exc_info=True)
+            self.error = f'{e.__class__.__name__}: {e}'
+            self.state = FAILED
+        else:
+            self.state = READY
+        self.seconds = time.perf_counter() - start
+        WARMUP_SECONDS.set(self.seconds)
+        logger.info(f'Model warm-up {self.state} in {self.seconds:.2f}s')
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the warm-up of the current process to finish, returns the readiness"""
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid():
+            thread.join(timeout)
+        return self.ready
+
+    def to_dict(self) -> Dict:
+        state = self.state if self._pid == os.getpid() else COLD
+        return {
+            'ready': self.ready,
+            'warmup': state if self.active else 'disabled',
+            'warmup_seconds': self.seconds if state != COLD else None,
+            'warmup_error': self.error if state != COLD else None,
+        }
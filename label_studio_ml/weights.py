@@ -0,0 +1,93 @@
+"""
+Sharing model weights between server processes.
+
+`gunicorn --preload` creates the app in the master process and forks workers from it. Memory pages of weights
+loaded before the fork are shared by all workers until one of them writes to them (copy-on-write),
+so N workers cost about one copy of the weights instead of N, see `LabelStudioMLBase.preload_weights()`.
+Weights loaded from a memory-mapped file are shared through the page cache even without --preload,
+see `load_state_dict_mmap()`.
+"""
+import contextlib
+import gc
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+# move objects that exist after preload_weights() to the permanent GC generation, so garbage collections
+# in the workers don't write to their headers, which would copy the memory pages they live in
+GC_FREEZE = os.getenv('GC_FREEZE', 'true').lower() in ('1', 'true', 'yes')
+
+
+@contextlib.contextmanager
+def single_threaded():
+    """
+    Run PyTorch CPU ops without the intra-op thread pool, if PyTorch is imported.
+    GNU OpenMP used by PyTorch CPU builds may deadlock in a process forked after a parallel region,
+    so code that runs in the gunicorn master, like `preload_weights()`, should not start it.
+    """
+    torch = sys.modules.get('torch')
+    if torch is None:
+        yield
+        return
+    threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(threads)
+
+
+def freeze_module(module):
+    """
+    Switch a PyTorch module to inference: eval mode and no gradients, so inference never writes to its parameters.
+
+    Returns:
+        torch.nn.Module: The same module.
+    """
+    module.eval()
+    for parameter in module.parameters():
+        parameter.requires_grad_(False)
+    return module
+
+
+def load_state_dict_mmap(module, path: str):
+    """
+    Load weights saved with `torch.save(module.state_dict(), path)` into the module as memory-mapped tensors.
+    Pages of the file are read on first access and shared by all processes mapping it, with or without --preload.
+
+    Returns:
+        torch.nn.Module: The same module, frozen with `freeze_module()`.
+    """
+    import torch
+
+    state_dict = torch.load(path, mmap=True, weights_only=True, map_location='cpu')
+    # assign=True keeps the mapped tensors instead of copying them into the module's own parameters
+    module.load_state_dict(state_dict, assign=True)
+    return freeze_module(module)
+
+
+def cpu_only() -> bool:
+    """
+    Whether this process can't use CUDA, decided without initializing it: `torch.cuda.is_available()`
+    initializes the CUDA driver, which is then unusable in the workers forked from the process.
+    True if PyTorch is built without CUDA, CUDA_VISIBLE_DEVICES hides all devices, or NVML finds no devices.
+    If NVML isn't available either, GPUs are assumed to be present and False is returned.
+    """
+    import torch
+
+    if not torch.backends.cuda.is_built():
+        return True
+    if os.getenv('CUDA_VISIBLE_DEVICES', '0').strip() in ('', '-1'):
+        return True
+    # NVML doesn't initialize CUDA, -1 if it can't be loaded
+    return torch.cuda._device_count_nvml() == 0
+
+
+def freeze_gc():
+    """Exclude all objects that exist now from garbage collections, see GC_FREEZE"""
+    if GC_FREEZE:
+        gc.collect()
+        gc.freeze()
+        logger.debug(f'Moved {gc.get_freeze_count()} objects to the permanent GC generation')
@@ -20,7 +20,7 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/heartexlabs/label-studio-ml-backend",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=['benchmarks', 'benchmarks.*']),
     include_package_data=True,
     classifiers=[
         "Programming Language :: Python :: 3",
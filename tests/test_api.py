@@ -10,7 +10,10 @@ def client():
 def test_api(client):
     response = client.get('/health')
     assert response.status_code == 200
-    assert response.get_json() ==  {'model_class': 'LabelStudioMLBase', 'status': 'UP'}
+    data = response.get_json()
+    assert data['model_class'] == 'LabelStudioMLBase'
+    assert data['status'] == 'UP'
+    assert data['ready'] is True
 
 def test_metrics(client):
     response = client.get('/metrics')
@@ -48,3 +51,37 @@ def test_webhook(client):
     
     assert response.status_code == 201
 
+
+def test_job_status_not_found(client):
+    response = client.get('/jobs/unknown')
+    assert response.status_code == 404
+
+def test_metrics_prometheus_format(client):
+    client.post('/predict', json={
+        'tasks': [{'id': 1}],
+        'label_config': '<View></View>',
+        'project': '1.1000000000',
+        'params': {'context': {}},
+    })
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert '# TYPE label_studio_ml_requests counter' in body
+    assert 'label_studio_ml_requests_total{endpoint="_predict",method="POST",status="200"}' in body
+    assert 'label_studio_ml_request_duration_seconds_bucket{endpoint="_predict",le="+Inf"}' in body
+    assert 'label_studio_ml_stage_duration_seconds_count{stage="predict"}' in body
+    assert 'label_studio_ml_requests_in_progress{endpoint="metrics"}' in body
+
+
+def test_truncate_body():
+    from label_studio_ml.api import truncate_body
+    assert truncate_body(b'short', max_bytes=10) == "b'short'"
+    assert truncate_body(b'x' * 100, max_bytes=10) == "b'xxxxxxxxxx'... (100 bytes total)"
+    assert truncate_body(b'x' * 100, max_bytes=0) == repr(b'x' * 100)
+
+
+def test_models(client):
+    response = client.get('/models')
+    assert response.status_code == 200
+    assert response.get_json() == {'model_class': 'LabelStudioMLBase', 'models': []}
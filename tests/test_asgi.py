@@ -0,0 +1,146 @@
+import asyncio
+import base64
+import json
+import time
+
+import pytest
+
+from label_studio_ml import api
+from label_studio_ml.asgi import init_asgi_app
+from label_studio_ml.deadline import get_deadline
+from label_studio_ml.model import LabelStudioMLBase
+
+
+class AsyncModel(LabelStudioMLBase):
+
+    async def predict(self, tasks, context=None, **kwargs):
+        await asyncio.sleep(0.2)
+        return [{'result': [], 'score': task['id']} for task in tasks]
+
+
+class AsyncPreloadModel(LabelStudioMLBase):
+    """Downloads task data with a blocking 0.2 s get_local_path() from `async def predict`"""
+
+    def get_local_path(self, url, *args, **kwargs):
+        time.sleep(0.2)
+        return f'{url} with deadline {get_deadline().timeout:g}'
+
+    async def predict(self, tasks, context=None, **kwargs):
+        values = await self.preload_tasks_data_async(tasks, read_file=False)
+        return [{'result': [], 'score': task['id'], 'path': value['image']} for task, value in zip(tasks, values)]
+
+
+class SyncModel(LabelStudioMLBase):
+
+    def predict(self, tasks, context=None, **kwargs):
+        return [{'result': [], 'score': task['id']} for task in tasks]
+
+
+async def call(app, method, path, body=None, headers=()):
+    content = json.dumps(body).encode() if body is not None else b''
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+        'headers': [(b'content-type', b'application/json'), *headers],
+    }
+    messages = [{'type': 'http.request', 'body': content, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    body = b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+    return sent[0]['status'], body
+
+
+def predict_request(task_id):
+    return {'tasks': [{'id': task_id}], 'label_config': '<View></View>', 'project': '1.1000000000', 'params': {}}
+
+
+@pytest.fixture
+def make_app():
+    yield init_asgi_app
+    api.init_app(LabelStudioMLBase)
+
+
+def test_async_predict_runs_concurrently(make_app):
+    app = make_app(AsyncModel, executor_workers=1)
+
+    async def run():
+        return await asyncio.gather(*[call(app, 'POST', '/predict', predict_request(i)) for i in range(10)])
+
+    start = time.perf_counter()
+    responses = asyncio.run(run())
+    # ten 0.2 s predictions with one executor thread finish together
+    assert time.perf_counter() - start < 1.5
+    for i, (status, body) in enumerate(responses):
+        assert status == 200
+        assert json.loads(body)['results'][0]['score'] == i
+
+
+def test_sync_predict(make_app):
+    app = make_app(SyncModel)
+    status, body = asyncio.run(call(app, 'POST', '/predict', predict_request(7)))
+    assert status == 200
+    assert json.loads(body)['results'] == [{'result': [], 'score': 7}]
+
+
+def test_other_routes_are_served_by_flask(make_app):
+    app = make_app(SyncModel)
+    status, body = asyncio.run(call(app, 'GET', '/health'))
+    assert status == 200
+    data = json.loads(body)
+    assert data['model_class'] == 'SyncModel'
+    assert data['status'] == 'UP'
+
+    status, _ = asyncio.run(call(app, 'POST', '/setup', {'project': '1.1000000000', 'schema': '<View></View>'}))
+    assert status == 200
+
+
+def test_predict_error(make_app):
+    app = make_app(SyncModel)
+    status, body = asyncio.run(call(app, 'POST', '/predict', {'tasks': 'not a list', 'project': '1'}))
+    assert status == 500
+    assert 'traceback' in json.loads(body)['result']
+
+
+def test_predict_basic_auth(make_app, monkeypatch):
+    app = make_app(SyncModel)
+    monkeypatch.setattr(api, 'BASIC_AUTH', ('user', 'pass'))
+    status, _ = asyncio.run(call(app, 'POST', '/predict', predict_request(1)))
+    assert status == 401
+
+    auth = (b'authorization', b'Basic ' + base64.b64encode(b'user:pass'))
+    status, _ = asyncio.run(call(app, 'POST', '/predict', predict_request(1), headers=[auth]))
+    assert status == 200
+
+
+def test_flask_app_supports_async_predict(make_app):
+    make_app(AsyncModel)
+    with api._server.test_client() as client:
+        response = client.post('/predict', json=predict_request(3))
+    assert response.status_code == 200
+    assert response.get_json()['results'] == [{'result': [], 'score': 3}]
+
+
+def test_async_preload_does_not_block_event_loop(make_app):
+    app = make_app(AsyncPreloadModel, executor_workers=1)
+    timeout = (b'x-predict-timeout', b'10')
+
+    def request(i):
+        return dict(predict_request(i), tasks=[{'id': i, 'data': {'image': f's3://bucket/{i}.png'}}])
+
+    async def run():
+        return await asyncio.gather(*[call(app, 'POST', '/predict', request(i), headers=[timeout]) for i in range(5)])
+
+    start = time.perf_counter()
+    responses = asyncio.run(run())
+    # five blocking 0.2 s downloads overlap instead of holding the loop one after another
+    assert time.perf_counter() - start < 0.8
+    for i, (status, body) in enumerate(responses):
+        assert status == 200
+        # the deadline of the request is visible in the download thread
+        assert json.loads(body)['results'][0]['path'] == f's3://bucket/{i}.png with deadline 10'
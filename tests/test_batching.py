@@ -0,0 +1,143 @@
+import time
+
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from label_studio_ml.batching import PredictBatcher, split_response
+from label_studio_ml.deadline import Deadline, DeadlineExceeded, deadline_scope, run_with_deadline
+from label_studio_ml.response import ModelResponse
+
+
+class EchoModel:
+    """Returns the task ID as the prediction of every task and records predict() calls"""
+
+    def __init__(self, fail=False, drop_last=False):
+        self.calls = []
+        self.fail = fail
+        self.drop_last = drop_last
+
+    def predict(self, tasks, context=None, **kwargs):
+        self.calls.append([task['id'] for task in tasks])
+        if self.fail:
+            raise ValueError('predict failed')
+        predictions = [{'result': task['id']} for task in tasks]
+        if self.drop_last and len(tasks) > 1:
+            predictions = predictions[:-1]
+        return predictions
+
+
+def predict_concurrently(batcher, model, n, params=None):
+    def predict(i):
+        return batcher.predict(lambda: model, '1', '<View/>', [{'id': i}], params or {})[1]
+
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        return list(executor.map(predict, range(n)))
+
+
+def test_concurrent_requests_are_merged():
+    model = EchoModel()
+    batcher = PredictBatcher(max_batch_size=4, max_wait_ms=1000)
+    results = predict_concurrently(batcher, model, 4)
+    assert results == [[{'result': i}] for i in range(4)]
+    assert len(model.calls) == 1
+    assert sorted(model.calls[0]) == [0, 1, 2, 3]
+
+
+def test_batch_is_flushed_after_max_wait():
+    model = EchoModel()
+    batcher = PredictBatcher(max_batch_size=100, max_wait_ms=10)
+    assert predict_concurrently(batcher, model, 1) == [[{'result': 0}]]
+    assert model.calls == [[0]]
+
+
+def test_batches_respect_max_batch_size():
+    model = EchoModel()
+    batcher = PredictBatcher(max_batch_size=2, max_wait_ms=200)
+    results = predict_concurrently(batcher, model, 6)
+    assert results == [[{'result': i}] for i in range(6)]
+    assert all(len(call) <= 2 for call in model.calls)
+    assert sorted(i for call in model.calls for i in call) == list(range(6))
+
+
+def test_disabled_batcher_calls_predict_per_request():
+    model = EchoModel()
+    batcher = PredictBatcher(max_batch_size=0)
+    predict_concurrently(batcher, model, 3)
+    assert len(model.calls) == 3
+
+
+def test_requests_with_context_are_not_merged():
+    model = EchoModel()
+    batcher = PredictBatcher(max_batch_size=4, max_wait_ms=1000)
+    _, result = batcher.predict(lambda: model, '1', '<View/>', [{'id': 1}], {}, context={'result': []})
+    assert result == [{'result': 1}]
+    assert model.calls == [[1]]
+
+
+def test_errors_are_raised_for_every_caller():
+    batcher = PredictBatcher(max_batch_size=2, max_wait_ms=1000)
+    with pytest.raises(ValueError):
+        predict_concurrently(batcher, EchoModel(fail=True), 2)
+
+
+def test_unsplittable_response_falls_back_to_per_request_calls():
+    model = EchoModel(drop_last=True)
+    batcher = PredictBatcher(max_batch_size=2, max_wait_ms=1000)
+    results = predict_concurrently(batcher, model, 2)
+    assert results == [[{'result': 0}], [{'result': 1}]]
+    assert len(model.calls) == 3
+
+
+def test_requests_with_different_deadlines_are_not_merged():
+    model = EchoModel()
+    batcher = PredictBatcher(max_batch_size=8, max_wait_ms=50)
+
+    def predict(timeout, ids):
+        return run_with_deadline(Deadline(timeout), batcher.predict,
+                                 lambda: model, '1', '<View/>', [{'id': i} for i in ids], {})[1]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        short = executor.submit(predict, 0.06, [0])
+        no_deadline = executor.submit(predict, None, [1, 2])
+        # the request without a deadline isn't cut short by the other one
+        assert no_deadline.result() == [{'result': 1}, {'result': 2}]
+        # the short request may use up its budget waiting for others, it's never merged anyway
+        short.exception()
+    assert [1, 2] in model.calls and all(len(call) <= 2 for call in model.calls)
+
+
+def test_merged_request_does_not_wait_past_its_deadline():
+    class SlowModel(EchoModel):
+        def predict(self, tasks, context=None, **kwargs):
+            time.sleep(0.5)
+            return super().predict(tasks, context, **kwargs)
+
+    batcher = PredictBatcher(max_batch_size=2, max_wait_ms=1000)
+
+    def predict(i):
+        with deadline_scope(Deadline(0.1)):
+            started = time.monotonic()
+            try:
+                batcher.predict(lambda: model, '1', '<View/>', [{'id': i}], {})
+            except DeadlineExceeded:
+                return time.monotonic() - started
+
+    model = SlowModel()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        waited = list(executor.map(predict, range(2)))
+    # the leader returns the late predictions, the other request gives up at its deadline
+    assert waited.count(None) == 1
+    assert [seconds for seconds in waited if seconds is not None][0] < 0.4
+
+
+def test_split_response():
+    response = ModelResponse(model_version='v1', predictions=[{'result': [], 'score': i} for i in range(3)])
+    first, second = split_response(response, [1, 2])
+    assert first.model_version == second.model_version == 'v1'
+    assert len(first.predictions) == 1 and len(second.predictions) == 2
+
+    assert split_response({'predictions': [1, 2], 'extra': 'x'}, [1, 1]) == [
+        {'predictions': [1], 'extra': 'x'}, {'predictions': [2], 'extra': 'x'}]
+    assert split_response([1, 2, 3], [2, 1]) == [[1, 2], [3]]
+    assert split_response([1, 2], [2, 1]) is None
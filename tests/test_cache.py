@@ -0,0 +1,140 @@
+"""
+Conformance tests shared by all cache backends.
+Optional backends are skipped if their packages are not installed.
+"""
+import os
+import threading
+import uuid
+import pytest
+
+from label_studio_ml.cache import SqliteCache, create_cache
+
+
+def make_redis_client():
+    try:
+        import fakeredis
+        return fakeredis.FakeRedis()
+    except ImportError:
+        pass
+    redis = pytest.importorskip('redis')
+    client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+    try:
+        client.ping()
+    except redis.exceptions.ConnectionError:
+        pytest.skip('Redis server is not available')
+    return client
+
+
+@pytest.fixture(params=['sqlite', 'memory', 'lmdb', 'redis'])
+def cache(request, tmp_path):
+    if request.param == 'lmdb':
+        pytest.importorskip('lmdb')
+    if request.param == 'redis':
+        # unique prefix isolates tests running against a shared server
+        return create_cache('redis', str(tmp_path), client=make_redis_client(), prefix=uuid.uuid4().hex)
+    return create_cache(request.param, str(tmp_path))
+
+
+def test_get_set_delete(cache):
+    assert cache['1', 'key'] is None
+    assert ('1', 'key') not in cache
+    cache['1', 'key'] = 'value'
+    assert cache['1', 'key'] == 'value'
+    assert ('1', 'key') in cache
+    assert cache['2', 'key'] is None
+    cache['1', 'key'] = 'updated'
+    assert cache['1', 'key'] == 'updated'
+    del cache['1', 'key']
+    assert cache['1', 'key'] is None
+    assert ('1', 'key') not in cache
+
+
+def test_empty_string_value(cache):
+    cache['1', 'key'] = ''
+    assert cache['1', 'key'] == ''
+    assert ('1', 'key') in cache
+
+
+def test_value_must_be_string(cache):
+    with pytest.raises(ValueError):
+        cache['1', 'key'] = {'a': 1}
+    with pytest.raises(ValueError):
+        cache.set_many('1', {'key': 1})
+
+
+def test_get_many_set_many(cache):
+    cache.set_many('1', {'a': 'x', 'b': 'y'})
+    assert cache.get_many('1', ['a', 'b', 'c']) == {'a': 'x', 'b': 'y', 'c': None}
+    assert cache.get_many('2', ['a']) == {'a': None}
+    assert cache.get_many('1', []) == {}
+
+
+def test_unicode_values(cache):
+    cache['проект', 'ключ'] = '<View>значение</View>'
+    assert cache['проект', 'ключ'] == '<View>значение</View>'
+
+
+def test_unknown_cache_type(tmp_path):
+    with pytest.raises(ValueError):
+        create_cache('unknown', str(tmp_path))
+
+
+def test_sqlite_read_cache_is_not_shared_between_instances(tmp_path):
+    first = SqliteCache(str(tmp_path / 'first'))
+    second = SqliteCache(str(tmp_path / 'second'))
+    first['1', 'key'] = 'first'
+    second['1', 'key'] = 'second'
+    assert first['1', 'key'] == 'first'
+    assert second['1', 'key'] == 'second'
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork is not available')
+def test_sqlite_read_cache_sees_writes_of_other_processes(tmp_path):
+    cache = SqliteCache(str(tmp_path))
+    cache['1', 'key'] = 'old'
+    assert cache['1', 'key'] == 'old'
+
+    pid = os.fork()
+    if pid == 0:
+        SqliteCache(str(tmp_path))['1', 'key'] = 'new'
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert cache['1', 'key'] == 'new'
+
+
+def test_sqlite_write_during_read_query_is_not_cached_stale(tmp_path):
+    cache = SqliteCache(str(tmp_path))
+    cache['1', 'key'] = 'old'
+    # another thread writes while the query of a read is running, the lock must not be held by the read
+    writer = threading.Thread(target=cache.__setitem__, args=(('1', 'key'), 'new'))
+
+    class SlowConnection:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def execute(self, sql, *args):
+            result = self.conn.execute(sql, *args).fetchall()
+            if sql.startswith('SELECT'):
+                writer.start()
+                writer.join(timeout=5)
+                assert not writer.is_alive()
+            return FetchAll(result)
+
+    class FetchAll:
+        def __init__(self, rows):
+            self.rows = rows
+
+        def fetchall(self):
+            return self.rows
+
+        def fetchone(self):
+            return self.rows[0]
+
+    cache._read_cache.clear()
+    connection = cache._connection
+    reader = threading.current_thread()
+    cache._connection = lambda: SlowConnection(connection()) if threading.current_thread() is reader else connection()
+    assert cache['1', 'key'] == 'old'
+    cache._connection = connection
+    assert cache['1', 'key'] == 'new'
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from label_studio_ml import api, deadline
+from label_studio_ml.asgi import init_asgi_app
+from label_studio_ml.batching import split_response
+from label_studio_ml.deadline import Deadline, DeadlineExceeded, deadline_scope, get_deadline, parse_timeout
+from label_studio_ml.model import LabelStudioMLBase
+
+
+class SlowModel(LabelStudioMLBase):
+    """Takes 0.1s per task and stops at the deadline"""
+
+    def predict(self, tasks, context=None, **kwargs):
+        predictions = []
+        for task in tasks:
+            if self.deadline.expired:
+                break
+            time.sleep(0.1)
+            predictions.append({'result': [], 'score': task['id']})
+        return predictions
+
+
+def predict_request(tasks, **params):
+    return {'tasks': [{'id': i} for i in range(tasks)], 'label_config': '<View></View>',
+            'project': '1.1000000000', 'params': params}
+
+
+@pytest.fixture
+def client():
+    api.init_app(SlowModel, warmup=False)
+    with api._server.test_client() as client:
+        yield client
+    api.init_app(LabelStudioMLBase, warmup=False)
+
+
+def test_deadline():
+    assert not Deadline().expired
+    assert Deadline().remaining == float('inf')
+    expired = Deadline(0.001)
+    time.sleep(0.002)
+    assert expired.expired
+    with pytest.raises(DeadlineExceeded):
+        expired.check()
+
+    with deadline_scope(expired):
+        assert get_deadline() is expired
+    assert not get_deadline().expired
+
+
+def test_parse_timeout(monkeypatch):
+    params = {'timeout': '2.5', 'login': 'user'}
+    assert parse_timeout(None, params) == 2.5
+    assert params == {'login': 'user'}
+    assert parse_timeout('1', {'timeout': 5}) == 1
+    assert parse_timeout('0', {}) is None
+    assert parse_timeout(None, {}) is None
+    monkeypatch.setattr(deadline, 'PREDICT_TIMEOUT', 3)
+    assert parse_timeout(None, {}) == 3
+    with pytest.raises(ValueError):
+        parse_timeout('soon', {})
+
+
+def test_partial_predictions(client):
+    response = client.post('/predict', json=predict_request(20), headers={'X-Predict-Timeout': '0.25'})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert 1 <= len(results) < 20
+    assert [r['score'] for r in results] == list(range(len(results)))
+
+
+def test_timeout_param(client):
+    response = client.post('/predict', json=predict_request(20, timeout=0.25))
+    assert response.status_code == 200
+    assert len(response.get_json()['results']) < 20
+
+
+def test_no_deadline(client):
+    response = client.post('/predict', json=predict_request(3))
+    assert len(response.get_json()['results']) == 3
+
+
+def test_deadline_exceeded_before_predict(client, monkeypatch):
+    original = api.get_model
+
+    def slow_get_model(*args, **kwargs):
+        time.sleep(0.1)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(api, 'get_model', slow_get_model)
+    response = client.post('/predict', json=predict_request(1), headers={'X-Predict-Timeout': '0.05'})
+    assert response.status_code == 504
+    assert 'Deadline' in response.get_json()['error']
+
+
+def test_split_partial_response():
+    predictions = [{'score': i} for i in range(3)]
+    assert split_response(predictions, [2, 2]) is None
+    assert split_response(predictions, [2, 2], partial=True) == [predictions[:2], predictions[2:]]
+    assert split_response(predictions, [2, 1, 1], partial=True)[2] == []
+
+
+def call_asgi(request, headers):
+    """Send one /predict request to the ASGI app of SlowModel, returns the status and the JSON body"""
+    app = init_asgi_app(SlowModel, warmup=False)
+    scope = {'type': 'http', 'method': 'POST', 'path': '/predict', 'query_string': b'',
+             'headers': [(b'content-type', b'application/json')] + headers}
+    messages = [{'type': 'http.request', 'body': json.dumps(request).encode(), 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    try:
+        asyncio.run(app(scope, receive, send))
+    finally:
+        api.init_app(LabelStudioMLBase, warmup=False)
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+
+def test_asgi_deadline():
+    status, body = call_asgi(predict_request(20), [(b'x-predict-timeout', b'0.25')])
+    assert status == 200
+    assert 1 <= len(body['results']) < 20
+
+
+def test_invalid_timeout_is_bad_request(client):
+    response = client.post('/predict', json=predict_request(1), headers={'X-Predict-Timeout': 'soon'})
+    assert response.status_code == 400
+    assert 'Invalid timeout' in response.get_json()['error']
+
+    status, body = call_asgi(predict_request(1, timeout='soon'), [])
+    assert status == 400
+    assert 'Invalid timeout' in body['error']
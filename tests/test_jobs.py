@@ -0,0 +1,117 @@
+import os
+import time
+import pytest
+
+from label_studio_ml import jobs
+from label_studio_ml import model as model_module
+from label_studio_ml.cache import MemoryCache, SqliteCache
+from label_studio_ml.jobs import TrainingJobQueue, TrainingQueueFull, COMPLETED, FAILED
+from label_studio_ml.model import LabelStudioMLBase
+
+
+LABEL_CONFIG = '<View><Text name="text" value="$text"/></View>'
+
+
+class TrainableModel(LabelStudioMLBase):
+
+    def fit(self, event, data, **kwargs):
+        return {'event': event, 'value': data.get('value')}
+
+
+class CrashingModel(LabelStudioMLBase):
+
+    def fit(self, event, data, **kwargs):
+        # like a worker killed by the OOM killer
+        os._exit(1)
+
+
+class StateModel(LabelStudioMLBase):
+
+    def fit(self, event, data, **kwargs):
+        self.set('trained', data['value'])
+
+
+def wait_for(queue, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = queue.get_status(job_id)
+        if status['status'] in (jobs.COMPLETED, jobs.FAILED):
+            return status
+        time.sleep(0.1)
+    raise TimeoutError(f'Job {job_id} is not finished')
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SqliteCache(str(tmp_path))
+
+
+def test_events_are_coalesced(cache, monkeypatch):
+    monkeypatch.setattr(jobs, 'TRAINING_COALESCE_SECONDS', 0.5)
+    finished = []
+    queue = TrainingJobQueue(workers=1, cache=cache, on_done=finished.append)
+
+    first = queue.submit(TrainableModel, '1', LABEL_CONFIG, 'ANNOTATION_CREATED', {'value': 1})
+    second = queue.submit(TrainableModel, '1', LABEL_CONFIG, 'ANNOTATION_UPDATED', {'value': 2})
+    assert first['job_id'] == second['job_id']
+    assert second['events'] == 2
+
+    status = wait_for(queue, first['job_id'])
+    assert status['status'] == COMPLETED
+    assert status['result'] == {'event': 'ANNOTATION_UPDATED', 'value': 2}
+    assert [job.id for job in finished] == [first['job_id']]
+
+
+def test_queue_is_bounded(cache, monkeypatch):
+    monkeypatch.setattr(jobs, 'TRAINING_COALESCE_SECONDS', 60)
+    queue = TrainingJobQueue(workers=1, max_queued=1, cache=cache)
+    queue.submit(TrainableModel, '1', LABEL_CONFIG, 'ANNOTATION_CREATED', {})
+    with pytest.raises(TrainingQueueFull):
+        queue.submit(TrainableModel, '2', LABEL_CONFIG, 'ANNOTATION_CREATED', {})
+
+
+def test_unknown_job_status(cache):
+    queue = TrainingJobQueue(workers=1, cache=cache)
+    assert queue.get_status('unknown') is None
+
+
+def test_worker_uses_server_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'TRAINING_COALESCE_SECONDS', 0)
+    server_cache = SqliteCache(str(tmp_path / 'server'))
+    monkeypatch.setattr(model_module, 'CACHE', server_cache)
+    queue = TrainingJobQueue(workers=1, cache=server_cache)
+    job = queue.submit(StateModel, '1', LABEL_CONFIG, 'ANNOTATION_CREATED', {'value': 'yes'})
+    assert wait_for(queue, job['job_id'])['status'] == COMPLETED
+    assert server_cache['1', 'trained'] == 'yes'
+
+
+def test_memory_cache_is_refused(cache, monkeypatch):
+    monkeypatch.setattr(model_module, 'CACHE', MemoryCache())
+    queue = TrainingJobQueue(workers=1, cache=cache)
+    with pytest.raises(ValueError, match='not shared between processes'):
+        queue.submit(TrainableModel, '1', LABEL_CONFIG, 'ANNOTATION_CREATED', {})
+
+
+def test_crashed_worker_fails_job_and_pool_recovers(cache, monkeypatch):
+    monkeypatch.setattr(jobs, 'TRAINING_COALESCE_SECONDS', 0)
+    queue = TrainingJobQueue(workers=1, cache=cache)
+    crashed = queue.submit(CrashingModel, '1', LABEL_CONFIG, 'ANNOTATION_CREATED', {})
+    status = wait_for(queue, crashed['job_id'])
+    assert status['status'] == FAILED
+    assert 'BrokenProcessPool' in status['error']
+
+    job = queue.submit(TrainableModel, '2', LABEL_CONFIG, 'ANNOTATION_CREATED', {'value': 1})
+    assert wait_for(queue, job['job_id'])['status'] == COMPLETED
+
+
+def test_finished_job_statuses_expire(cache, monkeypatch):
+    monkeypatch.setattr(jobs, 'TRAINING_COALESCE_SECONDS', 0)
+    monkeypatch.setattr(jobs, 'TRAINING_JOB_TTL', 0.5)
+    queue = TrainingJobQueue(workers=1, cache=cache)
+    first = queue.submit(TrainableModel, '1', LABEL_CONFIG, 'ANNOTATION_CREATED', {})
+    wait_for(queue, first['job_id'])
+    time.sleep(0.5)
+    second = queue.submit(TrainableModel, '1', LABEL_CONFIG, 'ANNOTATION_CREATED', {})
+    wait_for(queue, second['job_id'])
+    # finishing the second job removes the status of the first one
+    assert queue.get_status(first['job_id']) is None
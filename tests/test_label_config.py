@@ -0,0 +1,32 @@
+from label_studio_ml.label_config import LabelConfigCache
+from label_studio_ml.model import LabelStudioMLBase
+
+
+CONFIG_1 = '<View><Text name="text" value="$text"/><Choices name="label" toName="text"><Choice value="a"/></Choices></View>'
+CONFIG_2 = '<View><Text name="text" value="$text"/><Choices name="label" toName="text"><Choice value="b"/></Choices></View>'
+
+
+def test_parsed_configs_are_shared():
+    cache = LabelConfigCache(size=10)
+    assert cache.get_label_interface(CONFIG_1) is cache.get_label_interface(CONFIG_1)
+    assert cache.get_label_interface(CONFIG_1) is not cache.get_label_interface(CONFIG_2)
+    parsed = cache.get_parsed_config(CONFIG_1)
+    assert parsed is cache.get_parsed_config(CONFIG_1)
+    assert parsed['label']['labels'] == ['a']
+
+
+def test_lru_eviction():
+    cache = LabelConfigCache(size=2)
+    first = cache.get_label_interface(CONFIG_1)
+    cache.get_parsed_config(CONFIG_1)
+    cache.get_label_interface(CONFIG_2)
+    assert len(cache) == 2
+    assert cache.get_label_interface(CONFIG_1) is not first
+
+
+def test_models_share_label_interface():
+    first = LabelStudioMLBase(project_id='label-config-1', label_config=CONFIG_1)
+    second = LabelStudioMLBase(project_id='label-config-2', label_config=CONFIG_1)
+    assert first.label_interface is second.label_interface
+    assert first.parsed_label_config is second.parsed_label_config
+    assert first.parsed_label_config['label']['labels'] == ['a']
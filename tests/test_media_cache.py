@@ -0,0 +1,85 @@
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from label_studio_ml import media_cache
+from label_studio_ml.media_cache import MediaCache
+from label_studio_ml.metrics import CACHE_REQUESTS
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """Replace the SDK download with writing a file of 100 bytes into cache_dir"""
+    calls = []
+
+    def fake_get_local_path(url, cache_dir=None, task_id=None, **kwargs):
+        calls.append(url)
+        time.sleep(0.05)
+        filepath = os.path.join(cache_dir, 'abcdef12__' + os.path.basename(url))
+        with open(filepath, 'wb') as f:
+            f.write(b'x' * 100)
+        return filepath
+
+    monkeypatch.setattr(media_cache.sdk_io, 'get_local_path', fake_get_local_path)
+    return calls
+
+
+def test_hit_after_miss(tmp_path, downloads):
+    cache = MediaCache(str(tmp_path), max_bytes=10000)
+    hits = CACHE_REQUESTS.get(cache='media', result='hit')
+    first = cache.get_local_path('http://example.com/image.jpg', task_id=1)
+    second = cache.get_local_path('http://example.com/image.jpg', task_id=1)
+    assert first == second
+    assert os.path.basename(first) == 'image.jpg'
+    assert downloads == ['http://example.com/image.jpg']
+    assert CACHE_REQUESTS.get(cache='media', result='hit') == hits + 1
+    # no temporary files are left behind
+    assert os.listdir(tmp_path / media_cache.TMP_DIR_NAME) == []
+
+
+def test_task_id_is_part_of_the_key(tmp_path, downloads):
+    cache = MediaCache(str(tmp_path), max_bytes=10000)
+    cache.get_local_path('s3://bucket/image.jpg', task_id=1)
+    cache.get_local_path('s3://bucket/image.jpg', task_id=2)
+    assert len(downloads) == 2
+
+
+def test_concurrent_requests_download_once(tmp_path, downloads):
+    cache = MediaCache(str(tmp_path), max_bytes=10000)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        paths = set(executor.map(lambda _: cache.get_local_path('http://example.com/a.png'), range(8)))
+    assert len(paths) == 1
+    assert downloads == ['http://example.com/a.png']
+
+
+def test_lru_eviction(tmp_path, downloads):
+    cache = MediaCache(str(tmp_path), max_bytes=250)
+    first = cache.get_local_path('http://example.com/1.jpg')
+    second = cache.get_local_path('http://example.com/2.jpg')
+    time.sleep(0.01)
+    cache.get_local_path('http://example.com/1.jpg')  # touch the first file
+    cache.get_local_path('http://example.com/3.jpg')  # evicts the second file
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
+    assert len(downloads) == 3
+
+
+def test_disabled_cache_calls_sdk_directly(tmp_path, downloads, monkeypatch):
+    monkeypatch.setattr(media_cache, 'MEDIA_CACHE', MediaCache(str(tmp_path / 'cache'), max_bytes=0))
+    cache_dir = tmp_path / 'legacy'
+    cache_dir.mkdir()
+    path = media_cache.get_local_path('http://example.com/1.jpg', cache_dir=str(cache_dir))
+    assert os.path.dirname(path) == str(cache_dir)
+
+
+def test_explicit_cache_dir_bypasses_cache(tmp_path, downloads, monkeypatch):
+    monkeypatch.setattr(media_cache, 'MEDIA_CACHE', MediaCache(str(tmp_path / 'cache'), max_bytes=10000))
+    cache_dir = tmp_path / 'own'
+    cache_dir.mkdir()
+    path = media_cache.get_local_path('http://example.com/1.jpg', cache_dir=str(cache_dir))
+    assert os.path.dirname(path) == str(cache_dir)
+    assert not (tmp_path / 'cache').exists()
+
@@ -0,0 +1,38 @@
+from label_studio_ml.metrics import Registry
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    counter = registry.counter('test_requests', 'Requests', ('endpoint',))
+    gauge = registry.gauge('test_in_progress', 'In progress')
+    counter.inc(endpoint='predict')
+    counter.inc(2, endpoint='predict')
+    with gauge.track_inprogress():
+        assert gauge.get() == 1
+    assert gauge.get() == 0
+
+    body = registry.render()
+    assert '# TYPE test_requests counter' in body
+    assert 'test_requests_total{endpoint="predict"} 3' in body
+    assert 'test_in_progress 0' in body
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram('test_latency', 'Latency', ('stage',), buckets=(0.1, 1))
+    histogram.observe(0.05, stage='predict')
+    histogram.observe(0.5, stage='predict')
+    histogram.observe(5, stage='predict')
+
+    body = registry.render()
+    assert 'test_latency_bucket{stage="predict",le="0.1"} 1' in body
+    assert 'test_latency_bucket{stage="predict",le="1.0"} 2' in body
+    assert 'test_latency_bucket{stage="predict",le="+Inf"} 3' in body
+    assert 'test_latency_count{stage="predict"} 3' in body
+    assert 'test_latency_sum{stage="predict"} 5.55' in body
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter('test_errors', 'Errors', ('error',)).inc(error='say "hi"\n')
+    assert 'test_errors_total{error="say \\"hi\\"\\n"} 1' in registry.render()
@@ -0,0 +1,70 @@
+import pytest
+
+from label_studio_ml.model import LabelStudioMLBase
+from label_studio_ml.pool import ModelPool
+
+
+CONFIG_1 = '<View><Text name="text" value="$text"/></View>'
+CONFIG_2 = '<View><Text name="text2" value="$text"/></View>'
+
+
+class CountingModel(LabelStudioMLBase):
+    setup_calls = 0
+
+    def setup(self):
+        CountingModel.setup_calls += 1
+
+
+@pytest.fixture(autouse=True)
+def reset_counter():
+    CountingModel.setup_calls = 0
+
+
+def test_pool_reuses_instances():
+    pool = ModelPool(size=2)
+    model = pool.get(CountingModel, '1', CONFIG_1)
+    assert pool.get(CountingModel, '1', CONFIG_1) is model
+    assert CountingModel.setup_calls == 1
+
+
+def test_pool_lru_eviction():
+    pool = ModelPool(size=2)
+    first = pool.get(CountingModel, '1', CONFIG_1)
+    pool.get(CountingModel, '2', CONFIG_1)
+    pool.get(CountingModel, '1', CONFIG_1)  # touch project 1
+    pool.get(CountingModel, '3', CONFIG_1)  # evicts project 2
+    assert len(pool) == 2
+    assert pool.make_key(CountingModel, '2', CONFIG_1) not in pool
+    assert pool.get(CountingModel, '1', CONFIG_1) is first
+
+
+def test_pool_keeps_instances_of_project_configs():
+    pool = ModelPool(size=4)
+    first = pool.get(CountingModel, '1', CONFIG_1)
+    second = pool.get(CountingModel, '1', CONFIG_2)
+    assert len(pool) == 2
+    # alternating configs reuse both instances, each puts its config back into the cache
+    assert pool.get(CountingModel, '1', CONFIG_1) is first
+    assert first.label_config == CONFIG_1
+    assert pool.get(CountingModel, '1', CONFIG_2) is second
+    assert second.label_config == CONFIG_2
+    assert CountingModel.setup_calls == 2
+
+
+def test_pool_invalidate_and_disabled():
+    pool = ModelPool(size=2)
+    model = pool.get(CountingModel, '1', CONFIG_1)
+    pool.invalidate('1')
+    assert pool.get(CountingModel, '1', CONFIG_1) is not model
+
+    disabled = ModelPool(size=0)
+    assert disabled.get(CountingModel, '1', CONFIG_1) is not disabled.get(CountingModel, '1', CONFIG_1)
+    assert len(disabled) == 0
+
+
+def test_pool_warmup_fn():
+    warmed = []
+    pool = ModelPool(size=2, warmup_fn=warmed.append)
+    model = pool.warmup(CountingModel, '1', CONFIG_1)
+    pool.get(CountingModel, '1', CONFIG_1)
+    assert warmed == [model]
@@ -1,7 +1,8 @@
 import copy
 import pytest
 from unittest.mock import patch, mock_open
-from label_studio_ml.model import LabelStudioMLBase
+from label_studio_ml.deadline import Deadline, DeadlineExceeded, deadline_scope
+from label_studio_ml.model import LabelStudioMLBase, PreloadError
 
 
 @pytest.fixture
@@ -64,4 +65,58 @@ def test_preload_task_data_complex_structure(mock_get_local_path, mock_file, mod
     assert result == expected['data']
     mock_get_local_path.assert_called_with(url=url, task_id=task["id"])
     mock_file.assert_called_with("path", "r")
-    print(result)
\ No newline at end of file
+    print(result)
+
+def test_preload_tasks_data_concurrently(model, tmp_path):
+    files = {}
+    for i in range(4):
+        files[f"s3://bucket/{i}.txt"] = tmp_path / f"{i}.txt"
+        files[f"s3://bucket/{i}.txt"].write_text(f"text {i}")
+    calls = []
+
+    def fake_get_local_path(url, task_id=None):
+        calls.append((url, task_id))
+        if url == "s3://bucket/3.txt":
+            raise FileNotFoundError(url)
+        return str(files[url])
+
+    tasks = [
+        {"id": 1, "data": {"images": ["s3://bucket/0.txt", "s3://bucket/1.txt"], "text": "plain"}},
+        {"id": 2, "data": {"image": "s3://bucket/2.txt", "copy": "s3://bucket/2.txt"}},
+    ]
+    with patch.object(model, "get_local_path", side_effect=fake_get_local_path):
+        values = model.preload_tasks_data(tasks)
+
+    assert values[0] == {"images": ["text 0", "text 1"], "text": "plain"}
+    # the same value of a task is loaded once
+    assert values[1] == {"image": "text 2", "copy": "text 2"}
+    assert calls.count(("s3://bucket/2.txt", 2)) == 1
+
+    # a failed value fails only its task, after the other downloads, and isn't passed to predict() as a URL
+    calls.clear()
+    tasks = [
+        {"id": 3, "data": {"image": "s3://bucket/3.txt"}},
+        {"id": 4, "data": {"image": "s3://bucket/0.txt"}},
+        {"id": 5, "data": {"images": ["s3://bucket/1.txt", "s3://bucket/3.txt"]}},
+    ]
+    with patch.object(model, "get_local_path", side_effect=fake_get_local_path):
+        with pytest.raises(PreloadError) as e:
+            model.preload_tasks_data(tasks)
+    assert len(calls) == 4
+    assert e.value.values == [None, {"image": "text 0"}, None]
+    assert sorted(e.value.errors) == [0, 2]
+    assert isinstance(e.value.errors[0], FileNotFoundError)
+
+    # one task raises its own error
+    with patch.object(model, "get_local_path", side_effect=fake_get_local_path):
+        with pytest.raises(FileNotFoundError):
+            model.preload_task_data(tasks[0], tasks[0]["data"])
+
+
+def test_preload_tasks_data_after_deadline_raises(model):
+    tasks = [{"id": 1, "data": {"image": "s3://bucket/0.txt", "text": "s3://bucket/1.txt"}}]
+    with patch.object(model, "get_local_path") as mock_get_local_path, \
+            deadline_scope(Deadline(1e-9)), pytest.raises(DeadlineExceeded):
+        model.preload_tasks_data(tasks)
+    # no download is started and the raw URLs aren't left for predict()
+    mock_get_local_path.assert_not_called()
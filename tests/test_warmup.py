@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+from label_studio_ml import api
+from label_studio_ml.model import LabelStudioMLBase
+from label_studio_ml.warmup import ModelWarmup, READY, FAILED
+
+
+LABEL_CONFIG = '<View><Text name="text" value="$text"/></View>'
+
+
+class WarmModel(LabelStudioMLBase):
+    release = threading.Event()
+    warmed = []
+
+    def warmup(self):
+        self.release.wait(10)
+        self.warmed.append(self.project_id)
+
+
+class BrokenModel(LabelStudioMLBase):
+
+    def warmup(self):
+        raise RuntimeError('no GPU')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    WarmModel.release.clear()
+    WarmModel.warmed.clear()
+    monkeypatch.setattr(api.MODEL_WARMUP, 'label_config', LABEL_CONFIG)
+    with api._server.test_client() as client:
+        yield client
+    WarmModel.release.set()
+    api.MODEL_WARMUP.wait(10)
+    api.init_app(LabelStudioMLBase, warmup=False)
+
+
+def test_not_ready_until_warmed_up(client):
+    api.init_app(WarmModel, warmup=True)
+
+    response = client.get('/ready')
+    assert response.status_code == 503
+    assert response.get_json()['warmup'] == 'warming'
+    health = client.get('/health')
+    assert health.status_code == 200
+    assert health.get_json()['ready'] is False
+
+    WarmModel.release.set()
+    assert api.MODEL_WARMUP.wait(10)
+    response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.get_json()['warmup'] == READY
+    assert WarmModel.warmed == ['']
+    # the warmed up instance is pooled
+    assert api.MODEL_POOL.make_key(WarmModel, '', LABEL_CONFIG) in api.MODEL_POOL
+
+
+def test_failed_warmup_serves_cold(client):
+    api.init_app(BrokenModel, warmup=True)
+    assert api.MODEL_WARMUP.wait(10)
+
+    data = client.get('/ready').get_json()
+    assert data['warmup'] == FAILED
+    assert 'no GPU' in data['warmup_error']
+
+
+def test_warmup_disabled(client):
+    api.init_app(WarmModel, warmup=False)
+
+    response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.get_json()['warmup'] == 'disabled'
+    assert WarmModel.warmed == []
+
+
+def test_warmup_without_label_config_builds_no_instance(client, monkeypatch):
+    monkeypatch.setattr(api.MODEL_WARMUP, 'label_config', None)
+    api.init_app(WarmModel, warmup=True)
+
+    response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.get_json()['warmup'] == 'disabled'
+    assert len(api.MODEL_POOL) == 0
+
+
+def test_warmup_project_and_label_config(tmp_path):
+    config_path = tmp_path / 'config.xml'
+    config_path.write_text(LABEL_CONFIG)
+    models = []
+
+    def get_model(project_id, label_config):
+        model = WarmModel(project_id=project_id, label_config=label_config)
+        models.append(model)
+        return model
+
+    WarmModel.release.set()
+    warmup = ModelWarmup(enabled=True, project_id='7', label_config=str(config_path))
+    assert warmup.ready
+    warmup.configure(get_model)
+    assert not warmup.ready
+    warmup.start()
+    assert warmup.wait(10)
+    assert models[0].project_id == '7'
+    assert models[0].label_config == LABEL_CONFIG
+
+    # started once per process
+    warmup.start()
+    assert warmup.wait(10)
+    assert len(models) == 1
@@ -0,0 +1,86 @@
+import gc
+
+import pytest
+
+from label_studio_ml import api
+from label_studio_ml.model import LabelStudioMLBase
+from label_studio_ml.weights import cpu_only, freeze_module, load_state_dict_mmap, single_threaded
+
+torch = pytest.importorskip('torch')
+
+
+class SharedWeightsModel(LabelStudioMLBase):
+    module = None
+    preloads = 0
+
+    @classmethod
+    def preload_weights(cls):
+        cls.preloads += 1
+        cls.threads = torch.get_num_threads()
+        cls.module = freeze_module(torch.nn.Linear(4, 2))
+        return True
+
+    def predict(self, tasks, context=None, **kwargs):
+        with torch.inference_mode():
+            output = self.module(torch.ones(len(tasks), 4))
+        return [{'result': [], 'score': float(score)} for score in output.sum(dim=1)]
+
+
+@pytest.fixture
+def restore_app():
+    yield
+    api.init_app(LabelStudioMLBase, warmup=False)
+
+
+def test_init_app_preloads_weights(restore_app):
+    threads = torch.get_num_threads()
+    api.init_app(SharedWeightsModel, warmup=False)
+
+    assert SharedWeightsModel.preloads == 1
+    # no thread pool in the process gunicorn forks workers from
+    assert SharedWeightsModel.threads == 1
+    assert torch.get_num_threads() == threads
+    assert gc.get_freeze_count() > 0
+
+    response = api._server.test_client().post('/predict', json={
+        'tasks': [{'id': 1}], 'label_config': '<View></View>', 'project': '1.1000000000', 'params': {}})
+    assert response.status_code == 200
+    assert not SharedWeightsModel.module.weight.requires_grad
+
+
+def test_init_app_without_preloaded_weights_does_not_freeze_gc(restore_app):
+    gc.unfreeze()
+    api.init_app(LabelStudioMLBase, warmup=False)
+    # frozen objects are never collected, there is nothing shared to keep frozen
+    assert gc.get_freeze_count() == 0
+
+
+def test_single_threaded_restores_threads():
+    threads = torch.get_num_threads()
+    with pytest.raises(RuntimeError):
+        with single_threaded():
+            assert torch.get_num_threads() == 1
+            raise RuntimeError
+    assert torch.get_num_threads() == threads
+
+
+def test_load_state_dict_mmap(tmp_path):
+    path = str(tmp_path / 'weights.pt')
+    source = torch.nn.Linear(8, 8)
+    torch.save(source.state_dict(), path)
+
+    with torch.device('meta'):
+        module = torch.nn.Linear(8, 8)
+    module = load_state_dict_mmap(module, path)
+
+    assert torch.equal(module.weight, source.weight)
+    assert not module.training
+    assert not module.weight.requires_grad
+
+
+def test_cpu_only_does_not_initialize_cuda(monkeypatch):
+    monkeypatch.setenv('CUDA_VISIBLE_DEVICES', '-1')
+    assert cpu_only()
+    monkeypatch.delenv('CUDA_VISIBLE_DEVICES')
+    cpu_only()
+    assert not torch.cuda.is_initialized()
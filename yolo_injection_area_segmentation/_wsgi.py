@@ -34,6 +34,7 @@ logging.config.dictConfig({
 
 from label_studio_ml.api import init_app
 from model import NewModel
+from path_resolver import prescan_document_roots
 
 
 _DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.json')
@@ -48,6 +49,8 @@ def get_kwargs_from_config(config_path=_DEFAULT_CONFIG_PATH):
     return config
 
 
+prescan_document_roots()
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Label studio')
     parser.add_argument(
@@ -4,7 +4,7 @@ Configuration file for YOLO Injection Area Segmentation Model
 import os
 
 # Model configuration
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "train6", "weights", "best.pt")
+MODEL_PATH = os.getenv("MODEL_PATH", os.path.join(os.path.dirname(__file__), "train6", "weights", "best.pt"))
 MODEL_VERSION = "1.0.0"
 CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", "0.25"))
 IOU_THRESHOLD = float(os.getenv("IOU_THRESHOLD", "0.7"))
@@ -23,8 +23,37 @@ LABEL_STUDIO_TO_NAME = "image"        # To name in Label Studio labeling config
 
 # Processing configuration
 MAX_DETECTIONS = int(os.getenv("MAX_DETECTIONS", "300"))
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "16"))  # Images per YOLO forward pass, 1 runs inference per task
+# Douglas-Peucker tolerance for polygon simplification, in percent of the image size (0 keeps all mask points)
+POLYGON_SIMPLIFY_TOLERANCE = float(os.getenv("POLYGON_SIMPLIFY_TOLERANCE", "0"))
 DEVICE = os.getenv("DEVICE", "auto")  # "auto", "cpu", or "cuda"
 
+# Inference runtime: "torch" runs MODEL_PATH with PyTorch on DEVICE, "onnx" (ONNX Runtime) and "openvino" run
+# the model exported from MODEL_PATH on CPU, the export is created next to MODEL_PATH on first start (see export.py)
+RUNTIME = os.getenv("RUNTIME", "torch").lower()
+EXPORT_PRECISION = os.getenv("EXPORT_PRECISION", "fp32").lower()  # "fp32", "fp16" or "int8"
+EXPORT_CALIBRATION_DATA = os.getenv("EXPORT_CALIBRATION_DATA", "")  # Dataset YAML with images for INT8 calibration
+
 # Label Studio connection (for downloading images)
 LABEL_STUDIO_URL = os.getenv("LABEL_STUDIO_URL", "")
 LABEL_STUDIO_API_KEY = os.getenv("LABEL_STUDIO_API_KEY", "")
+
+# Label Studio Local Storage (/data/local-files/?d=<path>) resolution
+# Directories searched for Local Storage files in order, separated by ":" (os.pathsep)
+DOCUMENT_ROOTS = [root for root in os.getenv("DOCUMENT_ROOTS", os.pathsep.join([
+    os.getenv("LOCAL_FILES_DOCUMENT_ROOT", ""),
+    "/home/yan/StudioSpace/AI_Annotation_Studio/core_work_flow/storage",
+    "/data",
+    "/app/data",
+    "/opt/heartex/data",
+    "~/label-studio-data",
+    "~/.local/share/label-studio/media/upload",
+])).split(os.pathsep) if root]
+PATH_CACHE_TTL = float(os.getenv("PATH_CACHE_TTL", "300"))  # Seconds to remember found and missing files, 0 disables
+PATH_CACHE_MAX_ENTRIES = int(os.getenv("PATH_CACHE_MAX_ENTRIES", "100000"))
+# Document roots indexed at startup, separated by ":", lookups of indexed files don't touch the filesystem
+PATH_PRESCAN_ROOTS = [root for root in os.getenv("PATH_PRESCAN_ROOTS", "").split(os.pathsep) if root]
+
+# Logging configuration
+# Share of predict requests that log a summary record with timings and counts (1 = every request)
+PREDICT_LOG_SAMPLE_RATE = float(os.getenv("PREDICT_LOG_SAMPLE_RATE", "1.0"))
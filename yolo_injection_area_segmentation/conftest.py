@@ -0,0 +1,28 @@
+"""
+Fixtures shared by the unit tests of the model
+"""
+import os
+import sys
+from threading import Lock
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+@pytest.fixture
+def make_model():
+    """Factory of model instances without setup(), so no weights are loaded, YOLO is a mock"""
+    from model import YOLOInjectionAreaSegmentation
+
+    def make(project_id="test", names=None, predict=None):
+        model = YOLOInjectionAreaSegmentation.__new__(YOLOInjectionAreaSegmentation)
+        model.project_id = project_id
+        model.model = MagicMock()
+        model.model.names = names or {}
+        model.model.predict.side_effect = predict
+        model.inference_lock = Lock()
+        return model
+
+    return make
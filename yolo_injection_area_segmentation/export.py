@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Export of the trained model to ONNX or OpenVINO for CPU inference (RUNTIME=onnx|openvino)
+
+The server exports MODEL_PATH on first start if there's no up-to-date export next to it,
+run this script to export ahead of time and check that the exported model gives the same outputs:
+
+    python export.py --runtime onnx --precision fp16 --check train6/val_batch0_labels.jpg
+    python export.py --runtime openvino --precision int8 --data dataset.yaml --check images/*.jpg
+"""
+import os
+import sys
+import fcntl
+import shutil
+import logging
+import argparse
+import numpy as np
+from typing import Dict, List
+
+from ultralytics import YOLO
+
+from config import (
+    MODEL_PATH, RUNTIME, EXPORT_PRECISION, EXPORT_CALIBRATION_DATA,
+    IMAGE_SIZE, CONFIDENCE_THRESHOLD, IOU_THRESHOLD, MAX_DETECTIONS
+)
+
+logger = logging.getLogger(__name__)
+
+RUNTIMES = ("onnx", "openvino")
+# Ultralytics `quantize` export argument of each precision
+PRECISIONS = {"fp32": None, "fp16": 16, "int8": 8}
+# Min box IoU and max confidence difference between matched PyTorch and exported detections
+TOLERANCES = {"fp32": (0.99, 0.01), "fp16": (0.95, 0.03), "int8": (0.8, 0.1)}
+
+
+def exported_model_path(model_path: str = MODEL_PATH, runtime: str = RUNTIME,
+                        precision: str = EXPORT_PRECISION) -> str:
+    """Path of the exported model, Ultralytics picks the runtime by its suffix"""
+    stem = os.path.splitext(model_path)[0]
+    if runtime == "onnx":
+        return f"{stem}_{precision}.onnx"
+    return f"{stem}_{precision}_openvino_model"
+
+
+def export_model(model_path: str = MODEL_PATH, runtime: str = RUNTIME, precision: str = EXPORT_PRECISION,
+                 data: str = EXPORT_CALIBRATION_DATA, force: bool = False) -> str:
+    """Export the PyTorch model for the runtime unless an export newer than the model exists
+
+    Returns:
+        str: Path of the exported model.
+    """
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown runtime {runtime}, expected one of {RUNTIMES}")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision}, expected one of {list(PRECISIONS)}")
+
+    target = exported_model_path(model_path, runtime, precision)
+    # Ultralytics writes every export of a model to the same path, so server workers export one at a time
+    with open(f"{model_path}.export.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(model_path):
+            return target
+
+        logger.info(f"📦 Exporting {model_path} to {runtime} ({precision}), this takes a while...")
+        exported = YOLO(model_path).export(
+            format=runtime,
+            quantize=PRECISIONS[precision],
+            data=data or None,
+            imgsz=IMAGE_SIZE,
+            dynamic=True,  # batch inference needs a dynamic batch dimension
+            device="cpu",
+        )
+        exported = str(exported).rstrip(os.sep)
+        if os.path.abspath(exported) != os.path.abspath(target):
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.replace(exported, target)
+        logger.info(f"✅ Exported model saved to {target}")
+        return target
+
+
+def load_exported_model(path: str) -> YOLO:
+    return YOLO(path, task="segment")
+
+
+def predict(model: YOLO, images: List[str]):
+    return model.predict(source=images, conf=CONFIDENCE_THRESHOLD, iou=IOU_THRESHOLD, imgsz=IMAGE_SIZE,
+                         max_det=MAX_DETECTIONS, device="cpu", verbose=False)
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of xyxy boxes, returns an array of shape (len(a), len(b))"""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+def borderline(boxes: np.ndarray, conf: np.ndarray, indices: np.ndarray, conf_margin: float,
+               iou_margin: float) -> np.ndarray:
+    """Detections that the confidence threshold or NMS may keep or drop after a tiny change of scores"""
+    if len(indices) == 0:
+        return np.zeros(0, dtype=bool)
+    overlap = box_iou(boxes[indices], boxes)
+    overlap[np.arange(len(indices)), indices] = 0
+    return (conf[indices] <= CONFIDENCE_THRESHOLD + conf_margin) | (overlap.max(axis=1) >= IOU_THRESHOLD - iou_margin)
+
+
+def compare_results(reference, candidate, conf_margin: float = 0.01, iou_margin: float = 0.01) -> Dict:
+    """Match detections of the exported model to PyTorch ones of the same class by box IoU
+
+    Unmatched detections within `conf_margin` of the confidence threshold or `iou_margin` of the NMS
+    IoU threshold are expected with lower precision, other unmatched ones are counted as `unexplained`.
+
+    Returns:
+        dict: Detection counts, the number of unmatched and unexplained detections,
+        the lowest box and mask IoU and the highest confidence difference of matched detections.
+    """
+    ref_boxes, cand_boxes = reference.boxes.xyxy.cpu().numpy(), candidate.boxes.xyxy.cpu().numpy()
+    ref_cls, cand_cls = reference.boxes.cls.cpu().numpy(), candidate.boxes.cls.cpu().numpy()
+    ref_conf, cand_conf = reference.boxes.conf.cpu().numpy(), candidate.boxes.conf.cpu().numpy()
+    report = {"reference": len(ref_boxes), "exported": len(cand_boxes), "unmatched": 0, "unexplained": 0,
+              "min_box_iou": 1.0, "min_mask_iou": 1.0, "max_conf_diff": 0.0}
+
+    iou = box_iou(ref_boxes, cand_boxes)
+    iou[ref_cls[:, None] != cand_cls[None, :]] = 0
+    # Greedy one-to-one matching, the most overlapping pairs first
+    ref_idx, cand_idx = [], []
+    pairs = np.argwhere(iou > 0.5)
+    for i, j in pairs[np.argsort(-iou[pairs[:, 0], pairs[:, 1]], kind="stable")]:
+        if i not in ref_idx and j not in cand_idx:
+            ref_idx.append(i)
+            cand_idx.append(j)
+    ref_idx, cand_idx = np.array(ref_idx, dtype=int), np.array(cand_idx, dtype=int)
+
+    ref_unmatched = np.setdiff1d(np.arange(len(ref_boxes)), ref_idx)
+    cand_unmatched = np.setdiff1d(np.arange(len(cand_boxes)), cand_idx)
+    report["unmatched"] = len(ref_unmatched) + len(cand_unmatched)
+    report["unexplained"] = int(
+        (~borderline(ref_boxes, ref_conf, ref_unmatched, conf_margin, iou_margin)).sum()
+        + (~borderline(cand_boxes, cand_conf, cand_unmatched, conf_margin, iou_margin)).sum())
+    if len(ref_idx) == 0:
+        return report
+
+    report["min_box_iou"] = float(iou[ref_idx, cand_idx].min())
+    report["max_conf_diff"] = float(np.abs(ref_conf[ref_idx] - cand_conf[cand_idx]).max())
+    if reference.masks is not None and candidate.masks is not None:
+        ref_masks = reference.masks.data.cpu().numpy()[ref_idx] > 0.5
+        cand_masks = candidate.masks.data.cpu().numpy()[cand_idx] > 0.5
+        intersection = (ref_masks & cand_masks).sum(axis=(1, 2))
+        union = (ref_masks | cand_masks).sum(axis=(1, 2))
+        report["min_mask_iou"] = float((intersection / np.maximum(union, 1)).min())
+    return report
+
+
+def check_exported_model(path: str, images: List[str], model_path: str = MODEL_PATH,
+                         precision: str = EXPORT_PRECISION) -> bool:
+    """Compare outputs of the exported model with the PyTorch model, returns True if all are within tolerance"""
+    min_iou, max_conf_diff = TOLERANCES[precision]
+    reference = YOLO(model_path)
+    candidate = load_exported_model(path)
+    passed = True
+    for image, ref_result, cand_result in zip(images, predict(reference, images), predict(candidate, images)):
+        report = compare_results(ref_result, cand_result, conf_margin=max_conf_diff, iou_margin=1 - min_iou)
+        ok = (report["unexplained"] == 0 and report["min_box_iou"] >= min_iou
+              and report["min_mask_iou"] >= min_iou - 0.05 and report["max_conf_diff"] <= max_conf_diff)
+        passed = passed and ok
+        logger.info(f"{'✅' if ok else '❌'} {image}: {report}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the YOLO model for CPU inference")
+    parser.add_argument("--model", default=MODEL_PATH, help="PyTorch model to export")
+    parser.add_argument("--runtime", choices=RUNTIMES, default=RUNTIME if RUNTIME in RUNTIMES else "onnx")
+    parser.add_argument("--precision", choices=list(PRECISIONS), default=EXPORT_PRECISION)
+    parser.add_argument("--data", default=EXPORT_CALIBRATION_DATA, help="Dataset YAML for INT8 calibration")
+    parser.add_argument("--force", action="store_true", help="Export even if an up-to-date export exists")
+    parser.add_argument("--check", nargs="+", metavar="IMAGE",
+                        help="Compare outputs with the PyTorch model on these images")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    path = export_model(args.model, args.runtime, args.precision, args.data, force=args.force)
+    print(path)
+    if args.check and not check_exported_model(path, args.check, args.model, args.precision):
+        logger.error("❌ Exported model outputs differ from the PyTorch model")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
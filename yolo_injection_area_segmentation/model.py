@@ -1,14 +1,22 @@
 import os
+import json
+import time
+import random
 import logging
 import numpy as np
+from threading import Lock
 from typing import List, Dict, Optional
 from label_studio_ml.model import LabelStudioMLBase
 from label_studio_ml.response import ModelResponse
+from label_studio_ml.weights import cpu_only
 from config import (
     MODEL_PATH, MODEL_VERSION, CONFIDENCE_THRESHOLD, IOU_THRESHOLD,
     IMAGE_SIZE, CLASS_MAPPING, LABEL_STUDIO_TASK_DATA_KEY,
-    LABEL_STUDIO_FROM_NAME, LABEL_STUDIO_TO_NAME, MAX_DETECTIONS, DEVICE
+    LABEL_STUDIO_FROM_NAME, LABEL_STUDIO_TO_NAME, MAX_DETECTIONS, DEVICE, BATCH_SIZE,
+    POLYGON_SIMPLIFY_TOLERANCE, PREDICT_LOG_SAMPLE_RATE, RUNTIME, EXPORT_PRECISION
 )
+from export import export_model, load_exported_model
+from path_resolver import PATH_RESOLVER, LOCAL_FILES_PREFIX
 
 try:
     from ultralytics import YOLO
@@ -21,17 +29,70 @@ except ImportError as e:
 
 logger = logging.getLogger(__name__)
 
+# PyTorch model loaded by preload_weights() in the gunicorn --preload master, shared by all instances
+_preloaded_model = None
+# Ultralytics predictors keep the state of the running batch and aren't thread-safe,
+# so the instances sharing the preloaded model take turns
+_preloaded_model_lock = Lock()
+
+
+def to_numpy(values) -> np.ndarray:
+    """Move a tensor (or array) of YOLO results to a NumPy array"""
+    if hasattr(values, 'cpu'):
+        values = values.cpu().numpy()
+    return np.asarray(values)
+
+
+def get_device() -> str:
+    if DEVICE == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return DEVICE
+
+
+def simplify_polygon(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Simplify polygon points with the Douglas-Peucker algorithm, the tolerance is in units of points"""
+    if tolerance <= 0 or len(points) <= 3:
+        return points
+    simplified = cv2.approxPolyDP(points.reshape(-1, 1, 2).astype(np.float32), tolerance, True).reshape(-1, 2)
+    # Too aggressive tolerance can collapse a small mask, keep the original polygon then
+    return simplified if len(simplified) >= 3 else points
+
 
 class YOLOInjectionAreaSegmentation(LabelStudioMLBase):
     """Custom YOLO ML Backend model for injection area segmentation
     """
 
+    @classmethod
+    def preload_weights(cls):
+        """Load the PyTorch model and build its predictor before gunicorn --preload forks workers,
+        so the workers share one copy of the weights instead of loading their own.
+        CPU only: CUDA initialized in the master is unusable in the workers, and ONNX Runtime and
+        OpenVINO sessions don't survive fork either. get_device() would initialize CUDA to check it,
+        so the device is DEVICE=cpu, or DEVICE=auto on a host where NVML finds no GPU.
+        """
+        global _preloaded_model
+        if RUNTIME != "torch" or not os.path.exists(MODEL_PATH):
+            return False
+        if DEVICE != "cpu" and not (DEVICE == "auto" and cpu_only()):
+            return False
+        logger.info(f"📦 Preloading YOLO model from {MODEL_PATH}")
+        model = YOLO(MODEL_PATH)
+        # Ultralytics copies and fuses the weights into the predictor on the first prediction,
+        # the same arguments as run_inference() keep this predictor for requests
+        # an explicit device, Ultralytics checks CUDA otherwise
+        model.predict(source=np.zeros((IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.uint8), conf=CONFIDENCE_THRESHOLD,
+                      iou=IOU_THRESHOLD, imgsz=IMAGE_SIZE, max_det=MAX_DETECTIONS, device="cpu", verbose=False)
+        _preloaded_model = model
+        return True
+
     def setup(self):
         """Configure any parameters of your model here
         """
         logger.info(f"🔧 Setting up YOLO Injection Area Segmentation model")
         self.set("model_version", MODEL_VERSION)
         self.model = None
+        # pooled instances are shared by request threads too, one predict() runs at a time per model
+        self.inference_lock = Lock()
         self.load_model()
         logger.info(f"✅ Model setup completed")
 
@@ -41,15 +102,25 @@ class YOLOInjectionAreaSegmentation(LabelStudioMLBase):
             if not os.path.exists(MODEL_PATH):
                 raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
 
+            if RUNTIME != "torch":
+                # Exported models run on CPU with ONNX Runtime or OpenVINO
+                model_path = export_model(MODEL_PATH, RUNTIME, EXPORT_PRECISION)
+                logger.info(f"Loading {RUNTIME} ({EXPORT_PRECISION}) model from {model_path}")
+                self.model = load_exported_model(model_path)
+                logger.info(f"Model loaded successfully. Classes: {self.model.names}")
+                return
+
+            if _preloaded_model is not None:
+                logger.info(f"Using the preloaded model, classes: {_preloaded_model.names}")
+                self.model = _preloaded_model
+                self.inference_lock = _preloaded_model_lock
+                return
+
             logger.info(f"Loading YOLO model from {MODEL_PATH}")
             self.model = YOLO(MODEL_PATH)
 
             # Set device
-            if DEVICE == "auto":
-                device = "cuda" if torch.cuda.is_available() else "cpu"
-            else:
-                device = DEVICE
-
+            device = get_device()
             logger.info(f"Using device: {device}")
             self.model.to(device)
 
@@ -59,250 +130,177 @@ class YOLOInjectionAreaSegmentation(LabelStudioMLBase):
             logger.error(f"Error loading model: {e}")
             raise e
 
+    def warmup(self):
+        """Run inference on a blank image, so the first request doesn't pay for lazy kernel initialization"""
+        image = np.zeros((IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.uint8)
+        started = time.perf_counter()
+        if self.run_inference([image])[0] is None:
+            raise RuntimeError("Warm-up inference failed")
+        logger.info(f"🔥 Model warmed up in {time.perf_counter() - started:.2f}s")
+
     def predict(self, tasks: List[Dict], context: Optional[Dict] = None, **kwargs) -> ModelResponse:
         """ Run YOLO segmentation inference on input images
             :param tasks: Label Studio tasks in JSON format
             :param context: Label Studio context in JSON format
             :return model_response: ModelResponse with predictions
         """
-        logger.info(f"🔮 Predict method called with {len(tasks)} tasks")
-        logger.debug(f"Tasks received: {tasks}")
-        logger.debug(f"Context: {context}")
-        logger.debug(f"Kwargs: {kwargs}")
-
-        # Log environment variables for debugging
-        logger.debug(f"🌍 Environment variables:")
-        logger.debug(f"   - LABEL_STUDIO_URL: {os.getenv('LABEL_STUDIO_URL', 'Not set')}")
-        logger.debug(f"   - LABEL_STUDIO_API_KEY: {'Set' if os.getenv('LABEL_STUDIO_API_KEY') else 'Not set'}")
+        started = time.perf_counter()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("🔮 Predict method called with %d tasks, context=%s, kwargs=%s", len(tasks), context, kwargs)
 
         if not self.model:
             logger.error("❌ Model not loaded")
             return ModelResponse(predictions=[])
 
-        predictions = []
+        predictions = [None] * len(tasks)
+        stats = {"tasks": len(tasks), "images": 0, "no_image": 0, "failed": 0, "detections": 0, "batches": 0,
+                 "unfinished": 0}
 
+        # Resolve all image paths first, so inference runs on batches of images
+        image_paths = {}
         for i, task in enumerate(tasks):
-            logger.info(f"📋 Processing task {i+1}/{len(tasks)}: {task.get('id', 'unknown')}")
-            try:
-                # Get image from task
-                logger.debug(f"Task data: {task.get('data', {})}")
-                image_path = self.get_image_path(task)
-                if not image_path:
-                    logger.warning(f"⚠️ No image found in task {task.get('id', 'unknown')}")
-                    logger.debug(f"Task keys: {list(task.keys())}")
-                    logger.debug(f"Task data keys: {list(task.get('data', {}).keys())}")
-                    # Add empty prediction for tasks without images
-                    predictions.append({
-                        "model_version": self.get("model_version"),
-                        "score": 0.0,
-                        "result": []
-                    })
+            image_path = self.get_image_path(task)
+            if not image_path:
+                logger.warning("⚠️ No image found in task %s", task.get('id', 'unknown'))
+                # Add empty prediction for tasks without images
+                predictions[i] = self.empty_prediction()
+                stats["no_image"] += 1
+                continue
+            image_paths[i] = image_path
+        stats["images"] = len(image_paths)
+        resolved = time.perf_counter()
+
+        # Run YOLO inference
+        inference_seconds = 0.0
+        indices = list(image_paths)
+        batch_size = max(BATCH_SIZE, 1)
+        for start in range(0, len(indices), batch_size):
+            if self.deadline.expired:
+                # Label Studio has stopped waiting, return predictions of the first tasks only
+                break
+            chunk = indices[start:start + batch_size]
+            batch_started = time.perf_counter()
+            batch_results = self.run_inference([image_paths[i] for i in chunk])
+            inference_seconds += time.perf_counter() - batch_started
+            stats["batches"] += 1
+
+            for i, results in zip(chunk, batch_results):
+                task = tasks[i]
+                if results is None:
+                    # Add empty prediction for failed tasks
+                    predictions[i] = self.empty_prediction()
+                    stats["failed"] += 1
                     continue
-
-                logger.info(f"🖼️ Image path: {image_path}")
-
-                # Run YOLO inference
-                logger.info(f"🚀 Running YOLO inference with:")
-                logger.info(f"   - Confidence threshold: {CONFIDENCE_THRESHOLD}")
-                logger.info(f"   - IoU threshold: {IOU_THRESHOLD}")
-                logger.info(f"   - Image size: {IMAGE_SIZE}")
-                logger.info(f"   - Max detections: {MAX_DETECTIONS}")
-
+                try:
+                    # Convert results to Label Studio format
+                    prediction = self.convert_results_to_ls_format(results, task)
+                    predictions[i] = prediction
+                    stats["detections"] += len(prediction["result"])
+                except Exception as e:
+                    logger.error(f"❌ Error processing task {task.get('id', 'unknown')}: {e}")
+                    logger.exception("Full traceback:")
+                    predictions[i] = self.empty_prediction()
+                    stats["failed"] += 1
+
+        if None in predictions:
+            stats["unfinished"] = len(predictions) - predictions.index(None)
+            logger.warning(f"⏰ Deadline exceeded, returning predictions for "
+                           f"{len(predictions) - stats['unfinished']} of {len(tasks)} tasks")
+            predictions = predictions[:predictions.index(None)]
+
+        finished = time.perf_counter()
+        stats.update({
+            "resolve_ms": round((resolved - started) * 1000, 2),
+            "inference_ms": round(inference_seconds * 1000, 2),
+            "convert_ms": round((finished - resolved - inference_seconds) * 1000, 2),
+            "total_ms": round((finished - started) * 1000, 2),
+        })
+        # One structured record per request instead of lines per task and detection,
+        # sampled with PREDICT_LOG_SAMPLE_RATE, errors are always logged above
+        if PREDICT_LOG_SAMPLE_RATE >= 1 or random.random() < PREDICT_LOG_SAMPLE_RATE:
+            logger.info("🎯 Prediction completed: %s", json.dumps(stats))
+        return ModelResponse(predictions=predictions)
+
+    def empty_prediction(self) -> Dict:
+        """Prediction returned for tasks without image or with failed inference"""
+        return {
+            "model_version": self.get("model_version"),
+            "score": 0.0,
+            "result": []
+        }
+
+    def run_inference(self, image_paths: List[str]) -> List[Optional[list]]:
+        """Run YOLO on a batch of images, returns a list of results per image, None for failed images"""
+        try:
+            with self.inference_lock:
                 results = self.model.predict(
-                    source=image_path,
+                    source=image_paths,
                     conf=CONFIDENCE_THRESHOLD,
                     iou=IOU_THRESHOLD,
                     imgsz=IMAGE_SIZE,
                     max_det=MAX_DETECTIONS,
+                    batch=len(image_paths),
                     verbose=False
                 )
-
-                logger.info(f"✅ YOLO inference completed. Results count: {len(results) if results else 0}")
-                if results and len(results) > 0:
-                    result = results[0]
-                    logger.info(f"📊 Detection details:")
-                    if hasattr(result, 'boxes') and result.boxes is not None:
-                        logger.info(f"   - Boxes found: {len(result.boxes)}")
-                        if len(result.boxes) > 0:
-                            logger.info(f"   - Confidences: {result.boxes.conf.tolist() if result.boxes.conf is not None else 'None'}")
-                            logger.info(f"   - Classes: {result.boxes.cls.tolist() if result.boxes.cls is not None else 'None'}")
-                    if hasattr(result, 'masks') and result.masks is not None:
-                        logger.info(f"   - Masks found: {len(result.masks)}")
-                    else:
-                        logger.info(f"   - No masks found")
-
-                # Convert results to Label Studio format
-                prediction = self.convert_results_to_ls_format(results, task)
-                logger.info(f"🔄 Converted prediction: score={prediction.get('score', 0)}, results_count={len(prediction.get('result', []))}")
-                logger.debug(f"Full prediction: {prediction}")
-                predictions.append(prediction)
-
-            except Exception as e:
-                logger.error(f"❌ Error processing task {task.get('id', 'unknown')}: {e}")
+            return [[result] for result in results]
+        except Exception as e:
+            if len(image_paths) == 1:
+                logger.error(f"❌ Error running inference on {image_paths[0]}: {e}")
                 logger.exception("Full traceback:")
-                # Add empty prediction for failed tasks
-                predictions.append({
-                    "model_version": self.get("model_version"),
-                    "score": 0.0,
-                    "result": []
-                })
-
-        logger.info(f"🎯 Prediction completed. Total predictions: {len(predictions)}")
-        final_response = ModelResponse(predictions=predictions)
-        logger.debug(f"Final response: {final_response}")
-        return final_response
+                return [None]
+            # One broken image fails the whole batch, retry images one by one to isolate it
+            logger.warning(f"⚠️ Batch inference failed ({e}), retrying {len(image_paths)} images one by one")
+            return [self.run_inference([image_path])[0] for image_path in image_paths]
 
     def get_image_path(self, task: Dict) -> Optional[str]:
         """Extract image path from Label Studio task"""
-        try:
-            logger.debug(f"🔍 Extracting image path from task")
-            logger.debug(f"Task data keys: {list(task.get('data', {}).keys())}")
-            logger.debug(f"Looking for key: {LABEL_STUDIO_TASK_DATA_KEY}")
-
-            # Try to get image URL from task data
-            if LABEL_STUDIO_TASK_DATA_KEY in task.get('data', {}):
-                image_url = task['data'][LABEL_STUDIO_TASK_DATA_KEY]
-                logger.info(f"📍 Found image URL with key '{LABEL_STUDIO_TASK_DATA_KEY}': {image_url}")
-
-                # Handle different types of image paths
-                if image_url.startswith(('http://', 'https://')):
-                    # Remote URL - download locally
-                    logger.info(f"🌐 Image is a remote URL, downloading locally...")
-                    local_path = self.get_local_path(image_url, task_id=task.get('id'))
-                    logger.info(f"📥 Downloaded to local path: {local_path}")
-                    return local_path
-                elif image_url.startswith('/data/local-files/'):
-                    # Label Studio local file path - use get_local_path to resolve
-                    logger.info(f"🏠 Image is a Label Studio local file, resolving path...")
-                    try:
-                        local_path = self.get_local_path(image_url, task_id=task.get('id'))
-                        logger.info(f"✅ Resolved local path: {local_path}")
-
-                        # Verify the file exists
-                        if os.path.exists(local_path):
-                            logger.info(f"✅ File exists at: {local_path}")
-                            return local_path
-                        else:
-                            logger.error(f"❌ Resolved file does not exist: {local_path}")
-                            return None
-                    except Exception as resolve_error:
-                        logger.error(f"❌ Error resolving Label Studio path: {resolve_error}")
-                        logger.exception("Full traceback for path resolution:")
-
-                        # Fallback: try to manually construct the path
-                        logger.info(f"🔄 Attempting fallback path resolution...")
-                        fallback_path = self.try_fallback_path_resolution(image_url)
-                        if fallback_path:
-                            logger.info(f"✅ Fallback resolution successful: {fallback_path}")
-                            return fallback_path
-                        else:
-                            logger.error(f"❌ Fallback resolution failed")
-                            return None
-                else:
-                    # Direct local file path
-                    logger.info(f"📁 Image is a direct local path: {image_url}")
-                    if os.path.exists(image_url):
-                        logger.info(f"✅ File exists at: {image_url}")
-                        return image_url
-                    else:
-                        logger.error(f"❌ File does not exist: {image_url}")
-                        return None
-
-            # Fallback: try common image keys
-            logger.debug(f"🔄 Primary key not found, trying fallback keys...")
-            for key in ['image', 'image_url', 'img', 'photo']:
-                if key in task.get('data', {}):
-                    image_url = task['data'][key]
-                    logger.info(f"📍 Found image URL with fallback key '{key}': {image_url}")
-
-                    if image_url.startswith(('http://', 'https://')):
-                        logger.info(f"🌐 Image is a remote URL, downloading locally...")
-                        local_path = self.get_local_path(image_url, task_id=task.get('id'))
-                        logger.info(f"📥 Downloaded to local path: {local_path}")
-                        return local_path
-                    elif image_url.startswith('/data/local-files/'):
-                        logger.info(f"🏠 Image is a Label Studio local file, resolving path...")
-                        try:
-                            local_path = self.get_local_path(image_url, task_id=task.get('id'))
-                            logger.info(f"✅ Resolved local path: {local_path}")
-
-                            if os.path.exists(local_path):
-                                logger.info(f"✅ File exists at: {local_path}")
-                                return local_path
-                            else:
-                                logger.error(f"❌ Resolved file does not exist: {local_path}")
-                                return None
-                        except Exception as resolve_error:
-                            logger.error(f"❌ Error resolving Label Studio path: {resolve_error}")
-                            logger.exception("Full traceback for path resolution:")
-                            return None
-                    else:
-                        logger.info(f"📁 Image is a direct local path: {image_url}")
-                        if os.path.exists(image_url):
-                            logger.info(f"✅ File exists at: {image_url}")
-                            return image_url
-                        else:
-                            logger.error(f"❌ File does not exist: {image_url}")
-                            return None
-
-            logger.warning(f"❌ No image found in task data. Available keys: {list(task.get('data', {}).keys())}")
-            return None
+        data = task.get('data', {})
+        logger.debug(f"🔍 Extracting image path from task, data keys: {list(data.keys())}")
 
-        except Exception as e:
-            logger.error(f"❌ Error getting image path: {e}")
-            logger.exception("Full traceback:")
-            return None
+        # The configured key first, then common image keys
+        for key in dict.fromkeys([LABEL_STUDIO_TASK_DATA_KEY, 'image', 'image_url', 'img', 'photo']):
+            if key in data:
+                logger.debug(f"📍 Found image URL with key '{key}': {data[key]}")
+                return self.resolve_image_url(data[key], task.get('id'))
 
-    def try_fallback_path_resolution(self, image_url: str) -> Optional[str]:
-        """Try to resolve Label Studio local file path manually"""
-        try:
-            logger.debug(f"🔄 Attempting manual path resolution for: {image_url}")
-
-            # Parse the Label Studio local file URL
-            # Format: /data/local-files/?d=ComfyUI/output/flux_00376_.png
-            if '?d=' in image_url:
-                # Extract the relative path after ?d=
-                relative_path = image_url.split('?d=', 1)[1]
-                logger.debug(f"📁 Extracted relative path: {relative_path}")
-
-                # Try common Label Studio data directories
-                possible_base_paths = [
-                    "/home/yan/StudioSpace/AI_Annotation_Studio/core_work_flow/storage",
-                    "/data",
-                    "/app/data",
-                    "/opt/heartex/data",
-                    os.path.expanduser("~/label-studio-data"),
-                    os.path.expanduser("~/.local/share/label-studio/media/upload"),
-                ]
-
-                for base_path in possible_base_paths:
-                    full_path = os.path.join(base_path, relative_path)
-                    logger.debug(f"🔍 Trying path: {full_path}")
-
-                    if os.path.exists(full_path):
-                        logger.info(f"✅ Found file at: {full_path}")
-                        return full_path
-
-                logger.warning(f"⚠️ File not found in any of the expected locations")
-                logger.debug(f"Tried paths: {[os.path.join(bp, relative_path) for bp in possible_base_paths]}")
+        logger.warning(f"❌ No image found in task data. Available keys: {list(data.keys())}")
+        return None
 
-            else:
-                logger.warning(f"⚠️ Unexpected Label Studio URL format: {image_url}")
+    def resolve_image_url(self, image_url: str, task_id=None) -> Optional[str]:
+        """Resolve an image URL from task data to a local file"""
+        try:
+            if image_url.startswith(('http://', 'https://')):
+                # Remote URL - download locally
+                return self.get_local_path(image_url, task_id=task_id)
+
+            if image_url.startswith(LOCAL_FILES_PREFIX):
+                # Label Studio local file - look it up in document roots first
+                local_path = PATH_RESOLVER.resolve_url(image_url)
+                if local_path is not None:
+                    return local_path
+                # Not available on this machine, let Label Studio serve it
+                logger.debug(f"🏠 {image_url} not found in document roots, fetching from Label Studio...")
+                local_path = self.get_local_path(image_url, task_id=task_id)
+                if os.path.exists(local_path):
+                    return local_path
+                logger.error(f"❌ Resolved file does not exist: {local_path}")
+                return None
 
-            return None
+            # Direct local file path
+            local_path = PATH_RESOLVER.resolve_file(image_url)
+            if local_path is None:
+                logger.error(f"❌ File does not exist: {image_url}")
+            return local_path
 
         except Exception as e:
-            logger.error(f"❌ Error in fallback path resolution: {e}")
-            logger.exception("Full traceback:")
+            logger.error(f"❌ Error resolving image path {image_url}: {e}")
+            logger.exception("Full traceback for path resolution:")
             return None
 
     def convert_results_to_ls_format(self, results, task: Dict) -> Dict:
         """Convert YOLO results to Label Studio format"""
         try:
-            logger.debug(f"🔄 Converting YOLO results to Label Studio format")
-
             if not results or len(results) == 0:
-                logger.info(f"📭 No results to convert")
                 return {
                     "model_version": self.get("model_version"),
                     "score": 0.0,
@@ -310,23 +308,19 @@ class YOLOInjectionAreaSegmentation(LabelStudioMLBase):
                 }
 
             result = results[0]  # Take first result
-            logger.debug(f"📊 Processing result with attributes: {[attr for attr in dir(result) if not attr.startswith('_')]}")
             predictions = []
 
             # Check if we have segmentation masks
             if hasattr(result, 'masks') and result.masks is not None:
-                logger.info(f"🎭 Found segmentation masks, creating polygon predictions")
                 predictions.extend(self.create_polygon_predictions(result))
 
             # If no masks, fall back to bounding boxes
             elif hasattr(result, 'boxes') and result.boxes is not None:
-                logger.info(f"📦 No masks found, creating bounding box predictions")
                 predictions.extend(self.create_bbox_predictions(result))
             else:
                 logger.warning(f"⚠️ No masks or boxes found in result")
 
             avg_score = float(np.mean([p.get('score', 0.0) for p in predictions]) if predictions else 0.0)
-            logger.info(f"✅ Conversion completed: {len(predictions)} predictions, avg_score={avg_score:.3f}")
 
             return {
                 "model_version": self.get("model_version"),
@@ -350,46 +344,30 @@ class YOLOInjectionAreaSegmentation(LabelStudioMLBase):
         try:
             masks = result.masks
             boxes = result.boxes
-            logger.info(f"🎭 Creating polygon predictions from {len(masks)} masks")
 
-            for i in range(len(masks)):
-                # Get confidence score
-                confidence = float(boxes.conf[i]) if boxes.conf is not None else 0.0
-                logger.debug(f"   Mask {i+1}: confidence={confidence:.3f}")
+            if not hasattr(masks, 'xyn') or masks.xyn is None:
+                logger.warning(f"   ⚠️ No polygon points found for masks")
+                return predictions
 
-                # Skip low confidence predictions
-                if confidence < CONFIDENCE_THRESHOLD:
-                    logger.debug(f"   Skipping mask {i+1}: confidence {confidence:.3f} < threshold {CONFIDENCE_THRESHOLD}")
-                    continue
+            # Move scores and classes to NumPy once and filter low confidence masks in one step
+            keep, confidences, class_names = self.filter_detections(boxes, len(masks))
+            polygons = masks.xyn
+
+            for i, confidence, class_name in zip(keep, confidences, class_names):
+                # Convert normalized coordinates to percentage
+                points = simplify_polygon(np.asarray(polygons[i], dtype=np.float32) * 100, POLYGON_SIMPLIFY_TOLERANCE)
+                predictions.append({
+                    "from_name": LABEL_STUDIO_FROM_NAME,
+                    "to_name": LABEL_STUDIO_TO_NAME,
+                    "type": "polygonlabels",
+                    "value": {
+                        "polygonlabels": [class_name],
+                        "points": points.tolist(),
+                        "closed": True,
+                    },
+                    "score": confidence,
+                })
 
-                # Get class ID and name
-                class_id = int(boxes.cls[i]) if boxes.cls is not None else 0
-                class_name = self.get_class_name(class_id)
-                logger.debug(f"   Mask {i+1}: class_id={class_id}, class_name={class_name}")
-
-                # Get polygon points (normalized coordinates)
-                if hasattr(masks, 'xyn') and masks.xyn is not None:
-                    points = masks.xyn[i] * 100  # Convert to percentage
-                    points_list = points.tolist()
-                    logger.debug(f"   Mask {i+1}: {len(points_list)} polygon points")
-
-                    prediction = {
-                        "from_name": LABEL_STUDIO_FROM_NAME,
-                        "to_name": LABEL_STUDIO_TO_NAME,
-                        "type": "polygonlabels",
-                        "value": {
-                            "polygonlabels": [class_name],
-                            "points": points_list,
-                            "closed": True,
-                        },
-                        "score": confidence,
-                    }
-                    predictions.append(prediction)
-                    logger.info(f"   ✅ Added polygon prediction {len(predictions)}: {class_name} (conf={confidence:.3f})")
-                else:
-                    logger.warning(f"   ⚠️ No polygon points found for mask {i+1}")
-
-            logger.info(f"🎭 Polygon predictions completed: {len(predictions)} valid predictions")
 
         except Exception as e:
             logger.error(f"❌ Error creating polygon predictions: {e}")
@@ -403,54 +381,34 @@ class YOLOInjectionAreaSegmentation(LabelStudioMLBase):
 
         try:
             boxes = result.boxes
-            logger.info(f"📦 Creating bbox predictions from {len(boxes)} boxes")
 
-            for i in range(len(boxes)):
-                # Get confidence score
-                confidence = float(boxes.conf[i]) if boxes.conf is not None else 0.0
-                logger.debug(f"   Box {i+1}: confidence={confidence:.3f}")
+            if not hasattr(boxes, 'xywhn') or boxes.xywhn is None:
+                logger.warning(f"   ⚠️ No bbox coordinates found for boxes")
+                return predictions
 
-                # Skip low confidence predictions
-                if confidence < CONFIDENCE_THRESHOLD:
-                    logger.debug(f"   Skipping box {i+1}: confidence {confidence:.3f} < threshold {CONFIDENCE_THRESHOLD}")
-                    continue
+            keep, confidences, class_names = self.filter_detections(boxes, len(boxes))
+
+            # Convert all boxes from normalized center format to Label Studio format (percentage) at once
+            xywhn = to_numpy(boxes.xywhn)[keep]
+            rects = np.empty_like(xywhn)
+            rects[:, :2] = (xywhn[:, :2] - xywhn[:, 2:] / 2) * 100
+            rects[:, 2:] = xywhn[:, 2:] * 100
+
+            for (x, y, w, h), confidence, class_name in zip(rects.tolist(), confidences, class_names):
+                predictions.append({
+                    "from_name": LABEL_STUDIO_FROM_NAME,
+                    "to_name": LABEL_STUDIO_TO_NAME,
+                    "type": "rectanglelabels",
+                    "value": {
+                        "rectanglelabels": [class_name],
+                        "x": x,
+                        "y": y,
+                        "width": w,
+                        "height": h,
+                    },
+                    "score": confidence,
+                })
 
-                # Get class ID and name
-                class_id = int(boxes.cls[i]) if boxes.cls is not None else 0
-                class_name = self.get_class_name(class_id)
-                logger.debug(f"   Box {i+1}: class_id={class_id}, class_name={class_name}")
-
-                # Get bounding box coordinates (normalized)
-                if hasattr(boxes, 'xywhn') and boxes.xywhn is not None:
-                    x_center, y_center, width, height = boxes.xywhn[i]
-
-                    # Convert to Label Studio format (percentage)
-                    x = float((x_center - width/2) * 100)
-                    y = float((y_center - height/2) * 100)
-                    w = float(width * 100)
-                    h = float(height * 100)
-
-                    logger.debug(f"   Box {i+1}: x={x:.1f}%, y={y:.1f}%, w={w:.1f}%, h={h:.1f}%")
-
-                    prediction = {
-                        "from_name": LABEL_STUDIO_FROM_NAME,
-                        "to_name": LABEL_STUDIO_TO_NAME,
-                        "type": "rectanglelabels",
-                        "value": {
-                            "rectanglelabels": [class_name],
-                            "x": x,
-                            "y": y,
-                            "width": w,
-                            "height": h,
-                        },
-                        "score": confidence,
-                    }
-                    predictions.append(prediction)
-                    logger.info(f"   ✅ Added bbox prediction {len(predictions)}: {class_name} (conf={confidence:.3f})")
-                else:
-                    logger.warning(f"   ⚠️ No bbox coordinates found for box {i+1}")
-
-            logger.info(f"📦 Bbox predictions completed: {len(predictions)} valid predictions")
 
         except Exception as e:
             logger.error(f"❌ Error creating bbox predictions: {e}")
@@ -458,6 +416,20 @@ class YOLOInjectionAreaSegmentation(LabelStudioMLBase):
 
         return predictions
 
+    def filter_detections(self, boxes, count: int):
+        """Return indices, confidences and class names of detections above the confidence threshold"""
+        confidences = to_numpy(boxes.conf) if boxes is not None and boxes.conf is not None else np.zeros(count)
+        class_ids = to_numpy(boxes.cls).astype(int) if boxes is not None and boxes.cls is not None \
+            else np.zeros(count, dtype=int)
+
+        keep = np.flatnonzero(confidences >= CONFIDENCE_THRESHOLD)
+
+        # Resolve each distinct class name once
+        kept_class_ids = class_ids[keep]
+        names = {class_id: self.get_class_name(class_id) for class_id in np.unique(kept_class_ids).tolist()}
+        class_names = [names[class_id] for class_id in kept_class_ids.tolist()]
+        return keep.tolist(), confidences[keep].astype(float).tolist(), class_names
+
     def get_class_name(self, class_id: int) -> str:
         """Get class name from class ID"""
         # First try the model's built-in names
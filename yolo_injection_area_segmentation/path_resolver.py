@@ -0,0 +1,157 @@
+"""
+Resolution of Label Studio Local Storage URLs (/data/local-files/?d=<path>) and local image paths to files on disk
+"""
+import os
+import time
+import logging
+import posixpath
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from label_studio_sdk._extensions.label_studio_tools.core.utils.io import safe_build_path
+from label_studio_ml.metrics import CACHE_REQUESTS
+from config import DOCUMENT_ROOTS, PATH_CACHE_TTL, PATH_CACHE_MAX_ENTRIES, PATH_PRESCAN_ROOTS
+
+logger = logging.getLogger(__name__)
+
+LOCAL_FILES_PREFIX = "/data/local-files/"
+
+
+def parse_local_files_url(url: str) -> Optional[str]:
+    """Return the relative file path of a Local Storage URL, decoded the same way as Label Studio does"""
+    values = parse_qs(urlparse(url).query, keep_blank_values=True).get("d")
+    if not values or not values[-1]:
+        return None
+    # "?d=" is always relative to the document root
+    return posixpath.normpath(values[-1]).lstrip("/")
+
+
+class PathResolver:
+    """Resolve image references to files on disk without touching the filesystem for every task
+
+    Local Storage paths are looked up in document roots in order, the first existing file wins.
+    Results of lookups, including files that were not found, are memoized for `ttl` seconds,
+    so thousands of tasks pointing to the same directories cost one stat per file per TTL.
+    `prescan()` walks document roots once and indexes every file, lookups of indexed files
+    never touch the filesystem. The index isn't refreshed: a file removed after the scan fails
+    to load at inference time, and files added after the scan are found by regular lookups.
+    """
+
+    def __init__(self, roots: Iterable[str] = DOCUMENT_ROOTS, ttl: float = PATH_CACHE_TTL,
+                 max_entries: int = PATH_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            roots: Document roots searched in order.
+            ttl: Seconds to remember lookup results, 0 disables memoization.
+            max_entries: Max number of memoized lookups, the oldest ones are dropped above it.
+        """
+        self.roots = [os.path.abspath(os.path.expanduser(root)) for root in roots if root]
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = Lock()
+        # relative path -> file path, filled by prescan()
+        self._index: Dict[str, str] = {}
+        # (kind, path) -> (file path or None, expiration time), in insertion order
+        self._cache: Dict[Tuple[str, str], Tuple[Optional[str], float]] = {}
+
+    def resolve_url(self, url: str) -> Optional[str]:
+        """Return the file of a Local Storage URL, or None if it isn't in any document root"""
+        relative_path = parse_local_files_url(url)
+        if relative_path is None:
+            logger.warning(f"⚠️ Unexpected Label Studio URL format: {url}")
+            return None
+        return self.resolve(relative_path)
+
+    def resolve(self, relative_path: str) -> Optional[str]:
+        """Return the file of a path relative to document roots, or None if it isn't in any of them"""
+        with self._lock:
+            filepath = self._index.get(relative_path)
+        if filepath is not None:
+            CACHE_REQUESTS.inc(cache="path", result="hit")
+            return filepath
+        return self._memoized(("relative", relative_path), self._probe_roots)
+
+    def resolve_file(self, path: str) -> Optional[str]:
+        """Return the path if the file exists"""
+        return self._memoized(("file", path), lambda p: p if os.path.isfile(p) else None)
+
+    def _memoized(self, key: Tuple[str, str], probe) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is not None and entry[1] > now:
+            CACHE_REQUESTS.inc(cache="path", result="hit")
+            return entry[0]
+
+        CACHE_REQUESTS.inc(cache="path", result="miss")
+        filepath = probe(key[1])
+        if self.ttl > 0:
+            with self._lock:
+                self._cache.pop(key, None)
+                self._cache[key] = (filepath, now + self.ttl)
+                while len(self._cache) > self.max_entries:
+                    del self._cache[next(iter(self._cache))]
+        return filepath
+
+    def _probe_roots(self, relative_path: str) -> Optional[str]:
+        for root in self.roots:
+            try:
+                filepath = safe_build_path(root, relative_path)
+            except ValueError:
+                logger.warning(f"⚠️ Path points outside of the document root {root}: {relative_path}")
+                return None
+            if os.path.isfile(filepath):
+                logger.debug(f"✅ Found file at: {filepath}")
+                return filepath
+        logger.debug(f"File {relative_path} not found in document roots {self.roots}")
+        return None
+
+    def prescan(self, roots: Optional[List[str]] = None) -> int:
+        """Index all files in the given document roots (all roots by default)
+
+        Roots that aren't document roots yet are added to the end of the search order.
+        Indexed files take precedence over the same paths in document roots that weren't scanned.
+
+        Returns:
+            int: Number of indexed files.
+        """
+        with self._lock:
+            roots = list(self.roots) if roots is None else [os.path.abspath(os.path.expanduser(root)) for root in roots]
+            # replaced rather than changed in place, lookups iterate over the list without the lock
+            self.roots = self.roots + [root for root in dict.fromkeys(roots) if root not in self.roots]
+            search_order = self.roots
+
+        index = {}
+        # walk in the search order, so a file in an earlier root shadows the same path in later ones
+        for root in sorted(set(roots), key=search_order.index):
+            start = time.perf_counter()
+            count = 0
+            for dirpath, _, filenames in os.walk(root):
+                relative_dir = os.path.relpath(dirpath, root)
+                for filename in filenames:
+                    relative_path = posixpath.normpath(
+                        posixpath.join(*relative_dir.split(os.sep), filename))
+                    if relative_path not in index:
+                        index[relative_path] = os.path.join(dirpath, filename)
+                        count += 1
+            logger.info(f"📂 Indexed {count} files in {root} in {time.perf_counter() - start:.1f}s")
+
+        with self._lock:
+            for relative_path, filepath in index.items():
+                self._index.setdefault(relative_path, filepath)
+        return len(index)
+
+    def clear(self):
+        with self._lock:
+            self._index.clear()
+            self._cache.clear()
+
+
+PATH_RESOLVER = PathResolver()
+
+
+def prescan_document_roots():
+    """Index PATH_PRESCAN_ROOTS at server startup, if any"""
+    if PATH_PRESCAN_ROOTS:
+        PATH_RESOLVER.prescan(PATH_PRESCAN_ROOTS)
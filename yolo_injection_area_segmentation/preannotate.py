@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Offline bulk pre-annotation with the injection segmentation model
+
+Runs YOLOInjectionAreaSegmentation.predict() on images from a directory, a glob or a Label Studio JSON
+task export, and streams tasks with predictions to a JSONL file for import into Label Studio.
+Keys of completed tasks (task IDs, or image paths for directories and globs) are appended to a checkpoint
+file, so a run that was interrupted continues where it stopped when started again with the same arguments.
+
+    python preannotate.py /data/images --output predictions.jsonl --workers 4
+    python preannotate.py '/data/images/**/*.png' --output predictions.jsonl --local-files-root /data
+    python preannotate.py project-export.json --output predictions.jsonl
+"""
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from typing import Dict, Iterator, List, Set, Tuple
+from urllib.parse import quote
+
+from config import LABEL_STUDIO_TASK_DATA_KEY, BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+DEFAULT_LABEL_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "label_studio_config.xml")
+
+# (checkpoint key, task passed to predict(), task written to the output)
+TaskItem = Tuple[str, Dict, Dict]
+
+_model = None
+
+
+def load_tasks(source: str, local_files_root: str = None) -> List[TaskItem]:
+    """Read tasks from a Label Studio JSON export, or make one task per image of a directory or a glob"""
+    if source.endswith(".json") and os.path.isfile(source):
+        with open(source) as f:
+            tasks = json.load(f)
+        if isinstance(tasks, dict):
+            tasks = [tasks]
+        items = []
+        for task in tasks:
+            # Plain data dicts are allowed as well, like in Label Studio import
+            task = task if "data" in task else {"data": task}
+            key = str(task["id"]) if "id" in task else json.dumps(task["data"], sort_keys=True)
+            output_task = {k: v for k, v in task.items() if k in ("id", "data", "meta")}
+            items.append((key, task, output_task))
+        return items
+
+    if os.path.isdir(source):
+        paths = (os.path.join(root, name) for root, _, names in os.walk(source) for name in names)
+    else:
+        paths = glob.glob(source, recursive=True)
+    paths = sorted(os.path.abspath(p) for p in paths if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS)
+
+    items = []
+    for path in paths:
+        value = path
+        if local_files_root:
+            # Label Studio Local Storage URL, so the imported tasks open the same files
+            value = "/data/local-files/?d=" + quote(os.path.relpath(path, os.path.abspath(local_files_root)))
+        items.append((path, {"data": {LABEL_STUDIO_TASK_DATA_KEY: path}}, {"data": {LABEL_STUDIO_TASK_DATA_KEY: value}}))
+    return items
+
+
+def read_checkpoint(path: str) -> Set[str]:
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.rstrip("\n") for line in f if line.endswith("\n")}
+
+
+def open_for_append(path: str):
+    """Open a line-oriented file for appending, dropping an incomplete last line left by an interrupted run"""
+    if os.path.exists(path):
+        with open(path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+    return open(path, "a")
+
+
+def init_worker(label_config: str, threads: int):
+    """Load the model once per worker process"""
+    global _model
+    import torch
+    from model import YOLOInjectionAreaSegmentation
+
+    if threads:
+        torch.set_num_threads(threads)
+    _model = YOLOInjectionAreaSegmentation(project_id="preannotate", label_config=label_config)
+
+
+def predict_batch(batch: List[TaskItem]) -> List[Tuple[str, Dict]]:
+    from label_studio_ml.api import format_predictions
+
+    response = _model.predict([task for _, task, _ in batch])
+    predictions = format_predictions(_model, response)
+    return [(key, dict(output_task, predictions=[prediction]))
+            for (key, _, output_task), prediction in zip(batch, predictions)]
+
+
+def run(batches: List[List[TaskItem]], label_config: str, workers: int) -> Iterator[List[Tuple[str, Dict]]]:
+    """Yield predictions of batches as they complete"""
+    if workers <= 1:
+        init_worker(label_config, 0)
+        yield from map(predict_batch, batches)
+        return
+
+    # Share CPU cores between workers instead of oversubscribing them with PyTorch threads
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # Forked CUDA and OpenMP state is unusable in child processes, start clean ones
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=init_worker, initargs=(label_config, threads)) as pool:
+        yield from pool.imap_unordered(predict_batch, batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-annotate images with the injection segmentation model")
+    parser.add_argument("source", help="Directory of images, glob (quoted) or Label Studio JSON task export")
+    parser.add_argument("--output", "-o", required=True, help="JSONL file to append tasks with predictions to")
+    parser.add_argument("--checkpoint", help="File of completed task keys, <output>.checkpoint by default")
+    parser.add_argument("--label-config", default=DEFAULT_LABEL_CONFIG, help="Label Studio labeling config XML")
+    parser.add_argument("--local-files-root",
+                        help="Write images as Local Storage URLs relative to this Label Studio document root")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each loads its own model")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Tasks per predict() call")
+    parser.add_argument("--log-every", type=float, default=10, help="Seconds between progress reports")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="[%(asctime)s] [%(levelname)s] %(message)s")
+    with open(args.label_config) as f:
+        label_config = f.read()
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint"
+
+    items = load_tasks(args.source, args.local_files_root)
+    completed = read_checkpoint(checkpoint_path)
+    pending = [item for item in items if item[0] not in completed]
+    logger.info(f"📋 {len(items)} tasks, {len(items) - len(pending)} already completed, {len(pending)} to go")
+    if not pending:
+        return
+
+    batch_size = max(args.batch_size, 1)
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    started = last_report = time.perf_counter()
+    done = empty = 0
+    with open_for_append(args.output) as output, open_for_append(checkpoint_path) as checkpoint:
+        for results in run(batches, label_config, args.workers):
+            # Predictions are flushed before their keys, so a crash can repeat a batch but never lose one
+            for _, task in results:
+                output.write(json.dumps(task, ensure_ascii=False) + "\n")
+                empty += not task["predictions"][0]["result"]
+            output.flush()
+            checkpoint.write("".join(key + "\n" for key, _ in results))
+            checkpoint.flush()
+
+            done += len(results)
+            now = time.perf_counter()
+            if now - last_report >= args.log_every or done == len(pending):
+                last_report = now
+                logger.info(f"🚀 {done}/{len(pending)} tasks, {done / (now - started):.1f} img/s")
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"✅ Pre-annotated {done} tasks in {elapsed:.1f}s ({done / elapsed:.1f} img/s), "
+                f"{empty} without detections, predictions saved to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
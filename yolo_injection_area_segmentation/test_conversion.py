@@ -0,0 +1,81 @@
+"""
+Unit tests of the conversion of YOLO results to Label Studio regions, YOLO results are replaced with mocks
+"""
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import model as model_module
+from model import simplify_polygon
+
+NAMES = {0: "arm_injection_area", 1: "other"}
+
+
+def make_boxes(conf, cls, xywhn=None):
+    boxes = MagicMock()
+    boxes.conf = torch.tensor(conf)
+    boxes.cls = torch.tensor(cls, dtype=torch.float32)
+    boxes.xywhn = torch.tensor(xywhn) if xywhn is not None else None
+    boxes.__len__.return_value = len(conf)
+    return boxes
+
+
+def test_filter_detections_drops_low_confidence(make_model):
+    model = make_model(names=NAMES)
+    with patch.object(model_module, "CONFIDENCE_THRESHOLD", 0.5):
+        keep, confidences, class_names = model.filter_detections(make_boxes([0.9, 0.2, 0.5], [0, 0, 1]), 3)
+    assert keep == [0, 2]
+    assert confidences == [np.float32(0.9).item(), 0.5]
+    assert class_names == ["arm_injection_area", "other"]
+
+
+def test_filter_detections_without_scores(make_model):
+    model = make_model(names=NAMES)
+    boxes = MagicMock(conf=None, cls=None)
+    with patch.object(model_module, "CONFIDENCE_THRESHOLD", 0.25):
+        assert model.filter_detections(boxes, 2) == ([], [], [])
+
+
+def test_bbox_predictions_are_percent_of_top_left_corner(make_model):
+    model = make_model(names=NAMES)
+    result = MagicMock()
+    result.boxes = make_boxes([0.9, 0.1], [0, 0], [[0.5, 0.5, 0.2, 0.4], [0.1, 0.1, 0.1, 0.1]])
+    with patch.object(model_module, "CONFIDENCE_THRESHOLD", 0.25):
+        predictions = model.create_bbox_predictions(result)
+    assert len(predictions) == 1
+    value = predictions[0]["value"]
+    assert np.allclose([value["x"], value["y"], value["width"], value["height"]], [40, 30, 20, 40])
+    assert value["rectanglelabels"] == ["arm_injection_area"]
+
+
+def test_polygon_predictions_are_percent_of_image_size(make_model):
+    model = make_model(names=NAMES)
+    result = MagicMock()
+    result.boxes = make_boxes([0.8], [1])
+    result.masks.xyn = [np.array([[0.1, 0.2], [0.3, 0.2], [0.3, 0.4]], dtype=np.float32)]
+    result.masks.__len__.return_value = 1
+    with patch.object(model_module, "CONFIDENCE_THRESHOLD", 0.25), \
+            patch.object(model_module, "POLYGON_SIMPLIFY_TOLERANCE", 0):
+        predictions = model.create_polygon_predictions(result)
+    assert len(predictions) == 1
+    assert np.allclose(predictions[0]["value"]["points"], [[10, 20], [30, 20], [30, 40]])
+    assert predictions[0]["value"]["polygonlabels"] == ["other"]
+
+
+def test_simplify_polygon_drops_collinear_points():
+    square = np.array([[0, 0], [5, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float32)
+    simplified = simplify_polygon(square, 0.5)
+    assert sorted(map(tuple, simplified.tolist())) == [(0, 0), (0, 10), (10, 0), (10, 10)]
+
+
+def test_simplify_polygon_keeps_points_without_tolerance_or_on_collapse():
+    triangle = np.array([[0, 0], [10, 0], [0, 10]], dtype=np.float32)
+    assert simplify_polygon(triangle, 0) is triangle
+    # a tolerance larger than the polygon would collapse it to a line, the original points are kept
+    thin = np.array([[0, 0], [5, 0.1], [10, 0], [5, -0.1]], dtype=np.float32)
+    assert simplify_polygon(thin, 50) is thin
@@ -0,0 +1,73 @@
+"""
+Unit tests of batched inference, YOLO is replaced with mocks
+"""
+import os
+import sys
+import time
+from threading import Thread
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import model as model_module
+
+
+def fake_predict(source, **kwargs):
+    if any("broken" in path for path in source):
+        raise RuntimeError("Can't read image")
+    return [f"result of {path}" for path in source]
+
+
+def test_run_inference_passes_batch(make_model):
+    model = make_model(predict=fake_predict)
+    assert model.run_inference(["a.png", "b.png"]) == [["result of a.png"], ["result of b.png"]]
+    model.model.predict.assert_called_once()
+    assert model.model.predict.call_args.kwargs["batch"] == 2
+
+
+def test_run_inference_retries_images_one_by_one(make_model):
+    model = make_model(predict=fake_predict)
+    results = model.run_inference(["a.png", "broken.png", "c.png"])
+    # the broken image fails alone, the others get their results
+    assert results == [["result of a.png"], None, ["result of c.png"]]
+    assert [call.kwargs["source"] for call in model.model.predict.call_args_list] == [
+        ["a.png", "broken.png", "c.png"], ["a.png"], ["broken.png"], ["c.png"]]
+
+
+def test_predict_runs_chunks_of_batch_size(make_model):
+    model = make_model(predict=fake_predict)
+    tasks = [{"id": i, "data": {"image": f"{i}.png"}} for i in range(5)] + [{"id": 5, "data": {}}]
+    with patch.object(model_module, "BATCH_SIZE", 2), \
+            patch.object(model, "get_image_path", side_effect=lambda task: task["data"].get("image")), \
+            patch.object(model, "convert_results_to_ls_format",
+                         side_effect=lambda results, task: {"result": [], "score": float(results[0][10])}):
+        response = model.predict(tasks)
+
+    assert [len(call.kwargs["source"]) for call in model.model.predict.call_args_list] == [2, 2, 1]
+    # predictions keep the task order ("result of <i>.png" has the score i), the task without an image gets an empty one
+    assert [p.score for p in response.predictions] == [0.0, 1.0, 2.0, 3.0, 4.0, 0.0]
+    assert response.predictions[5].result == []
+
+
+def test_run_inference_serializes_predictions_of_shared_model(make_model):
+    running = []
+    overlaps = []
+
+    def slow_predict(source, **kwargs):
+        running.append(source)
+        overlaps.append(len(running))
+        time.sleep(0.05)
+        running.remove(source)
+        return fake_predict(source)
+
+    model = make_model(predict=slow_predict)
+    # a second instance using the same predictor, like the instances sharing the preloaded model
+    other = make_model(predict=slow_predict)
+    other.model, other.inference_lock = model.model, model.inference_lock
+    threads = [Thread(target=instance.run_inference, args=([f"{i}.png"],))
+               for i, instance in enumerate([model, other, model, other])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlaps == [1, 1, 1, 1]
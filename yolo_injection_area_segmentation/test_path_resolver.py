@@ -0,0 +1,76 @@
+"""
+Unit tests of Local Storage path resolution, the clock is replaced with a mock
+"""
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import path_resolver
+from path_resolver import PathResolver, parse_local_files_url
+
+
+def make_file(root, relative_path):
+    filepath = root / relative_path
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    filepath.write_bytes(b"image")
+    return str(filepath)
+
+
+def test_parse_local_files_url():
+    assert parse_local_files_url("/data/local-files/?d=images%2F1.png") == "images/1.png"
+    assert parse_local_files_url("/data/local-files/?d=/images/./1.png") == "images/1.png"
+    assert parse_local_files_url("/data/local-files/?x=1") is None
+
+
+def test_first_root_with_the_file_wins(tmp_path):
+    make_file(tmp_path / "second", "images/1.png")
+    first = make_file(tmp_path / "first", "images/1.png")
+    resolver = PathResolver([str(tmp_path / "first"), str(tmp_path / "second")])
+    assert resolver.resolve_url("/data/local-files/?d=images/1.png") == first
+
+
+def test_found_and_missing_files_are_memoized_for_ttl(tmp_path):
+    resolver = PathResolver([str(tmp_path)], ttl=10)
+    with patch.object(path_resolver.time, "monotonic", return_value=100):
+        assert resolver.resolve("1.png") is None
+        filepath = make_file(tmp_path, "1.png")
+        # the missing file is remembered until the TTL expires
+        assert resolver.resolve("1.png") is None
+    with patch.object(path_resolver.time, "monotonic", return_value=111):
+        assert resolver.resolve("1.png") == filepath
+        os.remove(filepath)
+        # and so is the found one
+        assert resolver.resolve("1.png") == filepath
+        assert resolver.resolve_file(filepath) is None
+    with patch.object(path_resolver.time, "monotonic", return_value=122):
+        assert resolver.resolve("1.png") is None
+
+
+def test_zero_ttl_disables_memoization(tmp_path):
+    resolver = PathResolver([str(tmp_path)], ttl=0)
+    assert resolver.resolve("1.png") is None
+    filepath = make_file(tmp_path, "1.png")
+    assert resolver.resolve("1.png") == filepath
+
+
+def test_paths_outside_of_document_roots_are_rejected(tmp_path):
+    make_file(tmp_path, "secret.txt")
+    resolver = PathResolver([str(tmp_path / "root")])
+    assert resolver.resolve("../secret.txt") is None
+    assert resolver.resolve_url("/data/local-files/?d=../secret.txt") is None
+
+
+def test_prescan_indexes_files_without_probing(tmp_path):
+    first = make_file(tmp_path / "first", "a/1.png")
+    make_file(tmp_path / "second", "a/1.png")
+    second = make_file(tmp_path / "second", "b/2.png")
+    resolver = PathResolver([str(tmp_path / "first")], ttl=0)
+
+    assert resolver.prescan([str(tmp_path / "second"), str(tmp_path / "first")]) == 2
+    # a scanned root that wasn't a document root is searched after the existing ones
+    assert resolver.roots == [str(tmp_path / "first"), str(tmp_path / "second")]
+    with patch.object(path_resolver.os.path, "isfile", side_effect=AssertionError("filesystem probed")):
+        assert resolver.resolve("a/1.png") == first
+        assert resolver.resolve("b/2.png") == second
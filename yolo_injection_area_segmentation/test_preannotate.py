@@ -0,0 +1,85 @@
+"""
+Unit tests of the offline pre-annotation checkpoints, the model is replaced with a mock
+"""
+import os
+import sys
+import json
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import preannotate
+
+
+def make_images(root, count):
+    root.mkdir()
+    for i in range(count):
+        (root / f"{i}.png").write_bytes(b"image")
+    return [str(root / f"{i}.png") for i in range(count)]
+
+
+def fake_run(batches, label_config, workers, fail_after=None):
+    """Predict one empty region list per task, raise after `fail_after` batches like an interrupted run"""
+    for number, batch in enumerate(batches):
+        if fail_after is not None and number == fail_after:
+            raise KeyboardInterrupt
+        yield [(key, dict(output_task, predictions=[{"result": []}])) for key, _, output_task in batch]
+
+
+def run_main(args, **run_kwargs):
+    argv = ["preannotate.py", *args, "--label-config", os.path.join(os.path.dirname(__file__),
+                                                                    "label_studio_config.xml")]
+    with patch.object(sys, "argv", argv), \
+            patch.object(preannotate, "run", lambda *a: fake_run(*a, **run_kwargs)):
+        preannotate.main()
+
+
+def read_lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def test_load_tasks_from_directory_with_local_files_urls(tmp_path):
+    paths = make_images(tmp_path / "images", 2)
+    (tmp_path / "images" / "notes.txt").write_text("not an image")
+    items = preannotate.load_tasks(str(tmp_path / "images"), local_files_root=str(tmp_path))
+    assert [key for key, _, _ in items] == paths
+    # the model reads the file, the output task points Label Studio to Local Storage
+    assert items[0][1] == {"data": {"image": paths[0]}}
+    assert items[0][2] == {"data": {"image": "/data/local-files/?d=images/0.png"}}
+
+
+def test_load_tasks_from_export_keyed_by_id(tmp_path):
+    export = tmp_path / "export.json"
+    export.write_text(json.dumps([{"id": 7, "data": {"image": "a.png"}, "annotations": []}, {"image": "b.png"}]))
+    items = preannotate.load_tasks(str(export))
+    assert [key for key, _, _ in items] == ["7", json.dumps({"image": "b.png"})]
+    assert items[0][2] == {"id": 7, "data": {"image": "a.png"}}
+
+
+def test_interrupted_run_resumes_from_checkpoint(tmp_path):
+    paths = make_images(tmp_path / "images", 5)
+    output = str(tmp_path / "predictions.jsonl")
+
+    try:
+        run_main([str(tmp_path / "images"), "--output", output, "--batch-size", "2"], fail_after=2)
+    except KeyboardInterrupt:
+        pass
+    assert read_lines(output + ".checkpoint") == paths[:4]
+
+    run_main([str(tmp_path / "images"), "--output", output, "--batch-size", "2"])
+    assert read_lines(output + ".checkpoint") == paths
+    # every task is written once over both runs
+    assert [json.loads(line)["data"]["image"] for line in read_lines(output)] == paths
+
+
+def test_incomplete_last_line_is_dropped(tmp_path):
+    path = tmp_path / "predictions.jsonl"
+    path.write_text('{"a": 1}\n{"b":')
+    with preannotate.open_for_append(str(path)) as f:
+        f.write('{"c": 3}\n')
+    assert read_lines(path) == ['{"a": 1}', '{"c": 3}']
+    # lines without a newline are not completed keys
+    checkpoint = tmp_path / "checkpoint"
+    checkpoint.write_text("1.png\n2.pn")
+    assert preannotate.read_checkpoint(str(checkpoint)) == {"1.png"}